@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+
+''' 根据负载自动调整进程池的子进程数量
+
+:class:`Autoscaler` 是一个后台线程，定期对各个进程池的负载采样（见 :meth:`workerpool.WorkerPool.load` ），
+由各进程池的 :class:`ScalingPolicy` 决定是否增加或减少子进程，然后调用 :meth:`workerpool.WorkerPool.resize` 。
+
+负载由三个指标衡量：
+
+* 利用率：忙碌的子进程数 / 子进程数。正在同步执行任务的子进程是忙碌的，
+  只在事件循环中执行协程的子进程按其执行中的任务数 / 每个子进程同时执行的最大任务数计算
+* 等待时间：采样间隔内开始执行的任务从提交到开始执行的平均等待时间，以及当前等待最久的任务已经等待的时间
+* 队列深度：等待分配的任务数
+
+:date: 2026-10-18
+'''
+
+from __future__ import print_function, unicode_literals, absolute_import
+
+import math
+import time
+import logging
+import threading
+from collections import deque
+
+SCALE_UP = 'up'
+SCALE_DOWN = 'down'
+
+
+class ScalingPolicy(object):
+    '''一个进程池的自动调整策略
+
+    :param int min_processes: 子进程数量的下限
+    :param int max_processes: 子进程数量的上限
+    :param float scale_up_utilization: 利用率不低于该值时增加子进程
+    :param float scale_down_utilization: 利用率不高于该值，且没有等待中的任务时，减少子进程。
+        应明显小于 ``scale_up_utilization`` ，两者之间的区间避免子进程数量来回振荡。
+    :param float scale_up_wait: 任务的等待时间（秒）不低于该值时增加子进程
+    :param int step: 每次减少的子进程数量。增加时，按等待中的任务数一次增加足够的子进程，但不少于该值。
+    :param float cooldown: 两次调整的最小间隔（秒）
+    :param float scale_down_cooldown: 增加子进程后，至少经过该时间（秒）才可以减少子进程。默认为 ``cooldown`` 的 4 倍。
+    '''
+
+    def __init__(self, min_processes=1, max_processes=None, scale_up_utilization=0.8, scale_down_utilization=0.3,
+                 scale_up_wait=0.5, step=1, cooldown=30, scale_down_cooldown=None):
+        if min_processes < 1:
+            raise ValueError('min_processes must be at least 1')
+        if max_processes is None:
+            max_processes = min_processes
+        if max_processes < min_processes:
+            raise ValueError('max_processes must not be less than min_processes')
+        if scale_down_utilization >= scale_up_utilization:
+            raise ValueError('scale_down_utilization must be less than scale_up_utilization')
+        self.min_processes = min_processes
+        self.max_processes = max_processes
+        self.scale_up_utilization = scale_up_utilization
+        self.scale_down_utilization = scale_down_utilization
+        self.scale_up_wait = scale_up_wait
+        self.step = max(1, step)
+        self.cooldown = cooldown
+        self.scale_down_cooldown = cooldown * 4 if scale_down_cooldown is None else scale_down_cooldown
+
+    def decide(self, processes, utilization, wait, pending, concurrency, since_change, since_up):
+        '''决定新的子进程数量
+
+        :param processes: 当前的子进程数量
+        :param utilization: 利用率
+        :param wait: 等待时间（秒）
+        :param pending: 等待中的任务数
+        :param concurrency: 每个子进程同时执行的最大任务数
+        :param since_change: 距上一次调整的时间（秒）
+        :param since_up: 距上一次增加子进程的时间（秒）
+        :return: ``(processes, reason)`` ，不需要调整时 ``reason`` 为 ``None``
+        '''
+        if processes < self.min_processes:
+            return self.min_processes, 'below min_processes'
+        if processes > self.max_processes:
+            return self.max_processes, 'above max_processes'
+        if since_change < self.cooldown:
+            return processes, None
+        if processes < self.max_processes:
+            reason = None
+            if wait >= self.scale_up_wait:
+                reason = 'wait {:.3f}s >= {}s'.format(wait, self.scale_up_wait)
+            elif utilization >= self.scale_up_utilization:
+                reason = 'utilization {:.2f} >= {}'.format(utilization, self.scale_up_utilization)
+            if reason:
+                n = max(self.step, int(math.ceil(pending / float(concurrency))))
+                return min(self.max_processes, processes + n), reason
+        if processes > self.min_processes and since_up >= self.scale_down_cooldown:
+            if not pending and utilization <= self.scale_down_utilization:
+                reason = 'utilization {:.2f} <= {}'.format(utilization, self.scale_down_utilization)
+                return max(self.min_processes, processes - self.step), reason
+        return processes, None
+
+
+class _PoolState(object):
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.wait_total = 0.0
+        self.wait_count = 0
+        self.last_change = 0.0
+        self.last_up = 0.0
+        self.scale_ups = 0
+        self.scale_downs = 0
+        self.last_sample = None
+        self.decisions = deque(maxlen=10)
+
+
+class Autoscaler(threading.Thread):
+    '''自动调整子进程数量的后台线程
+
+    :param get_pools: 无参数的可调用对象，返回当前的 ``{名称: WorkerPool}`` 。
+        每次采样时调用，所以执行器重置（替换进程池）后不需要重新创建本对象。
+    :param dict policies: ``{进程池名称: ScalingPolicy}`` ，没有策略的进程池不自动调整
+    :param float interval: 采样间隔（秒）
+    '''
+
+    def __init__(self, get_pools, policies, interval=5):
+        super(Autoscaler, self).__init__(name='autoscaler')
+        self.daemon = True
+        self._get_pools = get_pools
+        self._policies = policies
+        self._interval = interval
+        self._states = {}
+        self._stopped = threading.Event()
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+    def stop(self):
+        self._stopped.set()
+        if self.is_alive() and self is not threading.current_thread():
+            self.join()
+
+    def run(self):
+        while not self._stopped.wait(self._interval):
+            try:
+                self.tick()
+            except Exception:
+                self._logger.exception('error occurred in tick()')
+
+    def tick(self, now=None):
+        '''对各个进程池采样一次，并按需调整'''
+        if now is None:
+            now = time.time()
+        for name, pool in list(self._get_pools().items()):
+            policy = self._policies.get(name)
+            if policy is None:
+                continue
+            state = self._states.get(name)
+            if state is None:
+                state = self._states[name] = _PoolState(pool)
+            elif state.pool is not pool:
+                # 执行器重置后是新的进程池：等待时间重新累计，调整的时间与统计保留，冷却时间仍然有效
+                state.pool = pool
+                state.wait_total = 0.0
+                state.wait_count = 0
+            load = pool.load()
+            count = load['wait_count'] - state.wait_count
+            wait = (load['wait_total'] - state.wait_total) / count if count > 0 else 0.0
+            state.wait_total = load['wait_total']
+            state.wait_count = load['wait_count']
+            wait = max(wait, load['oldest_pending'])
+            utilization = load['busy'] / float(load['processes']) if load['processes'] else 1.0
+            concurrency = load['capacity'] // load['processes'] if load['processes'] else 1
+            state.last_sample = {
+                'time': now,
+                'processes': load['processes'],
+                'utilization': utilization,
+                'wait': wait,
+                'pending': load['pending'],
+            }
+            processes, reason = policy.decide(
+                load['processes'], utilization, wait, load['pending'], concurrency,
+                now - state.last_change, now - state.last_up
+            )
+            if reason is None or processes == load['processes']:
+                continue
+            direction = SCALE_UP if processes > load['processes'] else SCALE_DOWN
+            self._logger.info('pool<%s> scale %s: %s -> %s (%s)', name, direction, load['processes'], processes, reason)
+            pool.resize(processes)
+            state.last_change = now
+            if direction == SCALE_UP:
+                state.last_up = now
+                state.scale_ups += 1
+            else:
+                state.scale_downs += 1
+            state.decisions.append({
+                'time': now,
+                'direction': direction,
+                'from': load['processes'],
+                'to': processes,
+                'reason': reason,
+            })
+
+    def stats(self):
+        '''各个进程池的自动调整统计
+
+        :rtype: dict
+        '''
+        result = {}
+        for name, policy in self._policies.items():
+            state = self._states.get(name)
+            result[name] = {
+                'min_processes': policy.min_processes,
+                'max_processes': policy.max_processes,
+                'scale_ups': state.scale_ups if state else 0,
+                'scale_downs': state.scale_downs if state else 0,
+                'last_sample': state.last_sample if state else None,
+                'decisions': list(state.decisions) if state else [],
+            }
+        return result
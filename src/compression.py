@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+''' 回复的压缩
+
+回复文本不小于 ``threshold`` （字符）时，以 zlib 压缩，并以 Base64 编码为如下的 JSON 文本发送::
+
+    {"jsonrpc": "2.0", "id": "123456", "compression": "zlib", "data": "eJyrVkrLz1eyUkpKLFKqBQA..."}
+
+IPSC 流程（或其插件）收到有 ``compression`` 成员的回复时，将 ``data`` 以 Base64 解码、zlib 解压，得到原来的回复文本。
+``id`` 与原回复相同（批量回复时是其 ``title`` ）。
+
+Base64 使数据增大约 1/3，所以只有压缩率足够高的回复才值得压缩：压缩后的文本不小于原文本时，仍然发送原文本。
+什么样的回复值得压缩，见 ``tests/bench_reply_compression.py`` 。
+
+:date: 2026-10-18
+'''
+
+from __future__ import print_function, unicode_literals, absolute_import
+
+import time
+import zlib
+import base64
+import threading
+
+import jsonrpc
+import jsoncodec
+
+try:
+    _cpu_time = time.thread_time  # 当前线程的 CPU 时间
+except AttributeError:  # Python < 3.7
+    _cpu_time = time.perf_counter
+
+
+def compress(data, level=6, title=None):
+    '''压缩回复文本
+
+    :param str data: 回复文本
+    :param int level: zlib 压缩级别（1-9）
+    :param title: 回复的 ``id``
+    :return: 压缩后的 JSON 文本
+    :rtype: str
+    '''
+    return _compress_bytes(data.encode('utf-8'), level, title)
+
+
+def _compress_bytes(raw, level, title):
+    payload = base64.b64encode(zlib.compress(raw, level)).decode('ascii')
+    return jsoncodec.dumps({'jsonrpc': jsonrpc.jsonrpc_version, 'id': title, 'compression': 'zlib', 'data': payload})
+
+
+def decompress(obj):
+    '''还原压缩的回复
+
+    :param dict obj: 解析后的回复 JSON 对象
+    :return: 原来的回复文本；如果 ``obj`` 不是压缩的回复，返回 ``None``
+    '''
+    if not isinstance(obj, dict) or obj.get('compression') != 'zlib':
+        return None
+    return zlib.decompress(base64.b64decode(obj['data'])).decode('utf-8')
+
+
+class ReplyCompressor(object):
+    '''按方法决定压缩级别，压缩较大的回复，并统计节省的字节数与 CPU 时间
+
+    :param int threshold: 回复文本不小于该长度（字符）时压缩
+    :param int level: 默认的 zlib 压缩级别（1-9）， ``0`` 表示不压缩
+    :param dict methods: 各个方法的压缩级别，键是方法名（ ``"crm.*"`` 表示 ``crm`` 名称空间下的所有方法），值是压缩级别
+    '''
+
+    def __init__(self, threshold=16384, level=6, methods=None):
+        self.threshold = threshold
+        self.level = level
+        self._exact = {}
+        self._prefixes = {}
+        for pattern, method_level in (methods or {}).items():
+            pattern = pattern.strip()
+            if pattern == '*':
+                self.level = method_level
+            elif pattern.endswith('.*'):
+                self._prefixes[pattern[:-2]] = method_level
+            else:
+                self._exact[pattern] = method_level
+        self._lock = threading.Lock()
+        self._compressed = 0
+        self._skipped = 0
+        self._bytes_in = 0
+        self._bytes_out = 0
+        self._cpu_time = 0.0
+
+    def level_for(self, method):
+        '''返回该方法的回复的压缩级别。 ``method`` 为 ``None`` （如批量回复）时返回默认级别'''
+        if method is None:
+            return self.level
+        level = self._exact.get(method)
+        if level is None and self._prefixes:
+            parts = method.split('.')
+            for i in range(len(parts) - 1, 0, -1):
+                level = self._prefixes.get('.'.join(parts[:i]))
+                if level is not None:
+                    break
+        return self.level if level is None else level
+
+    def encode(self, data, title=None, method=None):
+        '''按需压缩回复文本
+
+        :param str data: 回复文本
+        :param title: 回复的 ``id``
+        :param str method: RPC 方法名
+        :return: 要发送的文本，压缩后没有变小时是原文本
+        :rtype: str
+        '''
+        if len(data) < self.threshold:
+            return data
+        level = self.level_for(method)
+        if not level:
+            return data
+        begin = _cpu_time()
+        raw = data.encode('utf-8')
+        compressed = _compress_bytes(raw, level, title)
+        cpu = _cpu_time() - begin
+        with self._lock:
+            self._cpu_time += cpu
+            if len(compressed) >= len(raw):  # 压缩后的文本只有 ASCII 字符
+                self._skipped += 1
+                return data
+            self._compressed += 1
+            self._bytes_in += len(raw)
+            self._bytes_out += len(compressed)
+        return compressed
+
+    def stats(self):
+        '''统计信息
+
+        :rtype: dict
+        '''
+        with self._lock:
+            return {
+                'threshold': self.threshold,
+                'level': self.level,
+                'compressed': self._compressed,
+                'skipped': self._skipped,
+                'bytes_in': self._bytes_in,
+                'bytes_out': self._bytes_out,
+                'bytes_saved': self._bytes_in - self._bytes_out,
+                'cpu_time': self._cpu_time,
+            }
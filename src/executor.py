@@ -18,8 +18,6 @@ import sys
 PY3K = sys.version_info[0] > 2
 import logging
 import time
-import json
-from multiprocessing.pool import Pool
 import threading
 try:
     import queue
@@ -34,21 +32,150 @@ try:
 except ImportError:
     from loggingqueue import QueueHandler
 from functools import partial
+from concurrent.futures import ThreadPoolExecutor, Future
+from collections import OrderedDict, namedtuple
 import importlib
+import pkgutil
 import inspect
+import asyncio
 
 import jsonrpc
+import jsoncodec
 import globalvars
 import settings
+import rpcmethod
+from autoscaler import Autoscaler, ScalingPolicy
+from resultcache import ResultCache, Cacheable
+from singleflight import SingleFlight
+from compression import ReplyCompressor
+from workerpool import WorkerPool, PoolFullError, DeadlineExpiredError, TaskTimeoutError, StreamEnd, \
+    register_stats_provider, get_thread_executor, get_event_loop, set_task_timeout
 
 
-class Executor(QueueListener):
+DEFAULT_POOL = 'default'
+'''默认进程池的名称'''
+
+
+class _DispatchShard(QueueListener):
+    '''执行器的一个分发分片
+
+    每个分片有自己的队列与分发线程，从队列中取出请求，交给 :meth:`Executor.handle` 处理。
+    '''
+
+    def __init__(self, executor, index, queue_maxsize):
+        if PY3K:
+            super().__init__(queue.Queue(queue_maxsize))
+        else:
+            super(_DispatchShard, self).__init__(queue.Queue(queue_maxsize))
+        self.executor = executor
+        self.index = index
+        self.handled = 0
+        self.peak_depth = 0
+
+    def put(self, record):
+        self.queue.put_nowait(record)
+        depth = self.queue.qsize()
+        if depth > self.peak_depth:
+            self.peak_depth = depth
+
+    def handle(self, record):
+        self.executor.handle(record)
+        self.handled += 1
+
+    def stats(self):
+        return {
+            'index': self.index,
+            'depth': self.queue.qsize(),
+            'maxsize': self.queue.maxsize,
+            'peak_depth': self.peak_depth,
+            'handled': self.handled,
+        }
+
+
+class Executor(object):
     '''smarbus JSON RPC 请求执行器
 
-    使用进程池执行 RPC 请求
+    使用进程池（ :class:`workerpool.WorkerPool` ）执行 RPC 请求
 
     :param queue_maxsize: 任务队列最大值
-        默认为0，表示无限制。
+        默认为0，表示无限制。有多个分发分片时，由各个分片的队列平均分配。
+
+    :param pools: 命名的独立进程池
+        默认为 ``None`` ，所有的 RPC 方法都在默认进程池（由 ``pool_*`` 参数设置）中执行。
+        这是一个 ``dict`` ，键是进程池名称，值是该进程池的设置，其属性有：
+
+        * ``methods`` : 在该进程池中执行的方法列表。 ``"db.*"`` 表示 ``db`` 名称空间下的所有方法，其它表示完整的方法名
+        * ``processes`` : 子进程数量
+        * ``queue_maxsize`` : 等待分配的任务的最大数量，0 表示无限制。超过该值的请求立即返回错误
+        * ``maxtasksperchild`` : 每个子进程的最大任务数
+        * ``maxtasks_jitter`` : 每个子进程的最大任务数的随机浮动比例，默认与 ``pool_maxtasks_jitter`` 相同
+        * ``max_rss`` : 子进程常驻内存的上限（MB），默认与 ``pool_max_rss`` 相同
+        * ``shm_threshold`` : 经共享内存传递结果的阈值（KB），默认与 ``pool_shm_threshold`` 相同
+        * ``max_inflight`` : 每个子进程同时执行的最大任务数
+        * ``threads`` : 每个子进程中线程池的线程数
+        * ``timeout`` : 该进程池中方法的执行时间限制（秒），默认与 ``method_timeout`` 相同
+        * ``autoscale`` : 该进程池的自动调整策略，格式与 ``autoscale`` 参数相同
+
+        方法名同时匹配多个进程池时，完整的方法名优先，其次是最长的前缀。
+        这样，慢速的方法（如存储过程）与快速的方法在不同的进程池中执行，互不阻塞。
+
+        .. note:: ``parse_in_worker`` 为 ``True`` 时，主进程不解析请求，所有请求都在默认进程池中执行。
+
+    :param affinity: 方法的亲和键
+        默认为 ``None`` 。这是一个 ``dict`` ，键是方法名（ ``"crm.*"`` 表示 ``crm`` 名称空间下的所有方法， ``"*"`` 表示其它所有方法），值是亲和键的来源：
+
+        * 参数名（如 ``"caller"`` ）：以命名参数或者 ``params`` 对象中的该属性为亲和键
+        * 整数（如 ``0`` ）：以该位置的参数为亲和键
+        * ``"$source"`` ：以请求的来源（ ``srcUnitId`` , ``srcUnitClientId`` ）为亲和键
+
+        亲和键相同的请求通过一致性哈希分配给进程池中的同一个子进程（见 :class:`workerpool.WorkerPool` ），
+        这样，各个子进程的模块级缓存分别保存一部分数据，而不是每个子进程都缓存全部数据。
+        批量请求使用其中第一个有亲和键的调用的亲和键。
+
+    :param reply_compression: 回复的压缩设置
+        默认为 ``None`` ，不压缩。这是一个 ``dict`` ，作为 :class:`compression.ReplyCompressor` 的构造参数，如::
+
+            {"threshold": 16384, "level": 6, "methods": {"report.*": 9, "crm.lookup": 0}}
+
+        不小于 ``threshold`` 字符的回复以 zlib 压缩，并以带有 ``compression`` 成员的 JSON 文本发送（格式见 :mod:`compression` ），
+        压缩级别按方法设置（ ``0`` 表示该方法的回复不压缩），批量回复与 ``parse_in_worker`` 为 ``True`` 时使用默认级别。
+        压缩后没有变小的回复仍以原文本发送。节省的字节数与压缩用时见 :meth:`stats` 。
+
+    :param json_backend: JSON 编解码的后端
+        默认为 ``"auto"`` ，安装了 ``orjson`` 时使用它，否则使用标准库 ``json`` 。
+        也可以指定 ``"orjson"`` 、 ``"ujson"`` 或 ``"json"`` ，指定的后端没有安装时抛出 ``ImportError`` 。
+        ``ujson`` 需要在编码前转换整个返回值（见 :mod:`jsoncodec` ），所以 ``"auto"`` 不选择它。
+        主进程与子进程中所有的 JSON 编码、解码都使用这个后端（见 :mod:`jsoncodec` ）。
+
+    :param json_converters: 自定义的 JSON 类型转换
+        默认为 ``None`` 。RPC 方法的返回值中 JSON 没有对应类型的数据（如 ``datetime`` , ``Decimal`` ）在编码回复时按类型转换，
+        内置的转换见 :mod:`jsoncodec` 。这是一个 ``dict`` ，键是类型的完整名称，值是转换函数的完整名称，如::
+
+            {"decimal.Decimal": "builtins.float", "bson.ObjectId": "builtins.str"}
+
+        这些转换在主进程与各个子进程中注册（见 :func:`jsoncodec.register_paths` ），覆盖同一类型的内置转换。
+
+    :param coalesce: 可合并的方法名列表
+        默认为 ``None`` ，不合并。 ``"crm.*"`` 表示 ``crm`` 名称空间下的所有方法， ``"*"`` 表示所有方法。
+        这些方法的一个调用正在执行时，之后收到的方法名与参数都相同的请求不再分配给子进程，
+        而是与正在执行的调用得到相同的返回值或错误，各自以自己的 ``id`` 回复（见 :class:`singleflight.SingleFlight` ）。
+        正在执行的调用在开始执行之前过期时，附加在它上面的、尚未过期的请求被重新分发。
+        合并的次数见 :meth:`stats` 。批量请求不合并。
+        ``parse_in_worker`` 为 ``True`` 时，主进程不解析请求，只有 ``{"*": "$source"}`` 有效。
+
+    :param admission_high_watermark: 准入控制的高水位
+        默认为 ``None`` ，表示不使用水位控制。
+        所有分片队列中的请求总数达到该值后，执行器拒绝新的请求，直到请求总数降至低水位。
+        被拒绝的请求立即收到 :class:`jsonrpc.OverloadedError` 错误回复（code ``-32000`` ）。
+
+        .. note:: 无论是否设置水位，:meth:`put` 都不会阻塞：分片队列已满时，新的请求同样被拒绝。
+
+    :param admission_low_watermark: 准入控制的低水位
+        默认为 ``None`` ，表示与高水位相同。
+
+    :param dispatcher_shards: 分发分片的数量
+        默认为 1。每个分片有自己的队列与分发线程，请求按照来源（ ``srcUnitId`` , ``srcUnitClientId`` ）分配到固定的分片，
+        所以来自同一个来源的请求按照收到的顺序分发。
 
     :param pool_processes: 执行器池的最大数量
         默认为 none，表示使用 CPU 核心数量作为其最大值
@@ -56,76 +183,572 @@ class Executor(QueueListener):
     :param pool_maxtasksperchild: 进程池最大执行数量
         默认为 None，表示无限制。超过该值，则重启子进程。仅对进程池模型有效。
 
-    在接收到 smartbus 请求后，需要向这个队列放置数据，数据的格式是： ``client, pack_info, txt``
+    :param pool_maxtasks_jitter: 每个子进程的最大任务数的随机浮动比例
+        默认为 0.1，即每个子进程的最大任务数在 ``pool_maxtasksperchild`` 的 ±10% 内随机分布，
+        避免负载均匀时所有子进程同时到达最大任务数、同时重启。
+
+    :param pool_max_rss: 子进程常驻内存（RSS）的上限（MB）
+        默认为 ``None`` ，表示无限制。超过该值的子进程被替换。
+
+        因为最大任务数或者内存而替换子进程时，先启动新的子进程，待其完成初始化后，原子进程才停止接收请求，
+        并且每个进程池同一时间只替换一个子进程。
+
+    :param pool_shm_threshold: 经共享内存传递结果的阈值（KB）
+        默认为 ``None`` ，表示所有结果都经管道传递。
+        序列化后不小于该值的返回值，由子进程写入共享内存段，主进程按名称读取后立即释放（见 :class:`workerpool.WorkerPool` ），
+        避免大的返回值（如报表查询的结果）在管道中被分块复制，占用主进程的结果处理线程。
+
+    :param pool_max_inflight: 每个子进程同时执行的最大任务数
+        默认为 1。协程方法（ ``async def`` ）在子进程常驻的事件循环中执行，
+        该值大于 1 时，一个子进程可以同时执行多个 I/O 密集型的协程方法。
+        子进程正在执行普通（非协程）方法时不会被分配新的请求，其它请求在主进程中等待空闲的子进程。
+
+    :param method_cache_size: 子进程中 RPC 方法名解析缓存的最大条目数
+        默认为 1024。超过该值，按 LRU 规则淘汰。0 表示不缓存。
+
+    :param batch_max_threads: 子进程中并行执行批量请求的最大线程数
+        默认为 8。 1 表示批量请求中的调用按顺序执行。
+        仅当 ``pool_threads`` 为 0 时有效，否则批量请求使用子进程的线程池。
+
+    :param stream_chunk_size: 流式返回时，每个部分回复包含的最大条目数
+        默认为 100。RPC 方法是生成器（或异步生成器）时，子进程每得到这么多项，就将其作为一个部分回复发送，
+        最后发送一个结束回复（见 :doc:`ipsc-integration` ），子进程与主进程都不必在内存中保存全部结果。
+        可以用 :func:`rpcmethod.stream` 为单个方法设置不同的值。
+        ``0`` 表示不分段，生成器的各项被收集为一个列表返回。
+        批量请求与 ``parse_in_worker`` 为 ``True`` 时不分段。
+
+    :param pool_threads: 每个子进程中线程池的线程数
+        默认为 0，表示不使用线程池，普通（非协程）方法在子进程中依次执行。
+        大于 0 时，普通方法在线程池中执行，一个子进程可以同时执行多个阻塞的 I/O 调用。
+        此时每个子进程同时执行的最大任务数不小于该值。
+
+    :param method_timeout: RPC 方法的执行时间限制（秒）
+        默认为 ``None`` ，表示无限制。可以用 :func:`rpcmethod.timeout` 为单个方法设置不同的限制。
+        时间从子进程开始执行请求时计算，不包括请求等待分配、等待执行的时间。
+        执行超时的请求立即收到 :class:`jsonrpc.ExecutionTimeoutError` 错误回复（code ``-32001`` ）。
+        协程方法超时后被取消，同一子进程中的其它请求不受影响；
+        普通方法无法中断，执行它的子进程被杀死并替换，同一子进程中其它执行中的请求收到 ``-32500`` 错误回复。
+        批量请求使用其中各个方法的最长限制。各个方法的超时次数见 :meth:`stats` 。
+
+    :param autoscale: 默认进程池的自动调整策略
+        默认为 ``None`` ，表示子进程数量固定为 ``pool_processes`` 。
+        这是一个 ``dict`` ，作为 :class:`autoscaler.ScalingPolicy` 的构造参数，如::
+
+            {"min_processes": 2, "max_processes": 16, "cooldown": 30}
+
+        执行器根据各个进程池的利用率、任务的等待时间与等待中的任务数，在 ``min_processes`` 与 ``max_processes`` 之间调整子进程数量。
+        调整的决定记录在日志中，并通过 :meth:`stats` 提供。
+
+    :param autoscale_interval: 自动调整的采样间隔（秒）
+        默认为 5。
+
+    :param warmup_modules: 子进程初始化时导入的模块名列表
+        默认为 ``None`` ，不预热。如 ``["methods"]`` ，表示导入 :mod:`methods` 包及其所有子模块，
+        然后执行其中用 :func:`rpcmethod.warmup` 声明的预热函数。
+        子进程在预热完成之后才开始接收请求（启动、重新加载、 ``pool_maxtasksperchild`` 替换子进程时都是如此），
+        这样，请求不必承担导入模块、建立连接的开销。各个子进程的预热用时见 :meth:`stats` 。
+
+    :param reset_ready_timeout: :meth:`reset` 等待新进程池完成初始化的最长时间（秒）
+        默认为 60。超时则放弃重置，继续使用原进程池。
+
+    :param reset_drain_timeout: :meth:`reset` 等待原进程池中执行中的任务完成的最长时间（秒）
+        默认为 30。超时后，原进程池被强行终止，其中仍在执行的请求收到 ``-32500`` 错误回复。
+
+    :param pool_threaded_default: 没有使用 :func:`rpcmethod.threaded` 修饰的普通方法是否在线程池中执行
+        默认为 ``True`` 。
+
+    :param request_ttl: 请求的默认生存期（ms）。默认为 ``None`` ，表示请求没有生存期，除非请求中有 ``ttl`` 成员。
+        请求的截止时间是收到它的时间加上生存期（请求中的 ``ttl`` 优先）。
+        到达截止时间仍未开始执行的请求被丢弃——调用者已经不再等待它的回复，执行它只会浪费子进程。
+        在分发之前、分配给子进程之前、子进程开始执行之前，分别检查截止时间。
+        批量请求使用其成员中最短的 ``ttl`` 。
+        ``parse_in_worker`` 为 ``True`` 时，主进程不解析请求，分发时只能按默认的生存期检查，
+        所以请求中的 ``ttl`` 只能缩短、不能延长默认的生存期。
+
+    :param parse_in_worker: 是否在子进程中解析请求、编码回复
+        默认为 ``False`` ，在主进程中解析请求文本，并在主进程中将返回值编码为 JSON 文本。
+        为 ``True`` 时，主进程将请求的原始文本转发给子进程，由子进程解析、执行，并返回可以直接发送的回复文本，
+        主进程只负责转发与调用 ``sendNotify`` 。
+
+    在接收到 smartbus 请求后，需要调用 :meth:`put` 放置数据，数据的格式是： ``client, pack_info, txt``
     分别是：收到数据的 smartbus 客户端的实例，数据包附加信息，数据文本。
 
     收到数据后，本类型的实例将按照 JSON-RPC 格式解析数据，并执行 JSON RPC 请求，最后将执行结果通过 smartbus 客户端进行返回。
     返回数据格式是符合 JSON RPC 标准的字符串。
     '''
 
-    def __init__(self, queue_maxsize=0, pool_processes=None, pool_maxtasksperchild=None):
-        self._pool_kdargs = dict(
-            processes=pool_processes,
-            initializer=_subproc_init,
-            initargs=(
+    def __init__(self, queue_maxsize=0, pool_processes=None, pool_maxtasksperchild=None,
+                 pool_max_inflight=1, pool_threads=0, pool_threaded_default=True,
+                 method_cache_size=1024, batch_max_threads=8, parse_in_worker=False,
+                 dispatcher_shards=1, pools=None,
+                 admission_high_watermark=None, admission_low_watermark=None, request_ttl=None,
+                 method_timeout=None, reset_ready_timeout=60, reset_drain_timeout=30,
+                 autoscale=None, autoscale_interval=5, warmup_modules=None,
+                 pool_maxtasks_jitter=0.1, pool_max_rss=None, affinity=None, coalesce=None,
+                 pool_shm_threshold=None, stream_chunk_size=100, reply_compression=None,
+                 json_backend='auto', json_converters=None):
+        json_backend = jsoncodec.use(json_backend)
+        jsoncodec.register_paths(json_converters)
+        options = dict(
+            json_backend=json_backend,
+            json_converters=dict(json_converters or {}),
+            method_cache_size=method_cache_size,
+            batch_max_threads=batch_max_threads,
+            stream_chunk_size=stream_chunk_size,
+            threaded_default=pool_threaded_default,
+            warmup_modules=list(warmup_modules or []),
+        )
+
+        def initargs(timeout):
+            return (
                 globalvars.prog_args,
                 globalvars.main_logging_queue,
-                logging.root.level
-            ),
-            maxtasksperchild=pool_maxtasksperchild
+                logging.root.level,
+                dict(options, method_timeout=timeout)
+            )
+
+        self._pool_kdargs = OrderedDict()
+        self._pool_timeouts = {DEFAULT_POOL: method_timeout}
+        self._scaling_policies = {}
+        if autoscale:
+            self._scaling_policies[DEFAULT_POOL] = ScalingPolicy(**autoscale)
+            if pool_processes is None:
+                pool_processes = self._scaling_policies[DEFAULT_POOL].min_processes
+        self._pool_kdargs[DEFAULT_POOL] = dict(
+            processes=pool_processes,
+            initializer=_subproc_init,
+            initargs=initargs(method_timeout),
+            maxtasksperchild=pool_maxtasksperchild,
+            maxtasks_jitter=pool_maxtasks_jitter,
+            max_rss=pool_max_rss * 1024 * 1024 if pool_max_rss else None,
+            shm_threshold=pool_shm_threshold * 1024 if pool_shm_threshold else None,
+            concurrency=max(pool_max_inflight, pool_threads),
+            threads=pool_threads,
+            name=DEFAULT_POOL
         )
-        self._pool = None
-        if PY3K:
-            super().__init__(queue.Queue(queue_maxsize))
-        else:
-            super(Executor, self).__init__(queue.Queue(queue_maxsize))
+        # 路由表在这里一次性解析： ``'a.b.*'`` 形式的前缀，以及完整的方法名
+        self._prefix_routes = {}
+        self._exact_routes = {}
+        for name, cfg in (pools or {}).items():
+            if name in self._pool_kdargs:
+                raise ValueError('duplicated pool name {!r}'.format(name))
+            threads = cfg.get('threads', 0)
+            timeout = cfg.get('timeout', method_timeout)
+            self._pool_timeouts[name] = timeout
+            processes = cfg.get('processes')
+            max_rss = cfg.get('max_rss', pool_max_rss)
+            shm_threshold = cfg.get('shm_threshold', pool_shm_threshold)
+            if cfg.get('autoscale'):
+                self._scaling_policies[name] = ScalingPolicy(**cfg['autoscale'])
+                if processes is None:
+                    processes = self._scaling_policies[name].min_processes
+            self._pool_kdargs[name] = dict(
+                processes=processes,
+                initializer=_subproc_init,
+                initargs=initargs(timeout),
+                maxtasksperchild=cfg.get('maxtasksperchild'),
+                maxtasks_jitter=cfg.get('maxtasks_jitter', pool_maxtasks_jitter),
+                max_rss=max_rss * 1024 * 1024 if max_rss else None,
+                shm_threshold=shm_threshold * 1024 if shm_threshold else None,
+                concurrency=max(cfg.get('max_inflight', 1), threads),
+                threads=threads,
+                max_pending=cfg.get('queue_maxsize', 0),
+                name=name
+            )
+            for pattern in cfg.get('methods', []):
+                pattern = pattern.strip()
+                if pattern.endswith('.*'):
+                    self._prefix_routes[pattern[:-2]] = name
+                else:
+                    self._exact_routes[pattern] = name
+        self._affinity_exact = {}
+        self._affinity_prefix = {}
+        self._affinity_default = None
+        for pattern, source in (affinity or {}).items():
+            pattern = pattern.strip()
+            if pattern == '*':
+                self._affinity_default = source
+            elif pattern.endswith('.*'):
+                self._affinity_prefix[pattern[:-2]] = source
+            else:
+                self._affinity_exact[pattern] = source
+        self._result_cache = ResultCache()
+        self._single_flight = SingleFlight(coalesce)
+        self._compressor = ReplyCompressor(**reply_compression) if reply_compression else None
+        self._pools = OrderedDict()
+        self._parse_in_worker = parse_in_worker
+        if dispatcher_shards < 1:
+            raise ValueError('dispatcher_shards must be at least 1')
+        shard_maxsize = 0
+        if queue_maxsize > 0:
+            shard_maxsize = max(1, -(-queue_maxsize // dispatcher_shards))
+        self._shards = [_DispatchShard(self, i, shard_maxsize) for i in range(dispatcher_shards)]
+        if admission_low_watermark is None:
+            admission_low_watermark = admission_high_watermark
+        if admission_high_watermark is not None and admission_low_watermark > admission_high_watermark:
+            raise ValueError('admission_low_watermark must not be greater than admission_high_watermark')
+        self._high_watermark = admission_high_watermark
+        self._low_watermark = admission_low_watermark
+        self._admission_lock = threading.Lock()
+        self._shedding = False
+        self._shed_count = 0
+        self._request_ttl = request_ttl
+        self._expired_count = 0
+        self._timeouts = {}
+        self._reset_ready_timeout = reset_ready_timeout
+        self._reset_drain_timeout = reset_drain_timeout
+        self._reset_lock = threading.Lock()
+        self._last_reset = None
+        self._autoscale_interval = autoscale_interval
+        self._autoscaler = None
         if PY3K:
             self._logger = logging.getLogger(self.__class__.__qualname__)
         else:
             self._logger = logging.getLogger(self.__class__.__name__)
 
     def put(self, client, pack_info, txt):
-        self.queue.put((client, pack_info, txt, time.time()))
+        '''放置一个请求
+
+        该方法不会阻塞。执行器过载时，请求被拒绝，并立即向调用者返回 :class:`jsonrpc.OverloadedError` 错误。
+
+        :return: 请求是否被接受
+        :rtype: bool
+        '''
+        if self._high_watermark is not None and not self._admit():
+            self._reject(client, pack_info, txt)
+            return False
+        shard = self._shards[hash((pack_info.srcUnitId, pack_info.srcUnitClientId)) % len(self._shards)]
+        try:
+            shard.put((client, pack_info, txt, time.time()))
+        except queue.Full:
+            self._reject(client, pack_info, txt)
+            return False
+        return True
+
+    def _admit(self):
+        depth = sum(shard.queue.qsize() for shard in self._shards)
+        if self._shedding:
+            if depth <= self._low_watermark:
+                with self._admission_lock:
+                    if self._shedding:
+                        self._shedding = False
+                        self._logger.warning('admission: queue depth %s <= low watermark %s, stop shedding (shed=%s)',
+                                             depth, self._low_watermark, self._shed_count)
+                return True
+            return False
+        if depth >= self._high_watermark:
+            with self._admission_lock:
+                if not self._shedding:
+                    self._shedding = True
+                    self._logger.warning('admission: queue depth %s >= high watermark %s, start shedding',
+                                         depth, self._high_watermark)
+            return False
+        return True
+
+    def _reject(self, client, pack_info, txt):
+        '''拒绝请求，立即返回 :class:`jsonrpc.OverloadedError` 错误'''
+        with self._admission_lock:
+            self._shed_count += 1
+        self._reply_error(client, pack_info, txt, jsonrpc.OverloadedError)
+
+    def _reply_error(self, client, pack_info, txt, error_class, data=None):
+        '''不经执行，直接以 ``error_class`` 错误回复请求文本 ``txt`` 中的（各个）请求
+
+        :return: 解析后的请求 JSON 对象，无法解析时返回 ``None``
+        '''
+        obj = None
+        try:
+            obj = jsoncodec.loads(txt)
+            if isinstance(obj, dict):
+                _id = obj.get('id')
+                if not _id:
+                    return obj
+                title = _id
+                response = error_class(id_=_id, data=data).to_dict()
+            elif isinstance(obj, list):
+                response = []
+                title = None
+                for member in obj:
+                    _id = member.get('id') if isinstance(member, dict) else None
+                    if _id is not None:
+                        response.append(error_class(id_=_id, data=data).to_dict())
+                        if title is None:
+                            title = _id
+                if not response:
+                    return obj
+            else:
+                return obj
+            data = jsoncodec.dumps(response)
+            self._send(client, pack_info, title, data)
+        except Exception as e:
+            self._logger.error('error occurred in _reply_error():\n    error: %s %s', type(e), e)
+        return obj
+
+    def _send(self, client, pack_info, title, data, method=None):
+        '''发送回复，较大的回复按 ``reply_compression`` 设置压缩'''
+        if self._compressor is not None:
+            data = self._compressor.encode(data, title, method)
+        client.sendNotify(pack_info.srcUnitId, pack_info.srcUnitClientId, None, title, 0, settings.SMARTBUS_NOTIFY_TTL, data)
 
     def start(self):
         self._logger.info('start() >>>. pool arguments: %s', self._pool_kdargs)
-        self._pool = Pool(**self._pool_kdargs)
-        if PY3K:
-            super().start()
-        else:
-            super(Executor, self).start()
+        for name, kdargs in self._pool_kdargs.items():
+            self._pools[name] = WorkerPool(**kdargs)
+        for shard in self._shards:
+            shard.start()
+        if self._scaling_policies:
+            self._autoscaler = Autoscaler(lambda: self._pools, self._scaling_policies, self._autoscale_interval)
+            self._autoscaler.start()
         self._logger.info('start() <<<')
 
+    def stats(self):
+        '''执行器的统计信息
+
+        :rtype: dict
+        '''
+        return {
+            'admission': {
+                'shedding': self._shedding,
+                'shed': self._shed_count,
+                'high_watermark': self._high_watermark,
+                'low_watermark': self._low_watermark,
+            },
+            'deadline': {
+                'request_ttl': self._request_ttl,
+                'expired': self._expired_count,
+            },
+            'timeouts': dict(self._timeouts),
+            'result_cache': self._result_cache.stats(),
+            'coalesce': self._single_flight.stats(),
+            'compression': self._compressor.stats() if self._compressor else None,
+            'json': jsoncodec.stats(),
+            'last_reset': self._last_reset,
+            'autoscale': self._autoscaler.stats() if self._autoscaler else {},
+            'shards': [shard.stats() for shard in self._shards],
+            'pools': dict((name, pool.stats()) for name, pool in self._pools.items()),
+        }
+
+    def reset(self):
+        '''不中断服务地替换所有进程池（蓝绿切换），用于重新加载 :mod:`methods` 包
+
+        1. 按照原有的设置创建新的进程池，等待其所有子进程完成初始化；
+        2. 将新的请求交给新的进程池执行，原进程池中等待分配的请求也转交给新的进程池；
+        3. 等待原进程池中执行中的请求完成（最长 ``reset_drain_timeout`` 秒），然后结束原进程池。
+
+        分发分片在重置期间继续工作，队列中的请求不会丢失。
+
+        :return: 重置的统计，属性有： ``swap`` 从开始到切换到新进程池所用的时间（秒）；
+            ``drain`` 等待原进程池所用的时间（秒）； ``drained`` 原进程池中的请求是否全部完成
+        :rtype: dict
+        :raises RuntimeError: 新进程池没有在 ``reset_ready_timeout`` 秒内完成初始化
+        '''
+        with self._reset_lock:
+            self._logger.warning('reset() >>>')
+            begin_time = time.time()
+            new_pools = OrderedDict()
+            try:
+                for name, kdargs in self._pool_kdargs.items():
+                    if name in self._pools:  # 保持自动调整后的子进程数量
+                        kdargs = dict(kdargs, processes=self._pools[name].processes)
+                    new_pools[name] = WorkerPool(**kdargs)
+                ready_deadline = begin_time + self._reset_ready_timeout
+                for name, pool in new_pools.items():
+                    if not pool.wait_ready(max(0, ready_deadline - time.time())):
+                        raise RuntimeError('pool<{}> not ready in {}s'.format(name, self._reset_ready_timeout))
+            except Exception:
+                for pool in new_pools.values():
+                    pool.terminate()
+                for pool in new_pools.values():
+                    pool.join()
+                raise
+            old_pools, self._pools = self._pools, new_pools
+            self._result_cache.invalidate()
+            for name, pool in old_pools.items():
+                pool.close(handoff=new_pools[name])
+            swap_time = time.time()
+            self._logger.warning('reset(): swapped to new pools in %.3fs', swap_time - begin_time)
+            drain_deadline = swap_time + self._reset_drain_timeout
+            drained = True
+            for name, pool in old_pools.items():
+                if not pool.join(max(0, drain_deadline - time.time())):
+                    drained = False
+                    self._logger.warning('reset(): pool<%s> not drained in %ss, terminate it', name, self._reset_drain_timeout)
+                    pool.terminate(fail_inflight=True)
+                    pool.join()
+            result = {
+                'swap': swap_time - begin_time,
+                'drain': time.time() - swap_time,
+                'drained': drained,
+            }
+            self._last_reset = dict(result, time=begin_time)
+            self._logger.warning('reset() <<< %s', result)
+            return result
+
+    def invalidate_cache(self, methods=None):
+        '''清除返回值缓存
+
+        :param methods: 方法名的列表， ``"crm.*"`` 表示 ``crm`` 名称空间下的所有方法。 ``None`` 表示全部
+        :return: 被清除的条目数
+        '''
+        count = self._result_cache.invalidate(methods)
+        self._logger.info('invalidate_cache(%s): %s entries', methods, count)
+        return count
+
     def stop(self):
         self._logger.info('stop() >>>')
-        super().stop()
-        self._logger.debug('pool.terminate() ...')
-        self._pool.terminate()
-        self._logger.debug('pool.join() ...')
-        self._pool.join()
-        self._pool = None
+        if self._autoscaler is not None:
+            self._autoscaler.stop()
+            self._autoscaler = None
+        for shard in self._shards:
+            shard.stop()
+        for name, pool in self._pools.items():
+            self._logger.debug('pool<%s>.terminate() ...', name)
+            pool.terminate()
+        for name, pool in self._pools.items():
+            self._logger.debug('pool<%s>.join() ...', name)
+            pool.join()
+        self._pools.clear()
         self._logger.info('stop() <<<')
 
+    def _deadline(self, begin_time, ttl=None):
+        '''计算请求的截止时间
+
+        :param ttl: 请求中的 ``ttl`` （ms），优先于默认的 ``request_ttl``
+        '''
+        if ttl is None:
+            ttl = self._request_ttl
+        if ttl is None:
+            return None
+        return begin_time + ttl / 1000.0
+
+    def _expired(self, deadline, record):
+        '''如果请求已经过期，计数并返回 ``True``'''
+        if deadline is None or time.time() < deadline:
+            return False
+        with self._admission_lock:
+            self._expired_count += 1
+        self._logger.warning('request expired before dispatch:\n    duration=%s\n    request=%s',
+                             time.time() - record[3], record)
+        return True
+
+    def _count_timeouts(self, methods):
+        with self._admission_lock:
+            for method in methods:
+                self._timeouts[method] = self._timeouts.get(method, 0) + 1
+
+    def _affinity_key(self, pack_info, method, args=(), kwargs={}):
+        '''返回请求的亲和键，没有则返回 ``None``'''
+        source = self._affinity_exact.get(method)
+        if source is None and self._affinity_prefix:
+            parts = method.split('.')
+            for i in range(len(parts) - 1, 0, -1):
+                source = self._affinity_prefix.get('.'.join(parts[:i]))
+                if source is not None:
+                    break
+        if source is None:
+            source = self._affinity_default
+        if source is None:
+            return None
+        if source == '$source':
+            return (pack_info.srcUnitId, pack_info.srcUnitClientId)
+        try:
+            if isinstance(source, int):
+                return (method, args[source])
+            return (method, kwargs[source])
+        except (IndexError, KeyError):
+            return None
+
+    def _flight_callbacks(self, key, callback, error_callback, partial_callback):
+        '''包装可合并调用的回调函数，使附加在该调用上的请求得到相同的结果'''
+        state = {}
+
+        def _leave():
+            # 流式返回的第一个部分结果到达时即结束合并：之后的相同请求不能再得到完整的结果
+            if 'waiters' not in state:
+                state['waiters'] = self._single_flight.leave(key)
+            return state['waiters']
+
+        def _callback(result):
+            waiters = _leave()
+            callback(result)
+            for waiter_callback, _, _, _ in waiters:
+                waiter_callback(result)
+
+        def _error_callback(error):
+            waiters = _leave()
+            error_callback(error)
+            exc = error if isinstance(error, Exception) else error.exc
+            for _, waiter_error_callback, retry, _ in waiters:
+                if isinstance(exc, DeadlineExpiredError):
+                    # 过期的只是第一个请求，其它请求可能仍在生存期内，重新分发（已过期的在分发之前被丢弃）
+                    retry()
+                else:
+                    waiter_error_callback(error)
+
+        def _partial_callback(seq, chunk):
+            waiters = _leave()
+            partial_callback(seq, chunk)
+            for _, _, _, waiter_partial_callback in waiters:
+                waiter_partial_callback(seq, chunk)
+
+        return _callback, _error_callback, _partial_callback
+
+    def _route(self, method):
+        '''返回执行该方法的进程池名称'''
+        name = self._exact_routes.get(method)
+        if name is not None:
+            return name
+        if self._prefix_routes:
+            parts = method.split('.')
+            for i in range(len(parts) - 1, 0, -1):
+                name = self._prefix_routes.get('.'.join(parts[:i]))
+                if name is not None:
+                    return name
+        return DEFAULT_POOL
+
     def handle(self, record):
         if globalvars.prog_args.verbose:
             self._logger.debug('handle(record=%s)', record)
+        if self._parse_in_worker:
+            self._handle_raw(record)
+            return
         request = None
         try:
             client, pack_info, txt, begin_time = record
             try:
-                request, _, _ = jsonrpc.parse(txt)
+                request = jsonrpc.parse(txt)
             except Exception as e:
                 if globalvars.prog_args.verbose:
                     self._logger.error(
                         'JSONRPC parse error: %s %s', type(e), e)
-            if request:
-                _id = request.get('id')
-                _method = request['method']
-                _args = request['args']
-                _kwargs = request['kwargs']
+            if isinstance(request, list):
+                self._handle_batch(record, request)
+            elif isinstance(request, jsonrpc.Request):
+                _id = request.id
+                _method = request.method
+                _args = request.args
+                _kwargs = request.kwargs
+                deadline = self._deadline(begin_time, request.ttl)
+                if self._expired(deadline, record):
+                    return
 
                 def _callback(result):
                     try:
+                        if isinstance(result, Cacheable):
+                            self._result_cache.put(_method, _args, _kwargs, result)
+                            result = result.value
+                        if isinstance(result, StreamEnd):  # 流式返回结束，发送结束回复
+                            if _id:
+                                response = {
+                                    'jsonrpc': jsonrpc.jsonrpc_version,
+                                    'id': _id,
+                                    'result': [],
+                                    'seq': result.count,
+                                    'more': False,
+                                }
+                                data = jsoncodec.dumps(response)
+                                self._send(client, pack_info, _id, data, _method)
+                            return
                         if isinstance(result, Exception):  # 如果返回结果是异常，就返回错误结果，并抛出异常
                             error = result
                             if _id:  # 如果有 RPC ID ，就需要返回错误结果
@@ -142,8 +765,8 @@ class Executor(QueueListener):
                                             'data': None,
                                         }
                                     }
-                                data = json.dumps(response)
-                                client.sendNotify(pack_info.srcUnitId, pack_info.srcUnitClientId, None, _id, 0, settings.SMARTBUS_NOTIFY_TTL, data)
+                                data = jsoncodec.dumps(response)
+                                self._send(client, pack_info, _id, data, _method)
                             raise error  # 抛出异常
                         if globalvars.prog_args.verbose:
                             self._logger.debug(
@@ -157,8 +780,8 @@ class Executor(QueueListener):
                                 'id': _id,
                                 'result': result,
                             }
-                            data = json.dumps(response)
-                            client.sendNotify(pack_info.srcUnitId, pack_info.srcUnitClientId, None, _id, 0, settings.SMARTBUS_NOTIFY_TTL, data)
+                            data = jsoncodec.dumps(response)
+                            self._send(client, pack_info, _id, data, _method)
                     except Exception as e:
                         if globalvars.prog_args.verbose:
                             self._logger.exception(
@@ -174,6 +797,15 @@ class Executor(QueueListener):
                         # ExceptionWithTraceback should derive from Exception
                         if not isinstance(error, Exception):
                             error = error.exc
+                        if isinstance(error, DeadlineExpiredError):  # 调用者已经不再等待，不回复
+                            self._logger.warning(
+                                'request expired:\n    %s\n    duration=%s\n    request=%s',
+                                error, time.time() - begin_time, record
+                            )
+                            return
+                        if isinstance(error, TaskTimeoutError):
+                            self._count_timeouts([_method])
+                            error = jsonrpc.ExecutionTimeoutError(data=str(error))
                         if globalvars.prog_args.verbose:
                             self._logger.exception(
                                 'error callback:\n    duration=%s\n    request=%s:\n  %s %s',
@@ -199,8 +831,8 @@ class Executor(QueueListener):
                                         'data': None,
                                     }
                                 }
-                            data = json.dumps(response)
-                            client.sendNotify(pack_info.srcUnitId, pack_info.srcUnitClientId, None, _id, 0, settings.SMARTBUS_NOTIFY_TTL, data)
+                            data = jsoncodec.dumps(response)
+                            self._send(client, pack_info, _id, data, _method)
                     except Exception as e:
                         if globalvars.prog_args.verbose:
                             self._logger.exception(
@@ -210,21 +842,57 @@ class Executor(QueueListener):
                                 'error occurred in handle._error_callback():\n    error=%s', e)
                 pass  # end of _error_callback
 
+                def _partial_callback(seq, chunk):
+                    try:
+                        if _id:  # 如果有 RPC ID ，就需要发送部分回复
+                            response = {
+                                'jsonrpc': jsonrpc.jsonrpc_version,
+                                'id': _id,
+                                'result': chunk,
+                                'seq': seq,
+                                'more': True,
+                            }
+                            data = jsoncodec.dumps(response)
+                            self._send(client, pack_info, _id, data, _method)
+                    except Exception as e:
+                        self._logger.error(
+                            'error occurred in handle._partial_callback():\n    error: %s %s', type(e), e)
+                pass  # end of _partial_callback
+
+                hit, value = self._result_cache.get(_method, _args, _kwargs)
+                if hit:
+                    if globalvars.prog_args.verbose:
+                        self._logger.debug('result cache hit: %s(%s, %s)', _method, _args, _kwargs)
+                    _callback(value)
+                    return
+                flight_key = self._single_flight.key(_method, _args, _kwargs)
+                if flight_key is not None:
+                    waiter = (_callback, _error_callback, partial(self.handle, record), _partial_callback)
+                    if not self._single_flight.join(flight_key, waiter):
+                        if globalvars.prog_args.verbose:
+                            self._logger.debug('coalesced: %s(%s, %s)', _method, _args, _kwargs)
+                        return
+                    _callback, _error_callback, _partial_callback = self._flight_callbacks(
+                        flight_key, _callback, _error_callback, _partial_callback)
                 if globalvars.prog_args.verbose:
                     self._logger.debug('pool.apply_async(%s, %s, %s)', _method, _args, _kwargs)
-                if sys.version_info[0] < 3:
-                    self._pool.apply_async(
-                        func=partial(_poolfunc, _method),
-                        args=(_args, _kwargs),
-                        callback=_callback
-                    )
-                else:
-                    self._pool.apply_async(
-                        func=partial(_poolfunc, _method),
+                try:
+                    pool_name = self._route(_method)
+                    self._pools[pool_name].apply_async(
+                        func=partial(_poolfunc, _method, wrap_cacheable=True, stream=True),
                         args=(_args, _kwargs),
                         callback=_callback,
-                        error_callback=_error_callback
+                        error_callback=_error_callback,
+                        partial_callback=_partial_callback,
+                        deadline=deadline,
+                        timeout=self._pool_timeouts[pool_name],
+                        affinity=self._affinity_key(pack_info, _method, _args, _kwargs)
                     )
+                except PoolFullError as e:
+                    _error_callback(jsonrpc.OverloadedError(data=str(e)))
+                except Exception as e:
+                    # 没能分发时也必须经过回调：合并的调用因此结束，附加在它上面的请求各自得到错误回复
+                    _error_callback(e)
 
         except Exception as e:
             if globalvars.prog_args.verbose:
@@ -236,37 +904,546 @@ class Executor(QueueListener):
                     type(e), e)
 
 
+    def _handle_batch(self, record, items):
+        '''处理批量请求
+
+        批量请求中的调用按照方法所属的进程池分组，每一组作为一个任务交给对应的进程池，
+        由子进程（尽可能并行地）执行其中的各个调用。
+        所有回复合并为一个 JSON 数组，通过一次 ``sendNotify`` 返回。
+        如果有任何一组因过期而没有执行，整个批量请求都不回复。
+
+        回复的 ``title`` 参数是该批量请求中第一个非 ``null`` 的 ``id`` 。
+        如果批量请求全部是通知（没有 ``id`` ），则不返回任何数据。
+        '''
+        client, pack_info, txt, begin_time = record
+        title, responses, ids, calls = _split_batch(items)
+        ttls = [item.ttl for item in items if isinstance(item, jsonrpc.Request) and item.ttl is not None]
+        deadline = self._deadline(begin_time, min(ttls) if ttls else None)
+        if self._expired(deadline, record):
+            return
+        expired = [False]
+        outcomes = [None] * len(calls)
+        groups = OrderedDict()
+        for i, call in enumerate(calls):
+            groups.setdefault(self._route(call[0]), []).append(i)
+        remaining = [len(groups)]
+        lock = threading.Lock()
+
+        def _send(responses):
+            if responses:
+                data = jsoncodec.dumps(responses)
+                self._send(client, pack_info, title, data)
+
+        def _done(indices, group_outcomes):
+            for i, outcome in zip(indices, group_outcomes):
+                outcomes[i] = outcome
+            with lock:
+                remaining[0] -= 1
+                if remaining[0] > 0:
+                    return
+            if globalvars.prog_args.verbose:
+                self._logger.debug(
+                    'batch call back:\n    outcomes=%s\n    duration=%s\n    request=%s',
+                    outcomes, time.time() - begin_time, record
+                )
+            if expired[0]:
+                return
+            for _id, (ok, value) in zip(ids, outcomes):
+                if _id is None:
+                    continue
+                if ok:
+                    responses.append({'jsonrpc': jsonrpc.jsonrpc_version, 'id': _id, 'result': value})
+                else:
+                    responses.append({'jsonrpc': jsonrpc.jsonrpc_version, 'id': _id, 'error': value})
+            _send(responses)
+
+        def _callback(indices, group_outcomes):
+            try:
+                _done(indices, group_outcomes)
+            except Exception as e:
+                if globalvars.prog_args.verbose:
+                    self._logger.exception(
+                        'error occurred in _handle_batch._callback():\n    request=%s', record)
+                else:
+                    self._logger.error(
+                        'error occurred in _handle_batch._callback():\n    error=%s', e)
+
+        def _error_callback(indices, error):
+            try:
+                if not isinstance(error, Exception):
+                    error = error.exc
+                if isinstance(error, DeadlineExpiredError):
+                    expired[0] = True
+                elif isinstance(error, TaskTimeoutError):
+                    self._count_timeouts(calls[i][0] for i in indices)
+                self._logger.error(
+                    'batch error callback:\n    %s %s\n    duration=%s\n    request=%s',
+                    type(error), error, time.time() - begin_time, record
+                )
+                err_obj = _error_to_dict(error)
+                _done(indices, [(False, err_obj)] * len(indices))
+            except Exception as e:
+                if globalvars.prog_args.verbose:
+                    self._logger.exception(
+                        'error occurred in _handle_batch._error_callback():\n    request=%s', record)
+                else:
+                    self._logger.error(
+                        'error occurred in _handle_batch._error_callback():\n    error=%s', e)
+
+        if not calls:
+            _send(responses)
+            return
+        for name, indices in groups.items():
+            group_calls = [calls[i] for i in indices]
+            affinity = None
+            for method, args, kwds in group_calls:
+                affinity = self._affinity_key(pack_info, method, args, kwds)
+                if affinity is not None:
+                    break
+            if globalvars.prog_args.verbose:
+                self._logger.debug('pool<%s>.apply_async(_poolfunc_batch, %s)', name, group_calls)
+            try:
+                self._pools[name].apply_async(
+                    func=_poolfunc_batch,
+                    args=(group_calls,),
+                    callback=partial(_callback, indices),
+                    error_callback=partial(_error_callback, indices),
+                    deadline=deadline,
+                    timeout=self._pool_timeouts[name],
+                    affinity=affinity
+                )
+            except PoolFullError as e:
+                _error_callback(indices, e)
+
+    def _handle_raw(self, record):
+        '''将请求的原始文本转发给子进程
+
+        子进程返回 ``None`` （不需要回复），或者 ``(title, data)`` ，主进程直接用它们调用 ``sendNotify``
+
+        主进程不解析请求，所以这里只检查默认的 ``request_ttl`` ，请求中的 ``ttl`` 由子进程在解析后检查。
+        进程池本身的错误（子进程意外退出、执行超时、等待队列已满等）与主进程解析请求时一样以错误回复，只有过期的请求不回复。
+        '''
+        client, pack_info, txt, begin_time = record
+        deadline = self._deadline(begin_time)
+        if self._expired(deadline, record):
+            return
+
+        def _callback(reply):
+            try:
+                if globalvars.prog_args.verbose:
+                    self._logger.debug(
+                        'raw call back:\n    reply=%s\n    duration=%s\n    request=%s',
+                        reply, time.time() - begin_time, record
+                    )
+                if reply is not None:
+                    title, data = reply
+                    self._send(client, pack_info, title, data)
+            except Exception as e:
+                if globalvars.prog_args.verbose:
+                    self._logger.exception(
+                        'error occurred in _handle_raw._callback():\n    request=%s', record)
+                else:
+                    self._logger.error(
+                        'error occurred in _handle_raw._callback():\n    error: %s %s', type(e), e)
+
+        def _error_callback(error):
+            # 子进程已经将 RPC 方法的异常编码为回复，到这里的只有进程池本身的错误（如子进程意外退出、请求过期、执行超时）
+            if not isinstance(error, Exception):
+                error = error.exc
+            if isinstance(error, DeadlineExpiredError):  # 调用者已经不再等待，不回复
+                self._logger.warning(
+                    'raw request expired:\n    %s\n    duration=%s\n    request=%s',
+                    error, time.time() - begin_time, record
+                )
+                return
+            self._logger.error(
+                'raw error callback:\n    %s %s\n    duration=%s\n    request=%s',
+                type(error), error, time.time() - begin_time, record
+            )
+            if isinstance(error, TaskTimeoutError):
+                obj = self._reply_error(client, pack_info, txt, jsonrpc.ExecutionTimeoutError, str(error))
+                members = obj if isinstance(obj, list) else [obj]
+                self._count_timeouts(m['method'] for m in members if isinstance(m, dict) and 'method' in m)
+            elif isinstance(error, PoolFullError):
+                self._reply_error(client, pack_info, txt, jsonrpc.OverloadedError, str(error))
+            else:  # 与主进程解析请求时相同，以 -32500 错误回复
+                self._reply_error(client, pack_info, txt,
+                                  partial(jsonrpc.Error, message='{} {}'.format(type(error), error)))
+
+        raw_affinity = None
+        if self._affinity_default == '$source':
+            raw_affinity = (pack_info.srcUnitId, pack_info.srcUnitClientId)
+        try:
+            self._pools[DEFAULT_POOL].apply_async(
+                func=_poolfunc_raw,
+                args=(txt, begin_time),
+                callback=_callback,
+                error_callback=_error_callback,
+                deadline=deadline,
+                timeout=self._pool_timeouts[DEFAULT_POOL],
+                affinity=raw_affinity
+            )
+        except PoolFullError as e:
+            _error_callback(e)
+        except Exception as e:
+            if globalvars.prog_args.verbose:
+                self._logger.exception(
+                    'error occurred in _handle_raw():\n    request=%s', record)
+            else:
+                self._logger.error(
+                    'error occurred in _handle_raw():\n    error: %s %s',
+                    type(e), e)
+
+def _split_batch(items):
+    '''拆分 :func:`jsonrpc.parse` 返回的批量请求
+
+    :return: ``(title, responses, ids, calls)`` ，分别是：回复的 title （第一个非 ``null`` 的 ``id`` ），
+        无效成员的错误回复列表，有效请求的 ``id`` 列表，以及与之对应的 ``(method, args, kwds)`` 列表
+    '''
+    responses = []
+    ids = []
+    calls = []
+    title = None
+    for item in items:
+        if isinstance(item, jsonrpc.Error):
+            _id = item.id
+            responses.append(item.to_dict())
+        else:
+            _id = item.id
+            ids.append(_id)
+            calls.append((item.method, item.args, item.kwargs))
+        if title is None:
+            title = _id
+    return title, responses, ids, calls
+
+
+def _error_to_dict(error):
+    '''将异常转为 JSON RPC 的 Error 对象（dict）'''
+    if isinstance(error, PoolFullError):
+        error = jsonrpc.OverloadedError(data=str(error))
+    elif isinstance(error, TaskTimeoutError):
+        error = jsonrpc.ExecutionTimeoutError(data=str(error))
+    if isinstance(error, jsonrpc.Error):
+        return {'code': error.code, 'message': error.message, 'data': error.data}
+    return {
+        'code':-32500,
+        'message': '{} {}'.format(type(error), error),
+        'data': None,
+    }
+
+
 mod_map_lock = threading.Lock()
-mod_map = {}
+mod_map = OrderedDict()
+'''RPC 方法名 -> 可调用对象 的 LRU 缓存
+
+每个子进程各有一份，子进程启动时为空。命中时不加锁读取；调整 LRU 顺序、写入与命中统计在 :data:`mod_map_lock` 下进行，
+该锁只保护这些短操作，未命中时的导入在锁外进行，不会让命中的调用等待。
+'''
+mod_map_maxsize = 1024
+mod_map_hits = 0
+mod_map_misses = 0
+_mod_map_report_time = 0
+
+MOD_MAP_REPORT_INTERVAL = 60
+'''子进程在日志中输出方法缓存命中统计的最小间隔（秒）'''
 
+batch_max_threads = 8
+threaded_default = True
+method_timeout = None
+stream_chunk_size = 100
+_batch_executor = None
+_serial_executor = None
+_batch_executor_lock = threading.Lock()
 
-def _poolfunc(method, args=(), kwds={}):
+MethodCacheInfo = namedtuple('MethodCacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+def method_cache_info():
+    '''返回当前进程的 RPC 方法缓存统计
+
+    :rtype: MethodCacheInfo
+    '''
+    return MethodCacheInfo(mod_map_hits, mod_map_misses, mod_map_maxsize, len(mod_map))
+
+
+def _resolve_method(method):
+    '''将 RPC 方法名解析为 :mod:`methods` 包中的可调用对象
+
+    :param str method: RPC 方法名
+    '''
+    global mod_map_hits, mod_map_misses
+    curr_obj = mod_map.get(method)
+    if curr_obj is not None:
+        with mod_map_lock:
+            mod_map_hits += 1
+            if method in mod_map:  # 可能已被其它线程淘汰
+                mod_map.move_to_end(method)
+        return curr_obj
+    with mod_map_lock:
+        mod_map_misses += 1
+    # 在锁外导入：同一方法同时未命中的线程各自解析，import 本身由导入系统的锁保护
+    mothods_mod_name = 'methods'
+    curr_obj = importlib.import_module(mothods_mod_name)
+    loaded_parts = [mothods_mod_name]
+    for part in method.split('.'):
+        loaded_parts.append(part)
+        try:
+            curr_obj = getattr(curr_obj, part)
+        except AttributeError:
+            if inspect.ismodule(curr_obj):
+                curr_obj = importlib.import_module('.'.join(loaded_parts))
+            else:
+                raise
+    if mod_map_maxsize > 0:
+        with mod_map_lock:
+            mod_map[method] = curr_obj
+            while len(mod_map) > mod_map_maxsize:
+                mod_map.popitem(last=False)
+    return curr_obj
+
+
+def _report_method_cache(logger):
+    global _mod_map_report_time
+    now = time.time()
+    if now - _mod_map_report_time >= MOD_MAP_REPORT_INTERVAL:
+        _mod_map_report_time = now
+        logger.info('method cache: %s', method_cache_info())
+
+
+def _poolfunc(method, args=(), kwds={}, wrap_cacheable=False, stream=False):
     '''该函数包装了个子进程池调用动态RPC方法
     
     :param str method: RPC 方法名。该方法对应了 :pack:`methods` 下的可调用对象
+    :param bool wrap_cacheable: 如果 RPC 方法可以缓存（见 :func:`rpcmethod.cacheable` ），
+        将其返回值包装为 :class:`resultcache.Cacheable` ，由主进程写入缓存
+    :param bool stream: 如果 RPC 方法返回生成器，是否将其分段（见 :func:`rpcmethod.stream` ），
+        返回产生各段的生成器，由进程池逐段发送给主进程。为 ``False`` 时，生成器的各项被收集为列表
+
+    如果 RPC 方法是协程函数（ ``async def`` ），返回一个协程，由子进程在其常驻的事件循环中执行。
+    如果 RPC 方法需要在线程池中执行（见 :func:`rpcmethod.threaded` ），返回一个 :class:`concurrent.futures.Future` 。
     '''
     _logger = logging.getLogger('executor.poolfunc')
-    mothods_mod_name = 'methods'
-    curr_obj = importlib.import_module(mothods_mod_name)
-    loaded_parts = [mothods_mod_name]
-    _method_parts = method.split('.')
-    with mod_map_lock:
-        for part in _method_parts:
-            loaded_parts.append(part)
-            try:
-                curr_obj = getattr(curr_obj, part)
-            except AttributeError:
-                if inspect.ismodule(curr_obj):
-                    curr_obj = importlib.import_module('.'.join(loaded_parts))
-                else:
-                    raise
-    _logger.debug('>>> %s() <%s> args=%s kwds=%s', method, curr_obj, args, kwds)
-    result = curr_obj(*args, **kwds)
+    curr_obj = _resolve_method(method)
+    _report_method_cache(_logger)
+    timeout = rpcmethod.get_option(curr_obj, 'timeout', method_timeout)
+    if timeout != method_timeout:
+        set_task_timeout(timeout)
+    chunk_size = rpcmethod.get_option(curr_obj, 'stream', stream_chunk_size) if stream else 0
+    call = partial(_call_method, chunk_size=chunk_size)
+    if wrap_cacheable:
+        cache_options = rpcmethod.get_option(curr_obj, 'cacheable')
+        if cache_options:
+            call = partial(_call_cacheable, cache_options, chunk_size=chunk_size)
+    if not inspect.iscoroutinefunction(curr_obj):
+        thread_executor = get_thread_executor()
+        if thread_executor is not None and rpcmethod.get_option(curr_obj, 'threaded', threaded_default):
+            return thread_executor.submit(call, method, curr_obj, args, kwds)
+    return call(method, curr_obj, args, kwds)
+
+
+def _call_cacheable(options, method, func, args, kwds, chunk_size=0):
+    result = _call_method(method, func, args, kwds, chunk_size)
+    if inspect.isgenerator(result) or inspect.isasyncgen(result):  # 分段返回的结果不缓存
+        return result
+    if inspect.isawaitable(result):
+        return _await_cacheable(options, result)
+    return Cacheable(result, **options)
+
+
+async def _await_cacheable(options, awaitable):
+    return Cacheable(await awaitable, **options)
+
+
+def _call_method(method, func, args, kwds, chunk_size=0):
+    _logger = logging.getLogger('executor.poolfunc')
+    _logger.debug('>>> %s() <%s> args=%s kwds=%s', method, func, args, kwds)
+    result = func(*args, **kwds)
+    if inspect.isgenerator(result):
+        return _chunks(result, chunk_size) if chunk_size else list(result)
+    if inspect.isasyncgen(result):
+        return _achunks(result, chunk_size) if chunk_size else _acollect(result)
+    if inspect.isawaitable(result):
+        return _await_result(method, result)
     _logger.debug('<<< %s() -> %s', method, result)
     return result
 
 
-def _subproc_init(progargs, logging_queue, logging_root_level):
+def _chunks(generator, size):
+    chunk = []
+    for item in generator:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def _achunks(generator, size):
+    chunk = []
+    async for item in generator:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def _acollect(generator):
+    return [item async for item in generator]
+
+
+async def _await_result(method, awaitable):
+    result = await awaitable
+    logging.getLogger('executor.poolfunc').debug('<<< %s() -> %s', method, result)
+    return result
+
+
+async def _call_outcome(method, args, kwds, executor):
+    try:
+        result = await asyncio.get_event_loop().run_in_executor(executor, _poolfunc, method, args, kwds)
+        if isinstance(result, Future):
+            result = await asyncio.wrap_future(result)
+        if inspect.isawaitable(result):
+            result = await result
+        return True, result
+    except Exception as e:
+        logging.getLogger('executor.poolfunc').error('%s() raised %s %s', method, type(e), e)
+        return False, _error_to_dict(e)
+
+
+def _poolfunc_batch(calls):
+    '''在子进程中执行批量请求中的各个调用
+
+    各个调用在子进程的事件循环中并发执行：协程方法直接在事件循环中执行；
+    如果子进程有线程池，普通方法按照 :func:`rpcmethod.threaded` 的设置在线程池中执行或者依次执行，
+    否则在最多 ``batch_max_threads`` 个线程中执行。
+    依次执行的普通方法在一个单独的线程中执行，而不是在事件循环的线程中，以免阻塞同一子进程中执行中的协程方法。
+
+    :param calls: ``(method, args, kwds)`` 的列表
+    :return: 一个协程，其结果是与 ``calls`` 一一对应的 ``(ok, value)`` 列表。
+        ``ok`` 为 ``True`` 时 ``value`` 是返回值，否则是 JSON RPC 的 Error 对象（dict）
+    '''
+    global _batch_executor, _serial_executor
+    _set_batch_timeout(method for method, _, _ in calls)
+    if len(calls) > 1 and batch_max_threads > 1 and get_thread_executor() is None:
+        if _batch_executor is None:
+            with _batch_executor_lock:
+                if _batch_executor is None:
+                    _batch_executor = ThreadPoolExecutor(max_workers=batch_max_threads)
+        executor = _batch_executor
+    else:
+        if _serial_executor is None:
+            with _batch_executor_lock:
+                if _serial_executor is None:
+                    _serial_executor = ThreadPoolExecutor(max_workers=1)
+        executor = _serial_executor
+    return _gather_batch(calls, executor)
+
+
+def _set_batch_timeout(methods):
+    '''批量请求的执行时间限制是其中各个方法的最长限制'''
+    timeouts = set()
+    for method in methods:
+        try:
+            timeouts.add(rpcmethod.get_option(_resolve_method(method), 'timeout', method_timeout))
+        except Exception:  # 方法不存在等错误，在执行时返回
+            timeouts.add(method_timeout)
+    if timeouts and timeouts != {method_timeout}:
+        set_task_timeout(None if None in timeouts else max(timeouts))
+
+
+async def _gather_batch(calls, executor):
+    return await asyncio.gather(*(_call_outcome(method, args, kwds, executor) for method, args, kwds in calls))
+
+
+def _poolfunc_raw(txt, begin_time=None):
+    '''在子进程中解析、执行请求，并编码回复
+
+    :param str txt: 请求的原始文本
+    :param float begin_time: 主进程收到请求的时间。如果请求中有 ``ttl`` 且已经过期，不执行，也不回复。
+    :return: ``None`` 表示不需要回复；否则是 ``(title, data)`` ， ``data`` 是回复的 JSON 文本。
+        如果需要等待协程或线程池，返回一个协程，其结果同上。
+    '''
+    try:
+        request = jsonrpc.parse(txt)
+    except Exception as e:
+        if globalvars.prog_args.verbose:
+            logging.getLogger('executor.poolfunc').error('JSONRPC parse error: %s %s', type(e), e)
+        return None
+    if not isinstance(request, (list, jsonrpc.Request)):  # 回复
+        return None
+    if begin_time is not None:
+        if isinstance(request, list):
+            ttls = [item.ttl for item in request if isinstance(item, jsonrpc.Request) and item.ttl is not None]
+            ttl = min(ttls) if ttls else None
+        else:
+            ttl = request.ttl
+        if ttl is not None and time.time() >= begin_time + ttl / 1000.0:
+            raise DeadlineExpiredError('request ttl {}ms expired before execution'.format(ttl))
+    if isinstance(request, list):
+        # _encode_batch 在事件循环中执行，须在这里设置执行时间限制
+        _set_batch_timeout(item.method for item in request if isinstance(item, jsonrpc.Request))
+        return _encode_batch(request)
+    _id = request.id
+    try:
+        result = _poolfunc(request.method, request.args, request.kwargs)
+    except Exception as e:
+        logging.getLogger('executor.poolfunc').error('%s raised %s %s', _id, type(e), e)
+        return _encode_response(_id, False, _error_to_dict(e))
+    if isinstance(result, Future) or inspect.isawaitable(result):
+        return _encode_later(_id, result)
+    return _encode_response(_id, True, result)
+
+
+def _encode_response(_id, ok, value):
+    if not _id:  # 没有 RPC ID ，不需要回复
+        return None
+    response = {'jsonrpc': jsonrpc.jsonrpc_version, 'id': _id}
+    if ok:
+        response['result'] = value
+    else:
+        response['error'] = value
+    return _id, jsoncodec.dumps(response)
+
+
+async def _encode_later(_id, result):
+    try:
+        if isinstance(result, Future):
+            result = await asyncio.wrap_future(result)
+        if inspect.isawaitable(result):
+            result = await result
+    except Exception as e:
+        logging.getLogger('executor.poolfunc').error('%s raised %s %s', _id, type(e), e)
+        return _encode_response(_id, False, _error_to_dict(e))
+    return _encode_response(_id, True, result)
+
+
+async def _encode_batch(items):
+    title, responses, ids, calls = _split_batch(items)
+    if calls:
+        outcomes = await _poolfunc_batch(calls)
+        for _id, (ok, value) in zip(ids, outcomes):
+            if _id is None:
+                continue
+            if ok:
+                responses.append({'jsonrpc': jsonrpc.jsonrpc_version, 'id': _id, 'result': value})
+            else:
+                responses.append({'jsonrpc': jsonrpc.jsonrpc_version, 'id': _id, 'error': value})
+    if not responses:
+        return None
+    return title, jsoncodec.dumps(responses)
+
+
+def _subproc_init(progargs, logging_queue, logging_root_level, options=None):
+    '''子进程初始化
+
+    :param dict options: 子进程中的执行选项，见 :class:`Executor` 的构造参数
+    '''
+    global mod_map_maxsize, batch_max_threads, threaded_default, method_timeout, stream_chunk_size
+    global _batch_executor, _serial_executor, _batch_executor_lock
+    global mod_map_lock, mod_map_hits, mod_map_misses
     try:
         logging.root.handlers.clear()
     except AttributeError:
@@ -275,3 +1452,70 @@ def _subproc_init(progargs, logging_queue, logging_root_level):
     logging.root.setLevel(logging_root_level)
     logging.info('subprocess initialize')
     globalvars.prog_args = progargs
+    options = options or {}
+    jsoncodec.use(options.get('json_backend'))
+    jsoncodec.register_paths(options.get('json_converters'))
+    # 方法缓存与统计从空开始，不沿用父进程中的（执行器重置后，新的子进程不使用重置前解析的方法）
+    mod_map_lock = threading.Lock()
+    mod_map.clear()
+    mod_map_hits = mod_map_misses = 0
+    mod_map_maxsize = options.get('method_cache_size', mod_map_maxsize)
+    batch_max_threads = options.get('batch_max_threads', batch_max_threads)
+    threaded_default = options.get('threaded_default', threaded_default)
+    method_timeout = options.get('method_timeout', method_timeout)
+    stream_chunk_size = options.get('stream_chunk_size', stream_chunk_size)
+    # fork 之前在父进程中创建的线程池，其线程在子进程中并不存在，提交给它的调用永远不会执行
+    _batch_executor = _serial_executor = None
+    _batch_executor_lock = threading.Lock()
+    register_stats_provider('method_cache', lambda: method_cache_info()._asdict())
+    if options.get('warmup_modules'):
+        info = _warmup(options['warmup_modules'])
+        register_stats_provider('warmup', lambda: info)
+
+
+def _warmup(module_names):
+    '''导入模块（包括包的所有子模块），然后执行其中声明的预热函数
+
+    导入或预热函数出错只记录日志，不影响子进程启动。
+
+    :return: 预热的统计
+    :rtype: dict
+    '''
+    _logger = logging.getLogger('executor.warmup')
+    begin_time = time.time()
+    modules = 0
+    errors = 0
+    for name in module_names:
+        try:
+            mod = importlib.import_module(name)
+            modules += 1
+            for _, sub_name, _ in pkgutil.walk_packages(getattr(mod, '__path__', []), name + '.'):
+                try:
+                    importlib.import_module(sub_name)
+                    modules += 1
+                except Exception as e:
+                    errors += 1
+                    _logger.error('import %s error: %s %s', sub_name, type(e), e)
+        except Exception as e:
+            errors += 1
+            _logger.error('import %s error: %s %s', name, type(e), e)
+    import_time = time.time() - begin_time
+    hooks = rpcmethod.get_warmup_hooks()
+    for hook in hooks:
+        try:
+            if inspect.iscoroutinefunction(hook):
+                asyncio.run_coroutine_threadsafe(hook(), get_event_loop()).result()
+            else:
+                hook()
+        except Exception as e:
+            errors += 1
+            _logger.exception('warmup hook %s error: %s %s', hook, type(e), e)
+    info = {
+        'modules': modules,
+        'hooks': len(hooks),
+        'errors': errors,
+        'import_time': import_time,
+        'hook_time': time.time() - begin_time - import_time,
+    }
+    _logger.info('warmup: %s', info)
+    return info
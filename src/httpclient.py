@@ -0,0 +1,376 @@
+# -*- coding: utf-8 -*-
+
+''' RPC 方法使用的 HTTP/WebService 客户端
+
+每个子进程中的 :class:`HttpClient` 为每个主机保持一个长连接（keep-alive）池，
+RPC 方法调用 WebService 时不必每次都建立新的 TCP 连接::
+
+    from httpclient import HttpClient
+
+    crm = HttpClient('crm', timeout=5, cache_ttl=60)
+
+    def lookup(caller):
+        return crm.get('http://crm.example.com/api/customers', params={'tel': caller}).json()
+
+    async def lookup_async(caller):
+        response = await crm.request_async('GET', 'http://crm.example.com/api/customers', params={'tel': caller})
+        return response.json()
+
+* 连接池使用 :class:`resourcepool.ResourcePool` ，借出前检查连接是否已被服务器关闭。
+  空闲超过 ``idle_timeout`` 的连接在发送请求（至多每 ``idle_timeout / 4`` 秒一次）与统计时被关闭。
+  复用的连接在发送请求时发现已经断开的，自动以新连接重试一次。
+* ``cache_ttl`` 大于 0 时，成功（2xx）的 ``GET`` 请求的响应在该时间内被缓存，相同 URL 的请求直接返回缓存的响应。
+* 协程方法使用 :meth:`HttpClient.request_async` ，请求在子进程的线程池（没有则在事件循环的默认线程池）中执行，不阻塞事件循环。
+* 各个客户端、各个主机的请求数、错误数、缓存命中数与延迟通过 :func:`workerpool.register_stats_provider` 报告给主进程，
+  见 :meth:`executor.Executor.stats` 中 ``pools`` 的 ``workers[i].reported.http`` 。
+
+:date: 2026-10-18
+'''
+
+from __future__ import print_function, unicode_literals, absolute_import
+
+import time
+import select
+import logging
+import threading
+import asyncio
+import http.client
+from collections import OrderedDict
+from functools import partial
+from multiprocessing import util
+from urllib.parse import urlsplit, urlencode
+
+import jsoncodec
+from resourcepool import ResourcePool
+from workerpool import register_stats_provider, get_thread_executor
+
+# 复用的连接发送请求时的这些异常表示服务器已经关闭了该连接，可以用新连接重试
+_STALE_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+
+class Response(object):
+    '''HTTP 响应，其内容已经全部读取
+
+    :ivar int status: 状态码
+    :ivar str reason: 状态说明
+    :ivar headers: 响应头（ :class:`http.client.HTTPMessage` ）
+    :ivar bytes body: 响应内容
+    :ivar float elapsed: 请求用时（秒），缓存的响应为 0
+    '''
+    __slots__ = ('status', 'reason', 'headers', 'body', 'elapsed')
+
+    def __init__(self, status, reason, headers, body, elapsed=0.0):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return 200 <= self.status < 300
+
+    def text(self, encoding=None):
+        '''以文本返回响应内容，默认使用响应头中的字符集，没有则使用 UTF-8'''
+        if encoding is None:
+            encoding = self.headers.get_content_charset() or 'utf-8'
+        return self.body.decode(encoding)
+
+    def json(self):
+        '''以 JSON 解析响应内容'''
+        return jsoncodec.loads(self.text())
+
+    def raise_for_status(self):
+        '''状态码不是 2xx 时抛出 :class:`HttpError`'''
+        if not self.ok:
+            raise HttpError(self)
+
+
+class HttpError(Exception):
+    '''响应的状态码不是 2xx'''
+
+    def __init__(self, response):
+        super(HttpError, self).__init__('{} {}'.format(response.status, response.reason))
+        self.response = response
+
+
+class _HostStats(object):
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def to_dict(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'retries': self.retries,
+            'cache_hits': self.cache_hits,
+            'latency_avg': self.latency_total / self.requests if self.requests else 0.0,
+            'latency_max': self.latency_max,
+        }
+
+
+def _connection_alive(conn):
+    '''空闲的连接可读，说明服务器已经关闭了它（或者发送了不应有的数据）'''
+    if conn.sock is None:
+        return True  # 尚未连接
+    try:
+        readable, _, _ = select.select([conn.sock], [], [], 0)
+    except (OSError, ValueError):
+        return False
+    return not readable
+
+
+class HttpClient(object):
+    '''HTTP 客户端
+
+    :param str name: 名称，用于统计。同名的客户端替换之前的（如重新加载模块）
+    :param float timeout: 默认的超时（秒），用于建立连接与每次读取
+    :param int max_connections: 每个主机的最大连接数
+    :param float idle_timeout: 连接空闲超过该时间（秒）后被关闭
+    :param float acquire_timeout: 等待空闲连接的最长时间（秒），默认与 ``timeout`` 相同
+    :param float cache_ttl: ``GET`` 请求的响应的默认缓存时间（秒）。 ``0`` 表示不缓存
+    :param int cache_maxsize: 缓存的最大条目数，按 LRU 淘汰
+    :param dict headers: 每个请求都带有的请求头
+    '''
+
+    def __init__(self, name='default', timeout=10, max_connections=4, idle_timeout=60, acquire_timeout=None,
+                 cache_ttl=0, cache_maxsize=256, headers=None):
+        self.name = name
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = timeout if acquire_timeout is None else acquire_timeout
+        self.cache_ttl = cache_ttl
+        self.cache_maxsize = cache_maxsize
+        self.headers = dict(headers or {})
+        self._lock = threading.Lock()
+        self._pools = {}
+        self._stats = {}
+        self._cache = OrderedDict()
+        self._next_evict = 0.0
+        self._logger = logging.getLogger('{}.{}'.format(self.__class__.__name__, name))
+        _register(self)
+
+    def _pool(self, scheme, host, port):
+        key = (scheme, host, port)
+        now = time.time()
+        if self.idle_timeout and now >= self._next_evict:  # 不加锁，偶尔多检查一次无妨
+            self._next_evict = now + self.idle_timeout / 4.0
+            self.evict_idle()
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                if scheme == 'https':
+                    factory = partial(http.client.HTTPSConnection, host, port, timeout=self.timeout)
+                else:
+                    factory = partial(http.client.HTTPConnection, host, port, timeout=self.timeout)
+                pool = self._pools[key] = ResourcePool(
+                    '{}:{}'.format(host, port), factory,
+                    max_size=self.max_connections, idle_timeout=self.idle_timeout,
+                    health_check=_connection_alive, check_interval=0, acquire_timeout=self.acquire_timeout
+                )
+                self._stats.setdefault('{}://{}:{}'.format(scheme, host, port), _HostStats())
+            return pool
+
+    def request(self, method, url, params=None, body=None, json_body=None, headers=None, timeout=None,
+                cache_ttl=None):
+        '''发送请求，读取全部响应内容
+
+        :param str method: 请求方法，如 ``"GET"``
+        :param str url: URL
+        :param dict params: 附加到 URL 的查询参数
+        :param body: 请求内容（ ``bytes`` 或 ``str`` ）
+        :param json_body: 以 JSON 编码的请求内容，同时设置 ``Content-Type``
+        :param dict headers: 请求头
+        :param float timeout: 本次请求的超时（秒），默认使用客户端的 ``timeout``
+        :param float cache_ttl: 本次 ``GET`` 请求的响应的缓存时间（秒），默认使用客户端的 ``cache_ttl``
+        :rtype: Response
+        '''
+        method = method.upper()
+        if params:
+            url = '{}{}{}'.format(url, '&' if '?' in url else '?', urlencode(params))
+        parts = urlsplit(url)
+        scheme = parts.scheme or 'http'
+        port = parts.port or (443 if scheme == 'https' else 80)
+        path = parts.path or '/'
+        if parts.query:
+            path = '{}?{}'.format(path, parts.query)
+        host_stats_key = '{}://{}:{}'.format(scheme, parts.hostname, port)
+        if cache_ttl is None:
+            cache_ttl = self.cache_ttl
+        cacheable = method == 'GET' and cache_ttl > 0 and body is None and json_body is None
+        if cacheable:
+            response = self._cache_get(url)
+            if response is not None:
+                with self._lock:
+                    self._stats[host_stats_key].cache_hits += 1
+                return response
+        all_headers = dict(self.headers)
+        all_headers.update(headers or {})
+        if json_body is not None:
+            body = jsoncodec.dumps(json_body)
+            all_headers.setdefault('Content-Type', 'application/json; charset=utf-8')
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        pool = self._pool(scheme, parts.hostname, port)
+        begin_time = time.time()
+        try:
+            response = self._send(pool, host_stats_key, method, path, body, all_headers,
+                                  self.timeout if timeout is None else timeout)
+        except Exception:
+            with self._lock:
+                host_stats = self._stats[host_stats_key]
+                host_stats.requests += 1
+                host_stats.errors += 1
+            raise
+        response.elapsed = elapsed = time.time() - begin_time
+        with self._lock:
+            host_stats = self._stats[host_stats_key]
+            host_stats.requests += 1
+            host_stats.latency_total += elapsed
+            host_stats.latency_max = max(host_stats.latency_max, elapsed)
+            if response.status >= 500:
+                host_stats.errors += 1
+        if cacheable and response.ok:
+            self._cache_put(url, response, cache_ttl)
+        return response
+
+    def _send(self, pool, host_stats_key, method, path, body, headers, timeout):
+        for attempt in (0, 1):
+            conn = pool.acquire()
+            reused = conn.sock is not None
+            broken = True
+            try:
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                try:
+                    conn.request(method, path, body, headers)
+                    resp = conn.getresponse()
+                except _STALE_ERRORS:
+                    if reused and attempt == 0:
+                        with self._lock:
+                            self._stats[host_stats_key].retries += 1
+                        continue
+                    raise
+                response = Response(resp.status, resp.reason, resp.msg, resp.read())
+                broken = resp.will_close
+                return response
+            finally:
+                pool.release(conn, broken)
+
+    def get(self, url, params=None, **kwargs):
+        '''发送 ``GET`` 请求，参数见 :meth:`request`'''
+        return self.request('GET', url, params=params, **kwargs)
+
+    def post(self, url, body=None, json_body=None, **kwargs):
+        '''发送 ``POST`` 请求，参数见 :meth:`request`'''
+        return self.request('POST', url, body=body, json_body=json_body, **kwargs)
+
+    async def request_async(self, method, url, **kwargs):
+        '''在协程中发送请求，参数见 :meth:`request`
+
+        请求在子进程的线程池（没有则在事件循环的默认线程池）中执行，不阻塞事件循环。
+        '''
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(get_thread_executor(), partial(self.request, method, url, **kwargs))
+
+    def _cache_get(self, url):
+        with self._lock:
+            entry = self._cache.get(url)
+            if entry is None:
+                return None
+            expires, response = entry
+            if expires <= time.time():
+                del self._cache[url]
+                return None
+            self._cache.move_to_end(url)
+        return Response(response.status, response.reason, response.headers, response.body)
+
+    def _cache_put(self, url, response, ttl):
+        with self._lock:
+            self._cache[url] = (time.time() + ttl, response)
+            self._cache.move_to_end(url)
+            while len(self._cache) > self.cache_maxsize:
+                self._cache.popitem(last=False)
+
+    def clear_cache(self):
+        '''清除缓存的响应'''
+        with self._lock:
+            self._cache.clear()
+
+    def evict_idle(self):
+        '''关闭所有主机的空闲超过 ``idle_timeout`` 的连接'''
+        with self._lock:
+            pools = list(self._pools.values())
+        for pool in pools:
+            pool.evict_idle()
+
+    def close(self):
+        '''关闭所有空闲的连接'''
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+        for pool in pools:
+            pool.close()
+
+    def stats(self):
+        '''统计信息，统计之前关闭空闲过久的连接
+
+        :rtype: dict
+        '''
+        self.evict_idle()
+        with self._lock:
+            hosts = dict((key, s.to_dict()) for key, s in self._stats.items())
+            pools = list(self._pools.items())
+            cache_size = len(self._cache)
+        for (scheme, host, port), pool in pools:
+            pool_stats = pool.stats()
+            hosts['{}://{}:{}'.format(scheme, host, port)]['connections'] = {
+                'size': pool_stats['size'],
+                'idle': pool_stats['idle'],
+                'created': pool_stats['created'],
+                'waits': pool_stats['waits'],
+                'evicted': pool_stats['evicted'],
+            }
+        return {'cache_size': cache_size, 'hosts': hosts}
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _register(client):
+    with _clients_lock:
+        first = not _clients
+        old = _clients.get(client.name)
+        _clients[client.name] = client
+    if first:
+        register_stats_provider('http', stats)
+        util.Finalize(None, close_all, exitpriority=10)
+    if old is not None:
+        old.close()
+
+
+def close_all():
+    '''关闭所有客户端的连接'''
+    with _clients_lock:
+        clients = list(_clients.values())
+    for client in clients:
+        client.close()
+
+
+def stats():
+    '''各个客户端的统计信息
+
+    :rtype: dict
+    '''
+    with _clients_lock:
+        clients = list(_clients.items())
+    return dict((name, client.stats()) for name, client in clients)
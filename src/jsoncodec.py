@@ -0,0 +1,376 @@
+# -*- coding: utf-8 -*-
+
+''' JSON 编解码
+
+项目中所有的 JSON 编码与解码（请求的解析、回复的编码、Web 接口等）都经过这个模块，
+由它在启动时选择后端：安装了更快的第三方库时使用第三方库，否则使用标准库 :mod:`json` 。
+
+支持的后端：
+
+* ``"orjson"`` : `orjson <https://github.com/ijl/orjson>`_
+* ``"ujson"`` : `ujson <https://github.com/ultrajson/ultrajson>`_ （5.0 及以上）。
+  ujson 自己将 ``Decimal`` 编码为数字（损失精度），不调用转换函数，所以编码前先用 :func:`jsonable` 转换整个对象，
+  编码并不比标准库快。 ``"auto"`` 不选择它，只在明确指定时使用
+* ``"json"`` : 标准库
+
+``"auto"`` 按 :data:`AUTO_BACKENDS` 的顺序选择已安装的后端。
+
+第三方后端无法处理的数据（如超过 64 位的整数、标准库允许的 ``NaN`` 字面量）自动交给标准库重做，
+所以无论使用哪个后端，能编码、解码的数据与标准库相同，失败时抛出的异常也与标准库相同。
+
+与标准库的输出的区别：
+
+* 非 ASCII 字符不转义（ ``"张三"`` 而不是 ``"\\u5f20\\u4e09"`` ），回复按 UTF-8 传输时更短
+* 没有多余的空格
+* ``orjson`` 将 ``NaN`` 与 ``Infinity`` 编码为 ``null``
+
+各个后端在实际的消息上的性能见 ``tests/bench_json_codec.py`` 。
+
+JSON 没有对应类型的数据（如数据库查询结果中的 ``datetime`` 与 ``Decimal`` ）在编码时按类型查表转换（ :func:`convert` ），
+不需要事先遍历整个返回值。内置的转换是：
+
+========================================== ========================================================
+类型                                       转换结果
+========================================== ========================================================
+``datetime.datetime``                      ``"2026-10-18 16:45:33"``
+``datetime.date``                          ``"2026-10-18"``
+``datetime.time``                          ``"16:45:33"``
+``datetime.timedelta``                     秒数（ ``float`` ）
+``decimal.Decimal``                        文本（ ``"12.50"`` ），保留全部精度
+``bytes`` , ``bytearray`` , ``memoryview`` UTF-8 文本；不是有效的 UTF-8 时，Base64 编码的文本
+``set`` , ``frozenset``                    数组
+``tuple`` 的子类                           数组（如 ``namedtuple`` 的查询结果行）
+``uuid.UUID``                              ``"12345678-1234-5678-1234-567812345678"``
+``enum.Enum``                              其 ``value``
+========================================== ========================================================
+
+可以用 :func:`register` 增加或者替换转换，如调用者需要数字、并且可以接受 ``float`` 的精度时::
+
+    jsoncodec.register(decimal.Decimal, float)
+
+转换按类型的 MRO 查找，基类的转换同样适用于子类。
+RPC 方法的返回值在主进程中编码，所以自定义的转换须在主进程与子进程中都注册，
+见 :class:`executor.Executor` 的 ``json_converters`` 参数。
+
+:date: 2026-10-18
+'''
+
+from __future__ import print_function, unicode_literals, absolute_import
+
+import json
+import uuid
+import enum
+import base64
+import logging
+import decimal
+import datetime
+import importlib
+
+BACKENDS = ('orjson', 'ujson', 'json')
+'''支持的后端'''
+
+AUTO_BACKENDS = ('orjson', 'json')
+'''``"auto"`` 时依次尝试的后端'''
+
+backend = 'json'
+'''当前使用的后端名称'''
+
+_fast_dumps = None
+_fast_loads = None
+_fallbacks = 0
+
+
+def _std_dumps(obj, sort_keys=False, default=None):
+    return json.dumps(obj, sort_keys=sort_keys, default=default)
+
+
+def _std_loads(s):
+    if isinstance(s, (bytes, bytearray)):
+        s = s.decode('utf-8')
+    return json.loads(s)
+
+
+def _orjson_codec():
+    import orjson
+    base = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    sorted_opt = base | orjson.OPT_SORT_KEYS
+    _dumps = orjson.dumps
+
+    def dumps(obj, sort_keys=False, default=None):
+        return _dumps(obj, default, sorted_opt if sort_keys else base).decode('utf-8')
+
+    return dumps, orjson.loads
+
+
+def _ujson_codec():
+    import ujson
+    if int(ujson.__version__.split('.')[0]) < 5:  # 5.0 之前不支持 default 参数
+        raise ImportError('ujson>=5 is required')
+    _dumps = ujson.dumps
+
+    def dumps(obj, sort_keys=False, default=None):
+        # ujson 不为 Decimal 调用 default ，须事先按类型转换，结果才与其它后端相同
+        obj = jsonable(obj, fallback=None if default is convert else default)
+        return _dumps(obj, ensure_ascii=False, escape_forward_slashes=False, sort_keys=sort_keys)
+
+    return dumps, ujson.loads
+
+
+_codecs = {
+    'orjson': _orjson_codec,
+    'ujson': _ujson_codec,
+}
+
+
+def available():
+    '''返回已安装的后端名称列表'''
+    result = []
+    for name in BACKENDS:
+        if name in _codecs:
+            try:
+                _codecs[name]()
+            except ImportError:
+                continue
+        result.append(name)
+    return result
+
+
+def use(name='auto'):
+    '''选择后端
+
+    在主进程与每个子进程启动时调用（见 :class:`executor.Executor` 的 ``json_backend`` 参数）。
+
+    :param str name: 后端名称（见 :data:`BACKENDS` ），或者 ``"auto"`` ，按 :data:`AUTO_BACKENDS` 的顺序使用已安装的后端
+    :return: 实际使用的后端名称
+    :raises ValueError: 不支持的后端名称
+    :raises ImportError: 指定的后端没有安装
+    '''
+    global backend, _fast_dumps, _fast_loads
+    if name is None:
+        name = 'auto'
+    if name != 'auto' and name not in BACKENDS:
+        raise ValueError('unsupported JSON backend {!r}, expected one of {}'.format(name, ('auto',) + BACKENDS))
+    candidates = AUTO_BACKENDS if name == 'auto' else (name,)
+    for candidate in candidates:
+        if candidate == 'json':
+            _fast_dumps = _fast_loads = None
+            break
+        try:
+            _fast_dumps, _fast_loads = _codecs[candidate]()
+        except ImportError:
+            if name != 'auto':
+                raise
+            continue
+        break
+    backend = candidate
+    logging.getLogger(__name__).debug('JSON backend: %s', backend)
+    return backend
+
+
+def dumps(obj, sort_keys=False, default=None):
+    '''将对象编码为 JSON 文本
+
+    :param obj: 要编码的对象
+    :param bool sort_keys: 是否按键排序对象的成员
+    :param default: 无法编码的对象的转换函数，同 :func:`json.dumps` 的 ``default`` 参数。
+        默认使用 :func:`convert` ，按类型查表转换
+    :rtype: str
+    :raises TypeError: 对象无法编码
+    '''
+    if default is None:
+        default = convert
+    if _fast_dumps is not None:
+        try:
+            return _fast_dumps(obj, sort_keys, default)
+        except (TypeError, ValueError, OverflowError):
+            _fallback()
+    return _std_dumps(obj, sort_keys, default)
+
+
+def loads(s):
+    '''解码 JSON 文本
+
+    :param s: JSON 文本
+    :type s: str, bytes
+    :raises ValueError: 不是有效的 JSON 文本（ :class:`json.JSONDecodeError` ）
+    '''
+    if _fast_loads is not None:
+        try:
+            return _fast_loads(s)
+        except (ValueError, OverflowError):
+            _fallback()
+    return _std_loads(s)
+
+
+def _datetime(value):
+    if value.tzinfo is None:
+        return value.isoformat(' ', 'seconds')  # 比 strftime 快数倍，结果相同
+    return value.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _time(value):
+    if value.tzinfo is None:
+        return value.isoformat('seconds')
+    return value.strftime('%H:%M:%S')
+
+
+def _bytes(value):
+    try:
+        return bytes(value).decode('utf-8')
+    except UnicodeDecodeError:
+        return base64.b64encode(value).decode('ascii')
+
+
+_converters = {
+    datetime.datetime: _datetime,
+    datetime.date: datetime.date.isoformat,
+    datetime.time: _time,
+    datetime.timedelta: datetime.timedelta.total_seconds,
+    decimal.Decimal: str,  # 金额等数据不能损失精度
+    bytes: _bytes,
+    bytearray: _bytes,
+    memoryview: _bytes,
+    set: list,
+    frozenset: list,
+    tuple: list,  # 如 namedtuple ， tuple 本身不需要转换
+    uuid.UUID: str,
+    enum.Enum: lambda value: value.value,
+}
+_resolved = dict(_converters)  # 另外包括按 MRO 找到的子类的转换，以及没有转换的类型（值为 None）
+
+
+def register(cls, func):
+    '''注册类型的转换
+
+    :param type cls: 类型，其子类也使用该转换（除非另有注册）
+    :param func: 以该类型的对象为参数的可调用对象，返回 JSON 可以编码的数据（可以是包含其它需要转换的数据的容器）
+    '''
+    _converters[cls] = func
+    _resolved.clear()
+    _resolved.update(_converters)
+
+
+def converter(cls):
+    '''注册类型的转换的修饰器，参数见 :func:`register` ::
+
+        @jsoncodec.converter(bson.ObjectId)
+        def object_id(value):
+            return str(value)
+    '''
+    def decorator(func):
+        register(cls, func)
+        return func
+    return decorator
+
+
+def register_paths(converters):
+    '''按名称注册类型的转换
+
+    :param dict converters: 键是类型的完整名称（如 ``"bson.ObjectId"`` ），值是转换函数的完整名称（如 ``"builtins.str"`` ）
+    '''
+    for cls_name, func_name in (converters or {}).items():
+        register(_import_name(cls_name), _import_name(func_name))
+
+
+def _import_name(name):
+    module_name, _, attr = name.rpartition('.')
+    return getattr(importlib.import_module(module_name or 'builtins'), attr)
+
+
+def _lookup(cls):
+    try:
+        return _resolved[cls]
+    except KeyError:
+        pass
+    func = None
+    for base in cls.__mro__[1:]:
+        func = _converters.get(base)
+        if func is not None:
+            break
+    _resolved[cls] = func
+    return func
+
+
+def convert(obj):
+    '''按类型转换 JSON 不能直接编码的对象，用作编码器的 ``default`` 参数
+
+    :raises TypeError: 没有该类型的转换
+    '''
+    func = _resolved.get(obj.__class__) or _lookup(obj.__class__)
+    if func is None:
+        raise TypeError('Object of type {} is not JSON serializable'.format(obj.__class__.__name__))
+    return func(obj)
+
+
+_NATIVE = frozenset((str, int, float, bool, type(None)))
+
+
+def jsonable(obj, fallback=str):
+    '''将对象转为只包含 JSON 数据类型（ ``dict`` , ``list`` , ``str`` , ``int`` , ``float`` , ``bool`` , ``None`` ）的对象
+
+    转换与编码时（ :func:`convert` ）相同，用于需要 JSON 数据类型、而不是 JSON 文本的场合。
+    以循环而不是递归遍历，嵌套的层数没有限制。不修改原对象，其中的容器都被复制。
+
+    :param obj: 要转换的对象
+    :param fallback: 没有注册转换的对象的转换函数，默认是 ``str`` 。 ``None`` 表示抛出 ``TypeError``
+    '''
+    stack = []
+    push = stack.append
+    native = _NATIVE
+
+    def visit(value):
+        cls = value.__class__
+        if cls is list or cls is dict:
+            value = cls(value)
+        elif cls is tuple or isinstance(value, (list, tuple)):
+            value = list(value)
+        elif isinstance(value, dict):
+            value = dict(value)
+        else:
+            func = _resolved.get(cls) or _lookup(cls)
+            if func is not None:
+                value = func(value)
+                return value if value.__class__ in native else visit(value)
+            if fallback is None:
+                raise TypeError('Object of type {} is not JSON serializable'.format(cls.__name__))
+            return fallback(value)
+        push(value)
+        return value
+
+    if obj.__class__ in native:
+        return obj
+    result = visit(obj)
+    while stack:
+        container = stack.pop()
+        if container.__class__ is list:
+            for i, value in enumerate(container):
+                if value.__class__ not in native:
+                    container[i] = visit(value)
+        else:
+            keys = None
+            for key, value in container.items():
+                if value.__class__ not in native:
+                    container[key] = visit(value)
+                if key.__class__ not in native:
+                    keys = keys or []
+                    keys.append(key)
+            for key in keys or ():
+                container[visit(key)] = container.pop(key)
+    return result
+
+
+def _fallback():
+    global _fallbacks
+    _fallbacks += 1  # 统计用，不加锁
+
+
+def stats():
+    '''统计信息
+
+    :return: ``backend`` 当前的后端， ``fallbacks`` 第三方后端无法处理、交给标准库重做的次数
+    :rtype: dict
+    '''
+    return {'backend': backend, 'fallbacks': _fallbacks}
+
+
+use()
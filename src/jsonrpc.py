@@ -9,8 +9,8 @@
 __updated__ = '2015-01-15'
 
 import sys
-import json
-import datetime
+
+import jsoncodec
 
 PY3K = sys.version_info[0] > 2
 
@@ -57,114 +57,177 @@ else:
 jsonrpc_version = '2.0'
 
 
+class Request(object):
+    ''':func:`parse` 解析得到的 JSON RPC 请求
+
+    只保存执行需要的成员，请求中的其它成员被忽略。
+
+    :ivar id: 请求的 ``id`` ，通知为 ``None``
+    :ivar str method: 方法名（已去除首尾空白）
+    :ivar args: 位置参数（ ``params`` 是数组时）
+    :ivar dict kwargs: 命名参数（ ``params`` 是对象时）
+    :ivar ttl: 扩展成员 ``ttl`` ：调用者等待回复的时间（ms），没有时为 ``None``
+    '''
+
+    __slots__ = ('id', 'method', 'args', 'kwargs', 'ttl')
+
+    def __init__(self, id_, method, args=(), kwargs=None, ttl=None):
+        self.id = id_
+        self.method = method
+        self.args = args
+        self.kwargs = {} if kwargs is None else kwargs
+        self.ttl = ttl
+
+    def __reduce__(self):
+        return Request, (self.id, self.method, self.args, self.kwargs, self.ttl)
+
+    def to_dict(self):
+        '''转为 JSON RPC 请求对象（dict）'''
+        return {'jsonrpc': jsonrpc_version, 'id': self.id, 'method': self.method,
+                'params': self.kwargs if self.kwargs else list(self.args)}
+
+    def __repr__(self):
+        return '<{}.{} id={!r} method={!r} args={!r} kwargs={!r} ttl={!r}>'.format(
+            self.__class__.__module__, self.__class__.__name__,
+            self.id, self.method, self.args, self.kwargs, self.ttl
+        )
+
+
+class Response(object):
+    ''':func:`parse` 解析得到的 JSON RPC 回复
+
+    :ivar id: 回复的 ``id``
+    :ivar result: 返回值，错误回复时为 ``None``
+    :ivar dict error: 错误对象（有 ``code`` , ``message`` 成员），正确回复时为 ``None``
+    '''
+
+    __slots__ = ('id', 'result', 'error')
+
+    def __init__(self, id_, result=None, error=None):
+        self.id = id_
+        self.result = result
+        self.error = error
+
+    def __reduce__(self):
+        return Response, (self.id, self.result, self.error)
+
+    def to_dict(self):
+        '''转为 JSON RPC 回复对象（dict）'''
+        if self.error is not None:
+            return {'jsonrpc': jsonrpc_version, 'id': self.id, 'error': self.error}
+        return {'jsonrpc': jsonrpc_version, 'id': self.id, 'result': self.result}
+
+    def __repr__(self):
+        return '<{}.{} id={!r} result={!r} error={!r}>'.format(
+            self.__class__.__module__, self.__class__.__name__, self.id, self.result, self.error
+        )
+
+
 def parse(txt):
     '''解析 JSON RPC
 
     :param txt: 带解析的 JSON 字符串
 
-    :return: request, result, error
-        如果是request，第一个参数返回该请求的dict，格式是：
+    :return: 根据 JSON 文本的内容，返回：
 
-        .. code-block:: python
+        * 请求： :class:`Request` 对象。请求中的扩展成员 ``ttl`` ：调用者等待回复的时间（ms），保存在其 ``ttl`` 属性中
 
-            {'id': 'id-of-the-request', 'method': 'your_method', params['what', 'ever', 'params']}
+        * 回复（结果或错误）： :class:`Response` 对象
 
-        其它两个参数是 ``None``
+        * 批量请求（JSON 数组）：一个 list，其中每个成员对应批量请求中的一项：
+          有效的请求是 :class:`Request` 对象，无效的成员是对应的 :class:`Error` 实例（不会被抛出）
 
-        如果是返回结果，第二个参数返回结果 dict，格式是：
+    解析时不修改、也不复制 JSON 解码得到的 dict ，只取出需要的成员。
 
-        .. code-block:: python
-
-            {'id': 'id-of-the-request', 'result': 'your_result'}
-
-        其它两个参数是 ``None``
+    .. note:: 返回值与以前的版本不兼容：以前返回 ``(request, result, error)`` 三元组，
+       其中的成员是 dict （请求的 ``args`` , ``kwargs`` , ``ttl`` 被加入 dict 中），没有的部分为 ``None`` 。
+       调用者应当改为按返回值的类型区分请求、回复与批量请求，以属性而不是键读取其成员。
 
+    :raises Error: 不是有效的 JSON RPC 文本
     '''
-    obj = request = result = error = None
     try:
-        obj = json.loads(txt)
+        obj = jsoncodec.loads(txt)
     except Exception as e:
         raise FormatError(message='Invalid JSON was received by the server. An error occurred on the server while parsing the JSON text. %s' % (e))
+    if isinstance(obj, list):
+        if not obj:
+            raise InvalidRequestError(message='The JSON sent is not a valid Request object. The batch array is empty.')
+        return [_parse_batch_member(member) for member in obj]
     if not isinstance(obj, dict):
         raise FormatError(message='The JSON sent is not a valid Request object.')
-    id_ = obj.get('id')
-    if not isinstance(id_, (str, unicode, int, float, type(None))):
+    return _parse_obj(obj)
+
+
+def _parse_batch_member(obj):
+    if not isinstance(obj, dict):
+        return InvalidRequestError()
+    try:
+        request = _parse_obj(obj)
+    except Error as e:
+        return e
+    if not isinstance(request, Request):
+        return InvalidRequestError(id_=obj.get('id'), message='The JSON sent is not a valid Request object. Only requests are allowed in a batch.')
+    return request
+
+
+_ID_TYPES = (str, unicode, int, float, type(None))
+_STR_TYPES = (str, unicode)
+
+
+def _parse_obj(obj):
+    get = obj.get
+    id_ = get('id')
+    if not isinstance(id_, _ID_TYPES):
         raise FormatError(message='The JSON sent is not a valid Request object. The id is not a String, Number, or NULL value.')
-    if ('method' in obj) + ('result' in obj) + ('error' in obj) != 1:
+    has_method = 'method' in obj
+    if has_method + ('result' in obj) + ('error' in obj) != 1:
         raise FormatError(id_=id_, message='One of method member, result member and error member must be in the request or response object, and can not be included together.')
-    if 'method' in obj:
-        method = obj.get('method')
-        if not isinstance(method, (str, unicode)):
+    if has_method:
+        method = obj['method']
+        if not isinstance(method, _STR_TYPES):
             raise InvalidRequestError(id_=id_, message='The JSON sent is not a valid Request object. Method is not a String value or does not exists.')
         method = method.strip()
         if not method:
             raise InvalidRequestError(id_=id_, message='The JSON sent is not a valid Request object. Method is an empty String value.')
-        obj['method'] = method
-        params = obj.get('params')
-        args = []
-        kwargs = {}
+        params = get('params')
+        args = ()
+        kwargs = None
         if params is None:
             pass
-        elif isinstance(params, (tuple, list)):
+        elif isinstance(params, list):
             args = params
         elif isinstance(params, dict):
             kwargs = params
         else:
             raise InvalidParamsError(id_=id_)
-        for k in [k for k in obj.keys() if k not in ['jsonrpc', 'id', 'method', 'params']]: obj.pop(k)
-        request = obj
-        request['args'] = args
-        request['kwargs'] = kwargs
-    elif 'result' in obj:
-        for k in [k for k in obj.keys() if k not in ['jsonrpc', 'id', 'result']]: obj.pop(k)
-        result = obj
-    elif 'error' in obj:
-        err_obj = obj['error']
-        if not isinstance(err_obj.get('code'), int):
-            raise InvalidErrorError(id_=id_, message='The JSON sent is not a valid Error object. The code MUST be an integer.')
-        if not isinstance(err_obj.get('message'), (str, unicode)):
-            raise InvalidErrorError(id_=id_, message='The JSON sent is not a valid Error object. The message SHOULD be limited to a concise single sentence.')
-        for k in [k for k in err_obj.keys() if k not in ['code', 'message', 'data']]: err_obj.pop(k)
-        for k in [k for k in obj.keys() if k not in ['jsonrpc', 'id', 'error']]: obj.pop(k)
-        error = obj
-    return request, result, error
+        ttl = get('ttl')
+        if ttl is not None and (isinstance(ttl, bool) or not isinstance(ttl, (int, float)) or ttl <= 0):
+            raise InvalidRequestError(id_=id_, message='The JSON sent is not a valid Request object. The ttl is not a positive Number value.')
+        return Request(id_, method, args, kwargs, ttl)
+    if 'result' in obj:
+        return Response(id_, result=obj['result'])
+    err_obj = obj['error']
+    if not isinstance(err_obj, dict) or not isinstance(err_obj.get('code'), int):
+        raise InvalidErrorError(id_=id_, message='The JSON sent is not a valid Error object. The code MUST be an integer.')
+    if not isinstance(err_obj.get('message'), _STR_TYPES):
+        raise InvalidErrorError(id_=id_, message='The JSON sent is not a valid Error object. The message SHOULD be limited to a concise single sentence.')
+    return Response(id_, error=err_obj)
 
 
 def recursive_jsonable(obj, encoding='utf-8'):
-    '''递归转为可JSON序列化数据类型
+    '''转为可JSON序列化数据类型
+
+    按类型查表转换，以循环而不是递归遍历（见 :func:`jsoncodec.jsonable` ）。
+    ``datetime`` , ``Decimal`` , ``timedelta`` , ``bytes`` 等类型的转换见 :mod:`jsoncodec` ，
+    没有注册转换的对象转为 ``str(obj)`` 。
+
+    .. note:: RPC 方法的返回值不需要事先转换：回复在编码时按同样的规则转换，不必多遍历一次。
 
-    :param obj: 要转化的对象，可以是基本数据类型，或者 dict, list, tuple, date, datetime
-    :param encoding: 编码，默认是utf8
+    :param obj: 要转化的对象，可以是基本数据类型，或者 dict, list, tuple, date, datetime 等
+    :param encoding: 仅为兼容而保留。 ``bytes`` 按 UTF-8 解码，不是有效的 UTF-8 时以 Base64 编码
     :return: 转换后对象
     '''
-    if obj is None:
-        return obj
-    elif isinstance(obj, (int, long, float, bool)):
-        return obj
-    elif isinstance(obj, unicode):
-        if PY3K:
-            return obj
-        else:
-            return obj.encode(encoding)
-    elif isinstance(obj, bytes):
-        if PY3K:
-            return obj.decode(encoding)
-        else:
-            return obj
-    elif isinstance(obj, datetime.datetime):
-        return obj.strftime('%Y-%m-%d %H:%M:%S')
-    elif isinstance(obj, datetime.date):
-        return obj.strftime('%Y-%m-%d')
-    elif isinstance(obj, datetime.time):
-        return obj.strftime('%H:%M:%S')
-    elif isinstance(obj, datetime.timedelta):
-        raise NotImplementedError()
-    elif isinstance(obj, (tuple, list)):
-        return [recursive_jsonable(i) for i in obj]
-    elif isinstance(obj, dict):
-        return dict((recursive_jsonable(k), recursive_jsonable(v)) for (k, v) in obj.items())
-    else:
-        return str(obj)
+    return jsoncodec.jsonable(obj)
 
 
 class Error(Exception):
@@ -200,13 +263,17 @@ class Error(Exception):
         self.message = message
         self.data = data
 
+    def __reduce__(self):
+        # 构造函数的参数与 ``self.args`` 不一致，需要自定义 pickle 方式，才能在进程间传递
+        return _rebuild_error, (self.__class__, self.id, self.code, self.message, self.data)
+
     def to_dict(self):
         '''转为 dict'''
         return {'jsonrpc':jsonrpc_version, 'id':self.id, 'error':{'code':self.code, 'message':self.message, 'data':self.data}}
 
     def to_json(self):
         '''转为 JSON 字符串'''
-        return json.dumps(self.to_dict())
+        return jsoncodec.dumps(self.to_dict())
 
     def __str__(self):
         return '{}.{}(id={}, code={}, message={})'.format(
@@ -220,6 +287,12 @@ class Error(Exception):
             self.id, self.code, self.message
         )
 
+def _rebuild_error(cls, id_, code, message, data):
+    obj = cls.__new__(cls)
+    Error.__init__(obj, id_=id_, code=code, message=message, data=data)
+    return obj
+
+
 class InvalidRequestError(Error):
     '''无效的JSON-RPC请求'''
     def __init__(self, id_=None, code=-32600, message='The JSON sent is not a valid Request object.', data=None):
@@ -245,6 +318,16 @@ class InvalidErrorError(Error):
     def __init__(self, id_=None, code=-32600, message='The JSON sent is not a valid Error object.', data=None):
         Error.__init__(self, id_=id_, code=code, message=message, data=data)
 
+class OverloadedError(Error):
+    '''服务器过载，请求未被执行'''
+    def __init__(self, id_=None, code=-32000, message='Server overloaded. The request was not executed.', data=None):
+        Error.__init__(self, id_=id_, code=code, message=message, data=data)
+
+class ExecutionTimeoutError(Error):
+    '''RPC 方法的执行超过了时间限制'''
+    def __init__(self, id_=None, code=-32001, message='Execution timed out.', data=None):
+        Error.__init__(self, id_=id_, code=code, message=message, data=data)
+
 class FormatError(Error):
     '''JSON-RPC格式错误'''
     def __init__(self, id_=None, code=-32700, message='Invalid JSON was received by the server. An error occurred on the server while parsing the JSON text.', data=None):
@@ -9,6 +9,7 @@
 
 import time
 import logging
+import asyncio
 
 class BuildIn:
     @classmethod
@@ -44,6 +45,18 @@ def sleep(seconds):
     time.sleep(seconds)
 
 
+async def async_sleep(seconds):
+    '''异步睡眠
+
+    协程方法示例。睡眠期间，所在的子进程可以同时执行其它协程方法。
+
+    :param float seconds: 睡眠时间，时间为秒
+    :return: ``seconds``
+    '''
+    await asyncio.sleep(seconds)
+    return seconds
+
+
 def exception(*args):
     '''抛出异常
     '''
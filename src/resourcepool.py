@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+
+''' 子进程中的资源池（数据库连接、WebService 客户端等）
+
+:mod:`methods` 包中的模块用 :func:`factory` 声明命名的资源工厂，RPC 方法用 :func:`acquire` 借用资源::
+
+    import pymssql
+    from resourcepool import factory, acquire
+
+    @factory('db', max_size=4, idle_timeout=300, health_check=lambda conn: conn.cursor().execute('SELECT 1'))
+    def connect_db():
+        return pymssql.connect(...)
+
+    def query(sql):
+        with acquire('db') as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql)
+            return cursor.fetchall()
+
+    async def query_async(sql):
+        async with acquire('db') as conn:
+            ...
+
+每个子进程有自己的资源池：
+
+* 资源在第一次借用时创建，数量不超过 ``max_size`` ，资源都在使用中时，借用者等待。
+* 借出空闲了 ``check_interval`` 秒以上的资源之前，以及借用者抛出异常时，执行健康检查，不健康的资源被关闭并重新创建。
+* 空闲超过 ``idle_timeout`` 秒的资源由后台线程关闭。
+* 子进程退出（包括因 ``maxtasksperchild`` 被替换）时，所有资源被关闭。
+
+各个资源池的统计通过 :func:`workerpool.register_stats_provider` 报告给主进程，
+见 :meth:`executor.Executor.stats` 中 ``pools`` 的 ``workers[i].reported.resources`` 。
+
+:date: 2026-10-18
+'''
+
+from __future__ import print_function, unicode_literals, absolute_import
+
+import time
+import logging
+import threading
+import asyncio
+from functools import partial
+from collections import deque
+from multiprocessing import util
+
+from workerpool import register_stats_provider
+
+
+class ResourceTimeoutError(Exception):
+    '''在限定的时间内没有借到资源'''
+    pass
+
+
+class ResourcePool(object):
+    '''一种资源的池
+
+    :param str name: 名称
+    :param factory: 无参数的可调用对象，返回新的资源
+    :param int max_size: 资源的最大数量（包括借出的与空闲的）
+    :param float idle_timeout: 资源空闲超过该时间（秒）后被关闭。 ``None`` 表示不关闭
+    :param health_check: 以资源为参数的可调用对象，返回 ``False`` 或者抛出异常表示资源不健康。 ``None`` 表示不检查
+    :param float check_interval: 资源空闲超过该时间（秒）后，借出之前执行健康检查。 ``0`` 表示每次借出之前都检查
+    :param close: 以资源为参数的可调用对象，关闭资源。默认调用资源的 ``close()`` 方法（如果有）
+    :param float acquire_timeout: 借用资源的默认最长等待时间（秒）。 ``None`` 表示一直等待
+    '''
+
+    def __init__(self, name, factory, max_size=4, idle_timeout=300, health_check=None, check_interval=30,
+                 close=None, acquire_timeout=30):
+        if max_size < 1:
+            raise ValueError('max_size must be at least 1')
+        self.name = name
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check = health_check
+        self.check_interval = check_interval
+        self.acquire_timeout = acquire_timeout
+        self._close_func = close
+        self._cond = threading.Condition()
+        self._idle = deque()  # (resource, 归还时间)，右端是最近归还的
+        self._size = 0
+        self._closed = False
+        self._created = 0
+        self._destroyed = 0
+        self._acquired = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+        self._unhealthy = 0
+        self._evicted = 0
+        self._errors = 0
+        self._logger = logging.getLogger('{}.{}'.format(self.__class__.__name__, name))
+
+    def acquire(self, timeout=-1):
+        '''借用一个资源，用完之后必须以 :meth:`release` 归还
+
+        :param float timeout: 最长等待时间（秒）。默认使用 ``acquire_timeout``
+        :raises ResourceTimeoutError: 超时
+        '''
+        if timeout is not None and timeout < 0:
+            timeout = self.acquire_timeout
+        begin_time = time.time()
+        deadline = None if timeout is None else begin_time + timeout
+        waited = False
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError('resource pool {!r} closed'.format(self.name))
+                    if self._idle:
+                        resource, released = self._idle.pop()
+                        create = False
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        resource, released = None, None
+                        create = True
+                        break
+                    remaining = None if deadline is None else deadline - time.time()
+                    if remaining is not None and remaining <= 0:
+                        self._timeouts += 1
+                        raise ResourceTimeoutError('no {!r} resource available in {}s'.format(self.name, timeout))
+                    waited = True
+                    self._cond.wait(remaining)
+            if create:
+                try:
+                    resource = self.factory()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._errors += 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._created += 1
+                break
+            if time.time() - released < self.check_interval or self._healthy(resource):
+                break
+            self._destroy(resource)
+        with self._cond:
+            self._acquired += 1
+            if waited:
+                self._waits += 1
+                self._wait_time += time.time() - begin_time
+        return resource
+
+    def release(self, resource, broken=False):
+        '''归还资源
+
+        :param bool broken: 为 ``True`` 时关闭该资源，而不是放回池中
+        '''
+        with self._cond:
+            if not broken and not self._closed:
+                self._idle.append((resource, time.time()))
+                self._cond.notify()
+                return
+        self._destroy(resource)
+
+    def evict_idle(self):
+        '''关闭空闲超过 ``idle_timeout`` 的资源'''
+        if self.idle_timeout is None:
+            return
+        expired = []
+        with self._cond:
+            now = time.time()
+            while self._idle and now - self._idle[0][1] >= self.idle_timeout:
+                expired.append(self._idle.popleft()[0])
+            self._evicted += len(expired)
+        for resource in expired:
+            self._destroy(resource)
+
+    def close(self):
+        '''关闭所有空闲的资源。借出的资源在归还时关闭'''
+        with self._cond:
+            self._closed = True
+            idle = [resource for resource, _ in self._idle]
+            self._idle.clear()
+            self._cond.notify_all()
+        for resource in idle:
+            self._destroy(resource)
+
+    def _healthy(self, resource):
+        if self.health_check is None:
+            return True
+        try:
+            healthy = self.health_check(resource)
+        except Exception as e:
+            self._logger.warning('health check error: %s %s', type(e), e)
+            healthy = False
+        healthy = healthy is not False  # 没有返回值（如 ``cursor.execute()`` ）视为健康
+        if not healthy:
+            with self._cond:
+                self._unhealthy += 1
+        return healthy
+
+    def _destroy(self, resource):
+        try:
+            if self._close_func is not None:
+                self._close_func(resource)
+            elif hasattr(resource, 'close'):
+                resource.close()
+        except Exception as e:
+            self._logger.warning('close error: %s %s', type(e), e)
+        with self._cond:
+            self._size -= 1
+            self._destroyed += 1
+            self._cond.notify()
+
+    def stats(self):
+        '''统计信息
+
+        :rtype: dict
+        '''
+        with self._cond:
+            return {
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'created': self._created,
+                'destroyed': self._destroyed,
+                'acquired': self._acquired,
+                'waits': self._waits,
+                'wait_time': self._wait_time,
+                'timeouts': self._timeouts,
+                'unhealthy': self._unhealthy,
+                'evicted': self._evicted,
+                'errors': self._errors,
+            }
+
+
+class _Lease(object):
+    ''':func:`acquire` 返回的上下文管理器，同时支持 ``with`` 与 ``async with``'''
+
+    def __init__(self, pool, timeout):
+        self._pool = pool
+        self._timeout = timeout
+        self._resource = None
+        self._broken = False
+
+    def discard(self):
+        '''归还时关闭该资源，而不是放回池中'''
+        self._broken = True
+
+    def __enter__(self):
+        self._resource = self._pool.acquire(self._timeout)
+        return self._resource
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        resource, self._resource = self._resource, None
+        broken = self._broken or (exc_type is not None and not self._pool._healthy(resource))
+        self._pool.release(resource, broken)
+
+    async def __aenter__(self):
+        # 在默认线程池中等待，不阻塞事件循环
+        loop = asyncio.get_event_loop()
+        future = loop.run_in_executor(None, self._pool.acquire, self._timeout)
+        try:
+            self._resource = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # 借用者被取消（如执行超时）时，线程池中的借用仍会完成，由回调函数归还借到的资源
+            future.add_done_callback(partial(self._release_abandoned, loop))
+            raise
+        return self._resource
+
+    def _release_abandoned(self, loop, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        loop.run_in_executor(None, self._pool.release, future.result())
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if self._broken or exc_type is not None or self._pool._closed:
+            # 健康检查与关闭资源可能阻塞，在默认线程池中执行；借用者再次被取消时也要完成归还
+            loop = asyncio.get_event_loop()
+            await asyncio.shield(loop.run_in_executor(None, self.__exit__, exc_type, exc_value, traceback))
+        else:
+            self.__exit__(exc_type, exc_value, traceback)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_reaper = None
+
+
+def register(name, func, **kwargs):
+    '''注册命名的资源工厂
+
+    同名的资源工厂被重新注册时（如重新加载模块），原资源池被关闭。
+
+    :param str name: 资源名称
+    :param func: 无参数的可调用对象，返回新的资源
+    :param kwargs: :class:`ResourcePool` 的其它参数
+    :rtype: ResourcePool
+    '''
+    global _reaper
+    pool = ResourcePool(name, func, **kwargs)
+    with _pools_lock:
+        old = _pools.get(name)
+        _pools[name] = pool
+        if _reaper is None:
+            register_stats_provider('resources', _report)
+            # 子进程退出时，在 multiprocessing 的退出处理中关闭所有资源
+            util.Finalize(None, close_all, exitpriority=10)
+            _reaper = threading.Thread(target=_reap, name='resource-reaper')
+            _reaper.daemon = True
+            _reaper.start()
+    if old is not None:
+        old.close()
+    return pool
+
+
+def factory(name, **kwargs):
+    '''声明命名的资源工厂的修饰器，参数见 :func:`register`'''
+    def decorator(func):
+        register(name, func, **kwargs)
+        return func
+    return decorator
+
+
+def get_pool(name):
+    '''返回命名的资源池
+
+    :raises KeyError: 没有注册该名称的资源工厂
+    '''
+    try:
+        return _pools[name]
+    except KeyError:
+        raise KeyError('resource {!r} not declared'.format(name))
+
+
+def acquire(name, timeout=-1):
+    '''借用命名的资源，返回上下文管理器，在 ``with`` （或 ``async with`` ）块结束时自动归还
+
+    块中抛出异常时，如果资源池有健康检查，先检查资源，不健康的被关闭。
+    ``async with`` 在事件循环之外的线程中等待资源、执行健康检查；借用者在等待中被取消时（如协程方法执行超时），
+    随后借到的资源被自动归还。
+    也可以调用上下文管理器的 ``discard()`` 方法明确地关闭该资源::
+
+        with acquire('db') as conn:
+            ...
+
+    :param str name: 资源名称
+    :param float timeout: 最长等待时间（秒）。默认使用资源池的 ``acquire_timeout``
+    '''
+    return _Lease(get_pool(name), timeout)
+
+
+def close_all():
+    '''关闭所有资源池'''
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
+
+
+def stats():
+    '''各个资源池的统计信息
+
+    :rtype: dict
+    '''
+    with _pools_lock:
+        pools = list(_pools.items())
+    return dict((name, pool.stats()) for name, pool in pools)
+
+
+def _report():
+    for pool in list(_pools.values()):
+        pool.evict_idle()
+    return stats()
+
+
+def _reap():
+    while True:
+        with _pools_lock:
+            timeouts = [p.idle_timeout for p in _pools.values() if p.idle_timeout]
+        time.sleep(max(1, min(timeouts) / 4.0) if timeouts else 60)
+        for pool in list(_pools.values()):
+            try:
+                pool.evict_idle()
+            except Exception:
+                logging.getLogger(__name__).exception('evict_idle() error')
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+''' 幂等 RPC 方法的返回值缓存
+
+用 :func:`rpcmethod.cacheable` 修饰的方法，其返回值被缓存在主进程中。
+缓存命中的请求由主进程直接回复，不会进入进程池。
+
+主进程不导入 :mod:`methods` 包，所以它并不预先知道哪些方法可以缓存：
+子进程执行这样的方法时，将返回值连同缓存设置包装为 :class:`Cacheable` 返回，主进程据此写入缓存。
+因此，每个方法（及参数组合）的第一次调用总是由子进程执行。
+还没有写入过缓存的方法的查找也计为未命中，在该方法第一次写入缓存时计入其统计；
+不可缓存的方法从不写入缓存，其查找只在最近的 :data:`PENDING_MAXSIZE` 个方法名内计数，不出现在统计中。
+
+:date: 2026-10-18
+'''
+
+from __future__ import print_function, unicode_literals, absolute_import
+
+import time
+import threading
+from collections import OrderedDict
+
+import jsoncodec
+
+
+PENDING_MAXSIZE = 1024
+'''计数查找次数的、还没有写入过缓存的方法名的最大数量，按 LRU 淘汰'''
+
+
+class Cacheable(object):
+    '''子进程返回给主进程的可缓存的返回值
+
+    :param value: 方法的返回值
+    :param float ttl: 缓存的有效期（秒）
+    :param int maxsize: 该方法的最大缓存条目数
+    :param key: 用于生成缓存键的参数的 ``[位置, 名称]`` 列表， ``None`` 表示使用全部参数
+    '''
+    __slots__ = ('value', 'ttl', 'maxsize', 'key')
+
+    def __init__(self, value, ttl, maxsize, key=None):
+        self.value = value
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.key = key
+
+    def __getstate__(self):
+        return (self.value, self.ttl, self.maxsize, self.key)
+
+    def __setstate__(self, state):
+        self.value, self.ttl, self.maxsize, self.key = state
+
+
+class _MethodCache(object):
+
+    def __init__(self, ttl, maxsize, key):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.key = key
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def to_dict(self):
+        return {
+            'ttl': self.ttl,
+            'maxsize': self.maxsize,
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+def make_key(spec, args, kwargs):
+    '''由参数生成缓存键
+
+    :param spec: 参数的 ``[位置, 名称]`` 列表（位置或名称可以为 ``None`` ）， ``None`` 表示使用全部参数
+    '''
+    if spec is not None:
+        values = []
+        for pos, name in spec:
+            if name is not None and name in kwargs:
+                values.append(kwargs[name])
+            elif pos is not None and pos < len(args):
+                values.append(args[pos])
+            else:
+                values.append(None)
+        args, kwargs = values, {}
+    return jsoncodec.dumps([args, kwargs], sort_keys=True, default=str)
+
+
+class ResultCache(object):
+    '''主进程中的返回值缓存
+
+    每个方法有独立的缓存，按照 LRU 淘汰，其有效期与容量由子进程返回的 :class:`Cacheable` 决定。
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._methods = {}
+        self._pending_misses = OrderedDict()  # 还没有写入过缓存的方法名 -> 查找次数
+
+    def get(self, method, args, kwargs):
+        '''查找缓存
+
+        :return: ``(hit, value)``
+        '''
+        cache = self._methods.get(method)
+        if cache is None:
+            with self._lock:
+                self._pending_misses[method] = self._pending_misses.pop(method, 0) + 1
+                while len(self._pending_misses) > PENDING_MAXSIZE:
+                    self._pending_misses.popitem(last=False)
+            return False, None
+        try:
+            key = make_key(cache.key, args, kwargs)
+        except (TypeError, ValueError):
+            with self._lock:
+                cache.misses += 1
+            return False, None
+        now = time.time()
+        with self._lock:
+            entry = cache.entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > now:
+                    cache.entries.move_to_end(key)
+                    cache.hits += 1
+                    return True, value
+                del cache.entries[key]
+                cache.expirations += 1
+            cache.misses += 1
+        return False, None
+
+    def put(self, method, args, kwargs, cacheable):
+        '''将子进程返回的 :class:`Cacheable` 写入缓存'''
+        try:
+            with self._lock:
+                cache = self._methods.get(method)
+                if cache is None or (cache.ttl, cache.maxsize, cache.key) != (cacheable.ttl, cacheable.maxsize, cacheable.key):
+                    # 第一次见到该方法，或者其设置已经改变（如重新加载之后）
+                    cache = self._methods[method] = _MethodCache(cacheable.ttl, cacheable.maxsize, cacheable.key)
+                    cache.misses = self._pending_misses.pop(method, 0)
+                key = make_key(cache.key, args, kwargs)
+                cache.entries[key] = (time.time() + cache.ttl, cacheable.value)
+                cache.entries.move_to_end(key)
+                while len(cache.entries) > cache.maxsize:
+                    cache.entries.popitem(last=False)
+                    cache.evictions += 1
+        except (TypeError, ValueError):
+            pass
+
+    def invalidate(self, methods=None):
+        '''清除缓存
+
+        :param methods: 方法名的列表， ``"crm.*"`` 表示 ``crm`` 名称空间下的所有方法。 ``None`` 表示全部
+        :return: 被清除的条目数
+        '''
+        count = 0
+        with self._lock:
+            for name, cache in self._methods.items():
+                if methods is None or any(
+                        name == m or (m.endswith('.*') and name.startswith(m[:-1])) for m in methods):
+                    count += len(cache.entries)
+                    cache.entries.clear()
+        return count
+
+    def stats(self):
+        '''统计信息
+
+        :rtype: dict
+        '''
+        with self._lock:
+            methods = dict((name, cache.to_dict()) for name, cache in self._methods.items())
+        return {
+            'hits': sum(m['hits'] for m in methods.values()),
+            'misses': sum(m['misses'] for m in methods.values()),
+            'size': sum(m['size'] for m in methods.values()),
+            'methods': methods,
+        }
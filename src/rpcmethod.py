@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+''' RPC 方法的修饰器
+
+:mod:`methods` 包中的 RPC 方法可以使用本模块的修饰器声明其执行方式，如:
+
+.. code::
+
+    from rpcmethod import threaded
+
+    @threaded
+    def query(sql):
+        ...
+
+修饰器只在函数上记录选项，不改变函数本身（ :func:`warmup` 除外，它将函数注册为子进程的预热函数）。类方法需要将修饰器写在 ``@classmethod`` 的下面。
+
+:date: 2026-10-18
+'''
+
+import inspect
+
+OPTIONS_ATTR = '__rpc_options__'
+
+
+def _set_option(func, name, value):
+    options = getattr(func, OPTIONS_ATTR, None)
+    if options is None:
+        options = {}
+        setattr(func, OPTIONS_ATTR, options)
+    options[name] = value
+    return func
+
+
+def get_option(func, name, default=None):
+    '''获取 RPC 方法的选项
+
+    :param func: RPC 方法
+    :param str name: 选项名
+    :param default: 该方法没有设置这个选项时的返回值
+    '''
+    return getattr(func, OPTIONS_ATTR, {}).get(name, default)
+
+
+def threaded(func=None, enabled=True):
+    '''声明 RPC 方法是否在子进程的线程池中执行
+
+    仅当 :data:`settings.EXECUTOR_CONFIG` 的 ``pool_threads`` 大于 0 时有效。
+    没有使用该修饰器的方法，由 ``pool_threaded_default`` 决定。
+
+    可以这样使用::
+
+        @threaded
+        def f(): ...
+
+        @threaded(False)  # 该方法不是线程安全的，不要在线程池中执行
+        def g(): ...
+    '''
+    if func is None or isinstance(func, bool):
+        if isinstance(func, bool):
+            enabled = func
+        return lambda f: _set_option(f, 'threaded', enabled)
+    return _set_option(func, 'threaded', enabled)
+
+
+def timeout(seconds):
+    '''声明 RPC 方法的执行时间限制（秒）
+
+    覆盖 :data:`settings.EXECUTOR_CONFIG` 中的 ``method_timeout`` 与进程池的 ``timeout`` 设置。
+    ``None`` 表示该方法没有时间限制。
+
+    超时后，调用者立即收到超时错误。协程方法被取消；普通方法无法中断，执行它的子进程被杀死并替换::
+
+        @timeout(30)
+        def report(day): ...
+    '''
+    if seconds is not None and seconds <= 0:
+        raise ValueError('timeout must be a positive number or None')
+    return lambda f: _set_option(f, 'timeout', seconds)
+
+
+def stream(chunk_size):
+    '''声明生成器 RPC 方法流式返回时，每个部分回复包含的最大条目数
+
+    覆盖 :data:`settings.EXECUTOR_CONFIG` 中的 ``stream_chunk_size`` 设置。
+    ``0`` 表示该方法不分段，生成器的各项被收集为一个列表返回::
+
+        @stream(500)
+        def export_calls(day):
+            for row in cursor:
+                yield row
+    '''
+    if chunk_size < 0:
+        raise ValueError('chunk_size must not be negative')
+    return lambda f: _set_option(f, 'stream', chunk_size)
+
+
+_warmup_hooks = []
+
+
+def warmup(func):
+    '''声明子进程的预热函数
+
+    预热函数没有参数，在子进程初始化时执行，例如建立数据库连接、填充缓存。
+    子进程在所有预热函数执行完毕之后才开始接收请求。
+    预热函数可以是协程函数（ ``async def`` ），它在子进程常驻的事件循环中执行。
+
+    只有 :data:`settings.EXECUTOR_CONFIG` 的 ``warmup_modules`` 中的模块（及其子模块）中的预热函数会被执行::
+
+        @warmup
+        def connect_db():
+            ...
+    '''
+    if func not in _warmup_hooks:
+        _warmup_hooks.append(func)
+    return func
+
+
+def get_warmup_hooks():
+    '''返回已经注册的预热函数的列表'''
+    return list(_warmup_hooks)
+
+
+def cacheable(ttl=60, maxsize=1024, key=None):
+    '''声明 RPC 方法是幂等的，其返回值可以缓存
+
+    返回值缓存在主进程中（见 :mod:`resultcache` ），在有效期内，参数相同的请求由主进程直接回复，不会进入进程池。
+    只缓存成功的返回值，不缓存异常。
+
+    :param float ttl: 缓存的有效期（秒）
+    :param int maxsize: 该方法的最大缓存条目数，按 LRU 淘汰
+    :param key: 用于生成缓存键的参数（位置或名称）的列表，默认为 ``None`` ，表示使用全部参数
+
+    如::
+
+        @cacheable(ttl=300, key=['caller'])
+        def lookup_customer(caller, trace_id=None): ...
+    '''
+    if ttl <= 0 or maxsize < 1:
+        raise ValueError('ttl must be positive and maxsize must be at least 1')
+    def decorator(func):
+        options = {'ttl': ttl, 'maxsize': maxsize, 'key': _key_spec(func, key)}
+        return _set_option(func, 'cacheable', options)
+    return decorator
+
+
+def _key_spec(func, key):
+    '''将缓存键的参数列表转为 ``[位置, 名称]`` 的列表，使主进程无论参数以位置还是名称传递都能取到它'''
+    if key is None:
+        return None
+    try:
+        names = list(inspect.signature(func).parameters)
+    except (TypeError, ValueError):
+        names = []
+    if names and names[0] in ('self', 'cls'):
+        names = names[1:]
+    spec = []
+    for k in key:
+        if isinstance(k, int):
+            spec.append([k, names[k] if k < len(names) else None])
+        else:
+            spec.append([names.index(k) if k in names else None, k])
+    return spec
@@ -201,6 +201,8 @@ def run(args):
     # setup tornado-web server
     application = web.Application([
         (r"/sys/reset", webhandlers.ResetHandler),
+        (r"/sys/cache/invalidate", webhandlers.CacheInvalidateHandler),
+        (r"/sys/stats", webhandlers.StatsHandler),
         (r"/api/flow", webhandlers.FlowHandler),
     ])
     if args.no_web_server:
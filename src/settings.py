@@ -90,16 +90,153 @@ WEBSERVER_LISTEN = (
 
 EXECUTOR_CONFIG = {
     "queue_maxsize": 1000,
+    "dispatcher_shards": 1,
+    "admission_high_watermark": None,
+    "admission_low_watermark": None,
+    "request_ttl": None,
+    "method_timeout": None,
+    "reset_ready_timeout": 60,
+    "reset_drain_timeout": 30,
+    "autoscale": None,
+    "autoscale_interval": 5,
+    "warmup_modules": [],
     "pool_processes": 1,
-    "pool_maxtasksperchild": 1000
+    "pool_maxtasksperchild": 1000,
+    "pool_maxtasks_jitter": 0.1,
+    "pool_max_rss": None,
+    "pool_shm_threshold": None,
+    "pool_max_inflight": 32,
+    "pool_threads": 0,
+    "pool_threaded_default": True,
+    "method_cache_size": 1024,
+    "batch_max_threads": 8,
+    "stream_chunk_size": 100,
+    "parse_in_worker": False,
+    "pools": {},
+    "affinity": {},
+    "coalesce": [],
+    "reply_compression": None,
+    "json_backend": "auto",
+    "json_converters": {}
 }
 '''执行器设置
 
 这个设置被用于 :class:`executor.Executor` 构造函数的传入参数。
 
-:param queue_maxsize: 任务队列最大值。0，表示无限制。
+:param queue_maxsize: 任务队列最大值。0，表示无限制。有多个分发分片时，由各个分片的队列平均分配。
+:param admission_high_watermark: 准入控制的高水位。所有分片队列中的请求总数达到该值后，执行器拒绝新的请求，
+    直到请求总数降至 ``admission_low_watermark`` 。被拒绝的请求立即收到错误回复（code ``-32000`` ，"overloaded"）。
+    ``None`` 表示不使用水位控制（默认），此时仅在分片队列已满时拒绝请求。
+    启用时，高水位应当小于 ``queue_maxsize`` ，低水位略低于高水位（如 ``900`` 与 ``700`` ），避免在阈值附近反复切换。
+    接收请求的 smartbus 回调线程在任何情况下都不会因队列已满而阻塞。
+:param admission_low_watermark: 准入控制的低水位。 ``None`` 表示与高水位相同。
+:param request_ttl: 请求的默认生存期（ms），从收到请求时开始计算，通常与调用者等待回复的时间（如 :data:`SMARTBUS_NOTIFY_TTL` ）一致。
+    请求中的扩展成员 ``ttl`` （ms）可以覆盖这个值。
+    超过生存期仍未开始执行的请求被丢弃，不执行，也不回复：在分发之前、分配给子进程之前、子进程开始执行之前分别检查。
+    ``None`` 表示请求的生存期只由请求中的 ``ttl`` 决定（默认）。
+    启用时，该值不应小于调用者实际等待回复的时间，否则仍在等待的调用者会收不到回复。
+:param method_timeout: RPC 方法的执行时间限制（秒），从子进程开始执行时计算。 ``None`` 表示无限制。
+    可以用 :func:`rpcmethod.timeout` 为单个方法设置不同的限制。
+    执行超时的请求立即收到超时错误（code ``-32001`` ）。协程方法超时后被取消；
+    普通方法超时后，执行它的子进程被杀死并替换，不影响进程池中的其它子进程。
+:param reset_ready_timeout: 重新加载时，等待新进程池完成初始化的最长时间（秒）。超时则放弃重新加载，继续使用原进程池。
+:param reset_drain_timeout: 重新加载时，等待原进程池中执行中的请求完成的最长时间（秒）。
+    超时后，原进程池被强行终止，其中仍在执行的请求收到错误回复。
+:param autoscale: 默认进程池的子进程数量自动调整策略。 ``None`` 表示子进程数量固定为 ``pool_processes`` 。
+    如::
+
+        "autoscale": {
+            "min_processes": 2,
+            "max_processes": 16,
+            "scale_up_utilization": 0.8,
+            "scale_down_utilization": 0.3,
+            "scale_up_wait": 0.5,
+            "cooldown": 30
+        }
+
+    执行器根据利用率、请求在队列中的等待时间与等待中的请求数增减子进程；
+    ``scale_down_utilization`` 与 ``scale_up_utilization`` 之间的区间以及 ``cooldown`` 避免子进程数量来回振荡。
+    详见 :class:`autoscaler.ScalingPolicy` 。命名的进程池可以在其设置中使用 ``autoscale`` 属性。
+:param autoscale_interval: 自动调整的采样间隔（秒）。
+:param warmup_modules: 子进程初始化时预热的模块名列表。如 ``["methods"]`` 表示导入 :mod:`methods` 包及其所有子模块，
+    并执行其中用 :func:`rpcmethod.warmup` 声明的预热函数。子进程在预热完成之后才开始接收请求。
+:param dispatcher_shards: 分发分片的数量。每个分片有自己的队列与分发线程，
+    请求按照来源（ ``srcUnitId`` , ``srcUnitClientId`` ）分配到固定的分片，同一来源的请求按照收到的顺序分发。
 :param pool_processes: 执行器池的最大数量。 ``None`` 表示使用 CPU 核心数量作为其最大值。
 :param pool_maxtasksperchild: 进程池最大执行数量。 ``None`` 表示无限制。超过该值，则重启子进程。
+:param pool_maxtasks_jitter: 每个子进程的最大执行数量在 ``pool_maxtasksperchild`` 的 ±该比例内随机分布，
+    避免所有子进程同时重启。
+:param pool_max_rss: 子进程常驻内存（RSS）的上限（MB）。 ``None`` 表示无限制。超过该值，则重启子进程。
+    重启子进程时，先启动新的子进程并等待其完成初始化，每个进程池同一时间只重启一个子进程。
+:param pool_shm_threshold: 序列化后不小于该值（KB）的返回值经共享内存，而不是管道，从子进程传递给主进程。
+    ``None`` 表示不使用共享内存（默认）。返回值常常有数 MB 时，可设为 ``1024`` 等值，避免大结果阻塞管道；
+    子进程退出或者进程池终止时，未被读取的共享内存段由主进程清除。
+:param pool_max_inflight: 每个子进程同时执行的最大任务数。协程方法（ ``async def`` ）在子进程常驻的事件循环中执行，
+    该值大于 1 时，一个子进程可以同时执行多个 I/O 密集型的协程方法。
+    子进程正在执行普通（非协程）方法时不会被分配新的请求，所以普通方法的调度与该值为 1 时相同。
+:param pool_threads: 每个子进程中线程池的线程数。 ``0`` 表示不使用线程池，普通（非协程）方法在子进程中依次执行。
+    大于 0 时，普通方法在子进程的线程池中执行，总的并发数是 ``pool_processes`` × ``pool_threads`` ，
+    而不必为此增加子进程的数量与内存。
+:param pool_threaded_default: 没有使用 :func:`rpcmethod.threaded` 修饰的普通方法是否在线程池中执行。
+:param method_cache_size: 子进程中 RPC 方法名解析缓存的最大条目数，按 LRU 淘汰。 ``0`` 表示不缓存。
+:param batch_max_threads: 子进程中并行执行批量请求的最大线程数。 ``1`` 表示按顺序执行。
+:param stream_chunk_size: RPC 方法是生成器时，每个部分回复包含的最大条目数。
+    执行器将生成器的结果分段发送，最后发送一个结束回复（见 :doc:`ipsc-integration` ）。 ``0`` 表示不分段，各项被收集为一个列表返回。
+:param pools: 命名的独立进程池。键是进程池名称，值是该进程池的设置，如::
+
+        "pools": {
+            "db": {
+                "methods": ["db.*"],
+                "processes": 4,
+                "queue_maxsize": 200,
+                "maxtasksperchild": 500
+            }
+        }
+
+    ``methods`` 中的方法（ ``"db.*"`` 表示 ``db`` 名称空间下的所有方法）在该进程池中执行，其它方法在默认进程池中执行。
+    每个进程池的设置属性有： ``methods`` , ``processes`` , ``queue_maxsize`` , ``maxtasksperchild`` , ``maxtasks_jitter`` , ``max_rss`` , ``shm_threshold`` , ``max_inflight`` , ``threads`` , ``timeout`` , ``autoscale`` 。
+    详见 :class:`executor.Executor` 。
+:param affinity: 方法的亲和键。键是方法名（ ``"crm.*"`` 表示 ``crm`` 名称空间下的所有方法， ``"*"`` 表示其它所有方法），
+    值是参数名、参数的位置，或者 ``"$source"`` （请求的来源 IPSC 单元与客户端），如::
+
+        "affinity": {
+            "crm.lookup_customer": "caller",
+            "ivr.*": "$source"
+        }
+
+    亲和键相同的请求通过一致性哈希分配给同一个子进程，使各个子进程中的缓存各自保存一部分数据。
+    重启子进程不改变请求的分配；增减子进程时，只有少部分亲和键被重新分配。
+:param coalesce: 可合并的方法名列表（ ``"crm.*"`` 表示 ``crm`` 名称空间下的所有方法， ``"*"`` 表示所有方法），如::
+
+        "coalesce": ["campaign.get_config", "ivr.*"]
+
+    这些方法的一个调用正在执行时，之后收到的方法名与参数都相同的请求不再执行，而是与它得到相同的返回值，
+    各自以自己的 ``id`` 回复。适用于可以共享结果、但不宜缓存（见 :func:`rpcmethod.cacheable` ）的查询。
+:param reply_compression: 回复的压缩设置。 ``None`` 表示不压缩。如::
+
+        "reply_compression": {
+            "threshold": 16384,
+            "level": 6,
+            "methods": {"report.*": 9, "crm.lookup": 0}
+        }
+
+    不小于 ``threshold`` 字符的回复以 zlib 压缩，以带有 ``compression`` 成员的 JSON 文本发送，
+    IPSC 流程需要能够识别并解压这样的回复（格式见 :mod:`compression` ）。
+    ``methods`` 设置各个方法的压缩级别， ``0`` 表示不压缩。
+    通常的查询结果压缩后约为原来的 1/4 ；小于几百字节的回复、已经压缩过的数据不值得压缩；
+    级别 9 比级别 6 的用时多数倍，而压缩率相差很小。可以用 ``tests/bench_reply_compression.py`` 在实际的数据上测量。
+:param json_backend: JSON 编解码的后端。 ``"auto"`` 表示安装了 ``orjson`` 时使用它，
+    否则使用标准库 ``json`` ；也可以指定 ``"orjson"`` 、 ``"ujson"`` 或 ``"json"`` 。
+    第三方后端不转义非 ASCII 字符，回复按 UTF-8 传输。各个后端的性能可以用 ``tests/bench_json_codec.py`` 测量。
+:param json_converters: 自定义的 JSON 类型转换，键是类型的完整名称，值是转换函数的完整名称，如::
+
+        "json_converters": {"decimal.Decimal": "builtins.float"}
+
+    返回值中的 ``datetime`` , ``date`` , ``time`` , ``timedelta`` , ``Decimal`` , ``bytes`` 等类型在编码回复时自动转换（见 :mod:`jsoncodec` ），
+    RPC 方法不需要事先转换。这里的设置增加或者覆盖这些转换，如上面的例子将 ``Decimal`` 转为数字（默认转为文本，以保留全部精度）。
+:param parse_in_worker: 为 ``True`` 时，主进程将请求的原始文本转发给子进程，由子进程解析请求、执行，
+    并将回复编码为可以直接发送的 JSON 文本。主进程只负责转发与调用 ``sendNotify`` ，
+    不再为每个请求执行 JSON 解析与编码。
 
 .. warning:: 不得删除该变量，不得修改该变量的结构。
 '''
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+''' 合并并发的相同调用（single-flight）
+
+对于设置了合并的方法，一个调用正在执行时，之后收到的相同调用（方法名与参数都相同）不再分配给子进程，
+而是附加到正在执行的调用上，与它得到相同的返回值或错误。每个请求仍然以自己的 ``id`` 回复。
+
+这样，突发的相同请求（如大量呼叫同时查询同一个配置）只在子进程中执行一次。
+
+与 :mod:`resultcache` 不同，合并不保存返回值：调用完成后，之后的相同请求会被再次执行。
+所以它适用于那些可以共享结果、但不宜缓存的方法。
+
+:date: 2026-10-18
+'''
+
+from __future__ import print_function, unicode_literals, absolute_import
+
+import threading
+
+from resultcache import make_key
+
+
+class SingleFlight(object):
+    '''主进程中正在执行的、可合并的调用
+
+    :param methods: 可合并的方法名的列表， ``"crm.*"`` 表示 ``crm`` 名称空间下的所有方法， ``"*"`` 表示所有方法
+    '''
+
+    def __init__(self, methods=None):
+        self._exact = set()
+        self._prefixes = set()
+        self._all = False
+        for pattern in methods or []:
+            pattern = pattern.strip()
+            if pattern == '*':
+                self._all = True
+            elif pattern.endswith('.*'):
+                self._prefixes.add(pattern[:-2])
+            else:
+                self._exact.add(pattern)
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._coalesced = {}
+
+    def matches(self, method):
+        '''该方法是否可合并'''
+        if self._all or method in self._exact:
+            return True
+        if self._prefixes:
+            parts = method.split('.')
+            for i in range(len(parts) - 1, 0, -1):
+                if '.'.join(parts[:i]) in self._prefixes:
+                    return True
+        return False
+
+    def key(self, method, args, kwargs):
+        '''返回调用的合并键。方法不可合并，或者参数无法生成键时，返回 ``None``'''
+        if not self.matches(method):
+            return None
+        try:
+            return (method, make_key(None, args, kwargs))
+        except (TypeError, ValueError):
+            return None
+
+    def join(self, key, waiter):
+        '''加入调用
+
+        :param key: :meth:`key` 返回的合并键
+        :param waiter: 调用完成时由调用者处理的对象，见 :meth:`leave`
+        :return: ``True`` 表示没有正在执行的相同调用，调用者应当执行它，并在完成时调用 :meth:`leave` ；
+            ``False`` 表示 ``waiter`` 已附加到正在执行的相同调用上
+        '''
+        with self._lock:
+            waiters = self._flights.get(key)
+            if waiters is None:
+                self._flights[key] = []
+                return True
+            waiters.append(waiter)
+            self._coalesced[key[0]] = self._coalesced.get(key[0], 0) + 1
+            return False
+
+    def leave(self, key):
+        '''结束调用
+
+        :return: 附加到该调用上的 ``waiter`` 列表
+        '''
+        with self._lock:
+            return self._flights.pop(key, [])
+
+    def stats(self):
+        '''统计信息
+
+        :rtype: dict
+        '''
+        with self._lock:
+            return {
+                'inflight': len(self._flights),
+                'coalesced': sum(self._coalesced.values()),
+                'methods': dict(self._coalesced),
+            }
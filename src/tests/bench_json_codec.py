@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+''' JSON 编解码后端的基准测试
+
+在实际的消息上，比较已安装的各个 :mod:`jsoncodec` 后端的编码（ ``dumps`` ）与解码（ ``loads`` ）用时：
+IPSC 发来的单个请求与批量请求，以及方法的回复（简单结果、错误、批量回复、查询结果）。
+
+运行::
+
+    cd src
+    python tests/bench_json_codec.py
+
+没有安装的后端不参加比较，可以先 ``pip install orjson ujson`` 。
+
+:date: 2026-10-18
+'''
+from __future__ import print_function, absolute_import
+
+import os
+import sys
+import random
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jsoncodec
+import jsonrpc
+
+
+def _request(i):
+    '''IPSC 流程发来的请求'''
+    return {
+        'jsonrpc': '2.0', 'id': '{:08x}-{}'.format(i * 7919, i), 'method': 'crm.lookup_customer',
+        'params': {'caller': '138{:08d}'.format(i), 'called': '4008001234', 'channel': i % 120},
+    }
+
+
+def _rows(n):
+    '''模拟数据库查询结果：日期时间、中文姓名、号码、金额'''
+    rnd = random.Random(n)
+    names = ['张三', '李四', '王五', '赵六', '刘备', '关羽']
+    return [{
+        'id': i,
+        'caller': '138{:08d}'.format(rnd.randint(0, 99999999)),
+        'name': rnd.choice(names),
+        'begin_time': '2026-10-{:02d} {:02d}:{:02d}:{:02d}'.format(
+            rnd.randint(1, 28), rnd.randint(0, 23), rnd.randint(0, 59), rnd.randint(0, 59)),
+        'duration': rnd.randint(0, 3600),
+        'amount': rnd.random() * 1000,
+        'status': rnd.choice(['ANSWERED', 'NO ANSWER', 'BUSY']),
+    } for i in range(n)]
+
+
+def _reply(result):
+    return {'jsonrpc': '2.0', 'id': 'abc-123', 'result': result}
+
+
+def _cases():
+    return [
+        ('request', _request(1)),
+        ('batch request x10', [_request(i) for i in range(10)]),
+        ('reply scalar', _reply(True)),
+        ('reply error', jsonrpc.MethodNotFoundError(id_='abc-123').to_dict()),
+        ('reply customer', _reply(_rows(1)[0])),
+        ('batch reply x10', [_reply(row) for row in _rows(10)]),
+        ('reply rows x200', _reply(_rows(200))),
+        ('reply rows x5000', _reply(_rows(5000))),
+    ]
+
+
+def _best(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def main():
+    backends = jsoncodec.available()
+    cases = _cases()
+    print('backends: {}'.format(', '.join(backends)))
+    print('{:<18} {:<7} {:>9} {:>11} {:>11} {:>9}'.format(
+        'message', 'backend', 'bytes', 'dumps(us)', 'loads(us)', 'speedup'))
+    try:
+        for name, obj in cases:
+            baseline = None
+            for backend in reversed(backends):  # 标准库在最后，作为基准先测
+                jsoncodec.use(backend)
+                text = jsoncodec.dumps(obj)
+                assert jsoncodec.loads(text) == jsoncodec.loads(jsoncodec.dumps(obj, sort_keys=True))
+                number = max(1, 300000 // len(text))
+                dumps = _best(lambda: jsoncodec.dumps(obj), number)
+                loads = _best(lambda: jsoncodec.loads(text), number)
+                if baseline is None:
+                    baseline = dumps + loads
+                print('{:<18} {:<7} {:>9} {:>11.2f} {:>11.2f} {:>8.1f}x'.format(
+                    name, backend, len(text.encode('utf-8')), dumps * 1e6, loads * 1e6, baseline / (dumps + loads)))
+    finally:
+        jsoncodec.use()
+    print()
+    print('speedup: (dumps + loads) of the standard library divided by that of the backend.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+''' 数据库查询结果的 JSON 转换与编码的基准测试
+
+模拟 100,000 行的查询结果（ ``datetime`` , ``date`` , ``Decimal`` 等类型的列），比较将其编码为回复文本的几种方式：
+
+* ``legacy + json`` : 此前的 ``jsonrpc.recursive_jsonable`` （递归， ``isinstance`` 链）转换，再以标准库编码
+* ``jsonable + <backend>`` : :func:`jsoncodec.jsonable` （循环，按类型查表）转换，再编码
+* ``fused <backend>`` : 不事先转换，由 :func:`jsoncodec.dumps` 在编码时调用 :func:`jsoncodec.convert` ——即回复的编码方式
+
+运行::
+
+    cd src
+    python tests/bench_jsonable.py [行数]
+
+:date: 2026-10-18
+'''
+from __future__ import print_function, absolute_import
+
+import os
+import sys
+import time
+import random
+import decimal
+import datetime
+import collections
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jsoncodec
+
+
+def _legacy_jsonable(obj, encoding='utf-8'):
+    '''此前的 ``jsonrpc.recursive_jsonable``'''
+    if obj is None:
+        return obj
+    elif isinstance(obj, (int, float, bool)):
+        return obj
+    elif isinstance(obj, str):
+        return obj
+    elif isinstance(obj, bytes):
+        return obj.decode(encoding)
+    elif isinstance(obj, datetime.datetime):
+        return obj.strftime('%Y-%m-%d %H:%M:%S')
+    elif isinstance(obj, datetime.date):
+        return obj.strftime('%Y-%m-%d')
+    elif isinstance(obj, datetime.time):
+        return obj.strftime('%H:%M:%S')
+    elif isinstance(obj, datetime.timedelta):
+        raise NotImplementedError()
+    elif isinstance(obj, (tuple, list)):
+        return [_legacy_jsonable(i) for i in obj]
+    elif isinstance(obj, dict):
+        return dict((_legacy_jsonable(k), _legacy_jsonable(v)) for (k, v) in obj.items())
+    else:
+        return str(obj)
+
+
+Row = collections.namedtuple('Row', 'id caller name begin_time call_date duration amount memo')
+
+
+def _rows(n, as_dict):
+    '''模拟呼叫记录的查询结果。 ``as_dict`` 为 ``True`` 时每行是 dict （如 ``pymssql`` 的 ``as_dict=True`` ），否则是 namedtuple'''
+    rnd = random.Random(n)
+    names = ['张三', '李四', '王五', '赵六']
+    begin = datetime.datetime(2026, 10, 1)
+    rows = []
+    for i in range(n):
+        begin_time = begin + datetime.timedelta(seconds=rnd.randint(0, 86400 * 17))
+        row = Row(
+            i, '138{:08d}'.format(rnd.randint(0, 99999999)), rnd.choice(names),
+            begin_time, begin_time.date(), rnd.randint(0, 3600),
+            decimal.Decimal(rnd.randint(0, 100000)) / 100, None if i % 3 else 'VIP',
+        )
+        rows.append(row._asdict() if as_dict else row)
+    return rows
+
+
+def _best(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - begin
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    backends = jsoncodec.available()
+    print('{} rows, backends: {}'.format(n, ', '.join(backends)))
+    print('{:<6} {:<18} {:>10} {:>10} {:>10} {:>8}'.format('rows', 'method', 'convert(s)', 'encode(s)', 'total(s)', 'speedup'))
+    try:
+        for as_dict in (True, False):
+            rows = _rows(n, as_dict)
+            shape = 'dict' if as_dict else 'tuple'
+            jsoncodec.use('json')
+            convert = _best(lambda: _legacy_jsonable(rows))
+            converted = _legacy_jsonable(rows)
+            encode = _best(lambda: jsoncodec.dumps(converted))
+            baseline = convert + encode
+            results = [('legacy + json', convert, encode)]
+            for backend in backends:
+                jsoncodec.use(backend)
+                convert = _best(lambda: jsoncodec.jsonable(rows))
+                converted = jsoncodec.jsonable(rows)
+                encode = _best(lambda: jsoncodec.dumps(converted))
+                results.append(('jsonable + ' + backend, convert, encode))
+                assert jsoncodec.loads(jsoncodec.dumps(rows)) == jsoncodec.loads(jsoncodec.dumps(converted))
+            for backend in backends:
+                jsoncodec.use(backend)
+                results.append(('fused ' + backend, 0.0, _best(lambda: jsoncodec.dumps(rows))))
+            for name, convert, encode in results:
+                print('{:<6} {:<18} {:>10.3f} {:>10.3f} {:>10.3f} {:>7.1f}x'.format(
+                    shape, name, convert, encode, convert + encode, baseline / (convert + encode)))
+    finally:
+        jsoncodec.use()
+    print()
+    print('speedup is relative to legacy + json.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+''' JSON RPC 请求解析的基准测试
+
+比较 :func:`jsonrpc.parse` 与此前的实现（修改 JSON 解码得到的 dict ，删除多余的成员，再加入 ``args`` , ``kwargs`` 成员，
+返回三元组）：
+
+* ``parse(us)`` : 每个请求的解析用时，包括 JSON 解码
+* ``build(us)`` : 扣除 JSON 解码用时之后，构造请求对象的用时
+* ``blocks`` , ``retained`` : 解析后的请求在队列中等待执行期间，每个请求占用的内存块数与字节数（ :mod:`tracemalloc` ）
+
+运行::
+
+    cd src
+    python tests/bench_jsonrpc_parse.py
+
+:date: 2026-10-18
+'''
+from __future__ import print_function, absolute_import
+
+import os
+import sys
+import gc
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jsoncodec
+import jsonrpc
+from jsonrpc import FormatError, InvalidRequestError, InvalidParamsError
+
+
+def _legacy_parse(txt):
+    '''此前的 :func:`jsonrpc.parse` （只保留请求的部分）'''
+    try:
+        obj = jsoncodec.loads(txt)
+    except Exception as e:
+        raise FormatError(message=str(e))
+    if isinstance(obj, list):
+        return [_legacy_parse_obj(member)[0] for member in obj], None, None
+    return _legacy_parse_obj(obj)
+
+
+def _legacy_parse_obj(obj):
+    request = result = error = None
+    id_ = obj.get('id')
+    if not isinstance(id_, (str, int, float, type(None))):
+        raise FormatError()
+    if ('method' in obj) + ('result' in obj) + ('error' in obj) != 1:
+        raise FormatError(id_=id_)
+    if 'method' in obj:
+        method = obj.get('method')
+        if not isinstance(method, str):
+            raise InvalidRequestError(id_=id_)
+        method = method.strip()
+        if not method:
+            raise InvalidRequestError(id_=id_)
+        obj['method'] = method
+        params = obj.get('params')
+        args = []
+        kwargs = {}
+        if params is None:
+            pass
+        elif isinstance(params, (tuple, list)):
+            args = params
+        elif isinstance(params, dict):
+            kwargs = params
+        else:
+            raise InvalidParamsError(id_=id_)
+        ttl = obj.get('ttl')
+        if ttl is not None and (isinstance(ttl, bool) or not isinstance(ttl, (int, float)) or ttl <= 0):
+            raise InvalidRequestError(id_=id_)
+        for k in [k for k in obj.keys() if k not in ['jsonrpc', 'id', 'method', 'params', 'ttl']]: obj.pop(k)
+        request = obj
+        request['ttl'] = ttl
+        request['args'] = args
+        request['kwargs'] = kwargs
+    return request, result, error
+
+
+def _request(i, params):
+    return jsoncodec.dumps({'jsonrpc': '2.0', 'id': 'req-{}'.format(i), 'method': 'crm.lookup_customer', 'params': params})
+
+
+def _cases():
+    return [
+        ('positional', _request(1, ['13800138000', '4008001234'])),
+        ('named', _request(2, {'caller': '13800138000', 'called': '4008001234'})),
+        ('no params', jsoncodec.dumps({'jsonrpc': '2.0', 'id': 3, 'method': 'sys.ping'})),
+        ('ttl + extra', jsoncodec.dumps({'jsonrpc': '2.0', 'id': 4, 'method': 'ivr.menu', 'params': [1],
+                                         'ttl': 5000, 'trace': 'abc', 'ext': {'a': 1}})),
+        ('batch x10', '[{}]'.format(','.join(_request(i, [i, 'x']) for i in range(10)))),
+    ]
+
+
+def _best(func, number):
+    return min(timeit.repeat(func, number=number, repeat=15)) / number
+
+
+def _retained(func, txt, number=2000):
+    '''解析后的请求在等待执行期间占用的内存块数与字节数'''
+    gc.collect()
+    tracemalloc.start()
+    try:
+        kept = [func(txt) for _ in range(number)]
+        blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del kept
+    return blocks / float(number), size / float(number)
+
+
+def main():
+    number = 10000
+    print('{:<12} {:<7} {:>10} {:>10} {:>8} {:>9}'.format('request', 'parse', 'parse(us)', 'build(us)', 'blocks', 'retained'))
+    for name, txt in _cases():
+        decode = _best(lambda: jsoncodec.loads(txt), number)
+        for label, func in (('legacy', _legacy_parse), ('slots', jsonrpc.parse)):
+            elapsed = _best(lambda: func(txt), number)
+            blocks, retained = _retained(func, txt)
+            print('{:<12} {:<7} {:>10.3f} {:>10.3f} {:>8.1f} {:>9.0f}'.format(
+                name, label, elapsed * 1e6, (elapsed - decode) * 1e6, blocks, retained))
+    print()
+    print('JSON backend: {}'.format(jsoncodec.backend))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+''' 回复压缩的基准测试
+
+对不同大小、不同内容的回复，测量各个压缩级别的压缩率、压缩与解压用时，并计算盈亏平衡带宽：
+链路带宽低于该值时，压缩节省的传输时间大于压缩与解压的用时。
+
+运行::
+
+    cd src
+    python tests/bench_reply_compression.py
+
+:date: 2026-10-18
+'''
+from __future__ import print_function, absolute_import
+
+import os
+import sys
+import json
+import time
+import random
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import compression
+
+
+def _rows(n):
+    '''模拟数据库查询结果：日期时间、中文姓名、号码、金额'''
+    rnd = random.Random(n)
+    names = ['张三', '李四', '王五', '赵六', '刘备', '关羽']
+    return [{
+        'id': i,
+        'caller': '138{:08d}'.format(rnd.randint(0, 99999999)),
+        'name': rnd.choice(names),
+        'begin_time': '2026-10-{:02d} {:02d}:{:02d}:{:02d}'.format(
+            rnd.randint(1, 28), rnd.randint(0, 23), rnd.randint(0, 59), rnd.randint(0, 59)),
+        'duration': rnd.randint(0, 3600),
+        'amount': '{:.2f}'.format(rnd.random() * 1000),
+        'status': rnd.choice(['ANSWERED', 'NO ANSWER', 'BUSY']),
+    } for i in range(n)]
+
+
+def _random_text(n):
+    '''几乎无法压缩的回复（如已编码的二进制数据）'''
+    rnd = random.Random(n)
+    return ''.join(rnd.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/') for _ in range(n))
+
+
+def _reply(result):
+    return json.dumps({'jsonrpc': '2.0', 'id': 'bench', 'result': result})
+
+
+def _best(func, number):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
+
+
+def main():
+    cases = []
+    for n in (2, 10, 50, 200, 1000, 5000):
+        cases.append(('rows x{}'.format(n), _reply(_rows(n))))
+    for n in (1024, 65536):
+        cases.append(('random {}'.format(n), _reply(_random_text(n))))
+    print('{:<14} {:>9} {:>5} {:>9} {:>7} {:>10} {:>10} {:>14}'.format(
+        'payload', 'bytes', 'level', 'sent', 'ratio', 'comp(ms)', 'dec(ms)', 'break-even'))
+    for name, data in cases:
+        raw = len(data.encode('utf-8'))
+        for level in (1, 6, 9):
+            number = max(1, 200000 // raw)
+            compressed = compression.compress(data, level, 'bench')
+            obj = json.loads(compressed)
+            comp = _best(lambda: compression.compress(data, level, 'bench'), number)
+            dec = _best(lambda: compression.decompress(json.loads(compressed)), number)
+            assert compression.decompress(obj) == data
+            saved = raw - len(compressed)
+            if saved > 0:
+                # 每秒可以传输 saved / (comp + dec) 字节时，压缩与否用时相同
+                break_even = '{:.1f} Mbit/s'.format(saved * 8 / (comp + dec) / 1e6)
+            else:
+                break_even = 'never'
+            print('{:<14} {:>9} {:>5} {:>9} {:>7.2f} {:>10.3f} {:>10.3f} {:>14}'.format(
+                name, raw, level, len(compressed), len(compressed) / float(raw), comp * 1000, dec * 1000, break_even))
+    print()
+    print('break-even: compression pays off on links slower than this bandwidth '
+          '(CPU time of compress + decompress equals the transfer time saved).')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+''' 执行器测试的公共环境
+
+* :class:`Client` , :class:`PackInfo` : 模拟的 smartbus 客户端与数据包附加信息，记录执行器发送的回复
+* :func:`install_methods` : 将本模块中的测试方法作为 ``methods.testing`` 名称空间加入 :mod:`methods` 包。
+  子进程由 fork 创建，所以必须在启动执行器之前调用
+* :func:`start_executor` : 以测试用的设置创建并启动执行器，等待子进程完成初始化
+
+:date: 2026-10-18
+'''
+from __future__ import absolute_import
+
+import os
+import sys
+import time
+import types
+import asyncio
+import logging
+import logging.handlers
+import threading
+import multiprocessing
+
+import globalvars
+import jsoncodec
+import jsonrpc
+import executor
+import methods
+import rpcmethod
+
+
+class ProgArgs(object):
+    verbose = False
+    no_web_server = True
+
+
+class PackInfo(object):
+
+    def __init__(self, srcUnitId=1, srcUnitClientId=2):
+        self.srcUnitId = srcUnitId
+        self.srcUnitClientId = srcUnitClientId
+
+
+class Client(object):
+    '''模拟的 smartbus 客户端，记录 ``sendNotify`` 的调用'''
+
+    def __init__(self):
+        self.sent = []
+        self._cond = threading.Condition()
+
+    def sendNotify(self, unitId, clientId, clientType, title, mode, ttl, data):
+        with self._cond:
+            self.sent.append((title, data))
+            self._cond.notify_all()
+
+    def wait(self, count, timeout=10):
+        '''等待至少 ``count`` 个回复，返回解码后的回复列表'''
+        end = time.time() + timeout
+        with self._cond:
+            while len(self.sent) < count:
+                remaining = end - time.time()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return [jsoncodec.loads(data) for _, data in self.sent]
+
+    def titles(self):
+        with self._cond:
+            return [title for title, _ in self.sent]
+
+
+def request(method, params=None, id_=None, **extra):
+    '''返回 JSON RPC 请求文本'''
+    obj = {'jsonrpc': jsonrpc.jsonrpc_version, 'method': method}
+    if id_ is not None:
+        obj['id'] = id_
+    if params is not None:
+        obj['params'] = params
+    obj.update(extra)
+    return jsoncodec.dumps(obj)
+
+
+def setup_globals():
+    '''设置执行器需要的全局变量：命令行参数与子进程的日志队列'''
+    globalvars.prog_args = ProgArgs
+    if globalvars.main_logging_queue is None:
+        globalvars.main_logging_queue = multiprocessing.Queue()
+        globalvars.main_logging_listener = logging.handlers.QueueListener(
+            globalvars.main_logging_queue, *logging.root.handlers)
+        globalvars.main_logging_listener.start()
+
+
+def start_executor(**kwargs):
+    '''创建并启动执行器，默认一个子进程'''
+    setup_globals()
+    install_methods()
+    kwargs.setdefault('pool_processes', 1)
+    instance = executor.Executor(**kwargs)
+    instance.start()
+    for pool in instance._pools.values():
+        pool.wait_ready(10)
+    return instance
+
+
+#############################################################################
+# 测试方法，以 ``testing.<名称>`` 调用
+#############################################################################
+
+_calls = {}
+_warmed = []
+WARMUP_SECONDS = 0.3
+
+
+@rpcmethod.warmup
+def _warmup():
+    '''预热函数，仅在设置了 ``warmup_modules`` 的子进程中执行'''
+    time.sleep(WARMUP_SECONDS)
+    _warmed.append(os.getpid())
+
+
+def pid():
+    return os.getpid()
+
+
+def thread_name():
+    return threading.current_thread().name
+
+
+@rpcmethod.threaded(False)
+def unthreaded_thread_name():
+    return threading.current_thread().name
+
+
+def echo(value):
+    return value
+
+
+def sleep(seconds):
+    time.sleep(seconds)
+    return os.getpid()
+
+
+async def async_sleep(seconds):
+    await asyncio.sleep(seconds)
+    return os.getpid()
+
+
+def calls(key):
+    '''返回本子进程中以 ``key`` 调用本方法的次数（包括本次）'''
+    _calls[key] = _calls.get(key, 0) + 1
+    return _calls[key]
+
+
+def slow_calls(key, seconds):
+    '''等待 ``seconds`` 秒，然后返回 :func:`calls` 的结果'''
+    time.sleep(seconds)
+    return calls(key)
+
+
+def fail(message):
+    raise ValueError(message)
+
+
+def exit(code):
+    '''结束子进程，模拟子进程意外退出'''
+    os._exit(code)
+
+
+def method_cache():
+    '''返回本子进程的 RPC 方法缓存统计'''
+    return executor.method_cache_info()._asdict()
+
+
+def warmed():
+    return os.getpid() in _warmed
+
+
+def items(count):
+    for i in range(count):
+        yield i
+
+
+async def async_items(count):
+    for i in range(count):
+        await asyncio.sleep(0)
+        yield i
+
+
+@rpcmethod.stream(2)
+def pairs(count):
+    for i in range(count):
+        yield i
+
+
+def broken_items(count):
+    for i in range(count):
+        yield i
+    raise ValueError('broken after {}'.format(count))
+
+
+def text(size):
+    return 'x' * size
+
+
+@rpcmethod.cacheable(ttl=60)
+def cached_calls(key):
+    return calls(key)
+
+
+_METHODS = (pid, thread_name, unthreaded_thread_name, echo, sleep, async_sleep, calls, slow_calls, fail, exit, method_cache, warmed, items, async_items, pairs, broken_items, text, cached_calls)
+
+
+def install_methods():
+    '''将测试方法作为 ``methods.testing`` 加入 :mod:`methods` 包'''
+    module = sys.modules.get('methods.testing')
+    if module is None:
+        module = types.ModuleType('methods.testing')
+        for func in _METHODS:
+            setattr(module, func.__name__, func)
+        sys.modules['methods.testing'] = module
+        methods.testing = module
+    return module
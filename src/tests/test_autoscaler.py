@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+'''
+:date: 2026-10-18
+'''
+from __future__ import absolute_import
+
+import unittest
+
+import time
+
+from autoscaler import Autoscaler, ScalingPolicy
+from workerpool import WorkerPool
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+
+
+class _FakePool(object):
+
+    def __init__(self, processes, busy=0.0, pending=0, concurrency=1):
+        self.processes = processes
+        self.busy = busy
+        self.pending = pending
+        self.concurrency = concurrency
+        self.resized = []
+
+    def load(self):
+        return {
+            'processes': self.processes,
+            'capacity': self.processes * self.concurrency,
+            'inflight': 0,
+            'busy': self.busy,
+            'pending': self.pending,
+            'oldest_pending': 0.0,
+            'wait_total': 0.0,
+            'wait_count': 0,
+        }
+
+    def resize(self, processes):
+        self.resized.append(processes)
+        self.processes = processes
+
+
+class TestDecide(unittest.TestCase):
+
+    # processes, utilization, wait, pending, concurrency, since_change, since_up -> processes, scaled
+    TABLE = [
+        ((1, 0.0, 0.0, 0, 1, 999, 999), (2, True)),     # 低于下限
+        ((9, 0.0, 0.0, 0, 1, 999, 999), (8, True)),     # 高于上限
+        ((4, 1.0, 9.0, 9, 1, 10, 999), (4, False)),     # 冷却中
+        ((4, 0.9, 0.0, 0, 1, 60, 999), (5, True)),      # 利用率高
+        ((4, 0.5, 0.6, 0, 1, 60, 999), (5, True)),      # 等待时间长
+        ((4, 0.9, 0.0, 6, 4, 60, 999), (6, True)),      # 按等待中的任务数一次增加
+        ((4, 0.9, 0.0, 10, 1, 60, 999), (8, True)),     # 不超过上限
+        ((8, 1.0, 2.0, 10, 1, 60, 999), (8, False)),    # 已经到达上限
+        ((4, 0.5, 0.1, 0, 1, 60, 999), (4, False)),     # 在两个利用率阈值之间
+        ((4, 0.2, 0.0, 0, 1, 60, 999), (3, True)),      # 利用率低
+        ((4, 0.2, 0.0, 1, 1, 60, 999), (4, False)),     # 还有等待中的任务
+        ((4, 0.2, 0.0, 0, 1, 60, 60), (4, False)),      # 增加后不久，不减少
+        ((2, 0.0, 0.0, 0, 1, 999, 999), (2, False)),    # 已经到达下限
+    ]
+
+    def test_decision_table(self):
+        policy = ScalingPolicy(min_processes=2, max_processes=8, cooldown=30, scale_down_cooldown=120)
+        for args, (expected, scaled) in self.TABLE:
+            processes, reason = policy.decide(*args)
+            self.assertEqual(processes, expected, args)
+            self.assertEqual(reason is not None, scaled, args)
+
+    def test_invalid_policy(self):
+        self.assertRaises(ValueError, ScalingPolicy, min_processes=0)
+        self.assertRaises(ValueError, ScalingPolicy, min_processes=4, max_processes=2)
+        self.assertRaises(ValueError, ScalingPolicy, scale_up_utilization=0.3, scale_down_utilization=0.3)
+
+
+class TestAutoscaler(unittest.TestCase):
+
+    def test_scale_up_on_busy_workers(self):
+        pools = {'default': _FakePool(2, busy=2.0)}
+        scaler = Autoscaler(lambda: pools, {'default': ScalingPolicy(1, 4, cooldown=0)})
+        scaler.tick(now=100)
+        self.assertEqual(pools['default'].resized, [3])
+        self.assertEqual(scaler.stats()['default']['last_sample']['utilization'], 1.0)
+
+    def test_state_survives_pool_swap(self):
+        pools = {'default': _FakePool(2, busy=2.0)}
+        scaler = Autoscaler(lambda: pools, {'default': ScalingPolicy(1, 4, cooldown=30)})
+        scaler.tick(now=100)
+        self.assertEqual(pools['default'].resized, [3])
+        pools['default'] = _FakePool(3, busy=3.0)  # 执行器重置后的新进程池
+        scaler.tick(now=110)
+        self.assertEqual(pools['default'].resized, [])
+        scaler.tick(now=131)
+        self.assertEqual(pools['default'].resized, [4])
+        stats = scaler.stats()['default']
+        self.assertEqual(stats['scale_ups'], 2)
+        self.assertEqual(len(stats['decisions']), 2)
+
+    def test_sync_task_saturates_worker(self):
+        pool = WorkerPool(processes=1, concurrency=32)
+        self.addCleanup(pool.join)
+        self.addCleanup(pool.terminate)
+        self.assertTrue(pool.wait_ready(10))
+        pool.apply_async(_sleep, (1,))
+        self.assertEqual(pool.load()['busy'], 1.0)
+        scaler = Autoscaler(lambda: {'default': pool}, {'default': ScalingPolicy(1, 2, cooldown=0)})
+        scaler.tick()
+        self.assertEqual(pool.processes, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+'''
+:date: 2026-10-18
+'''
+from __future__ import absolute_import
+
+import unittest
+
+import os
+import base64
+
+import jsoncodec
+import compression
+from compression import ReplyCompressor
+
+
+def _reply(result, id_='1'):
+    return jsoncodec.dumps({'jsonrpc': '2.0', 'id': id_, 'result': result})
+
+
+class TestEnvelope(unittest.TestCase):
+
+    def test_round_trip(self):
+        data = _reply('张三' * 1000)
+        obj = jsoncodec.loads(compression.compress(data, 9, '1'))
+        self.assertEqual(sorted(obj), ['compression', 'data', 'id', 'jsonrpc'])
+        self.assertEqual((obj['id'], obj['compression']), ('1', 'zlib'))
+        self.assertEqual(compression.decompress(obj), data)
+
+    def test_not_compressed(self):
+        self.assertIsNone(compression.decompress(jsoncodec.loads(_reply('x'))))
+        self.assertIsNone(compression.decompress([1]))
+
+
+class TestReplyCompressor(unittest.TestCase):
+
+    def test_threshold(self):
+        compressor = ReplyCompressor(threshold=1000)
+        small = _reply('x' * 10)
+        self.assertIs(compressor.encode(small, '1'), small)
+        large = _reply('x' * 2000)
+        encoded = compressor.encode(large, '1')
+        self.assertEqual(compression.decompress(jsoncodec.loads(encoded)), large)
+        stats = compressor.stats()
+        self.assertEqual((stats['compressed'], stats['skipped'], stats['bytes_in']), (1, 0, len(large)))
+        self.assertEqual(stats['bytes_saved'], len(large) - len(encoded))
+
+    def test_method_levels(self):
+        compressor = ReplyCompressor(level=6, methods={'report.*': 9, 'report.raw': 0, 'crm.lookup': 1})
+        self.assertEqual(compressor.level_for('report.daily'), 9)
+        self.assertEqual(compressor.level_for('report.raw'), 0)
+        self.assertEqual(compressor.level_for('crm.lookup'), 1)
+        self.assertEqual(compressor.level_for('crm.other'), 6)
+        self.assertEqual(compressor.level_for(None), 6)
+        self.assertEqual(ReplyCompressor(methods={'*': 0}).level_for('a.b'), 0)
+        large = _reply('x' * 20000)
+        self.assertIs(ReplyCompressor(threshold=10, methods={'report.raw': 0}).encode(large, '1', 'report.raw'), large)
+
+    def test_incompressible(self):
+        compressor = ReplyCompressor(threshold=10)
+        data = _reply(base64.b64encode(os.urandom(3000)).decode('ascii'))
+        self.assertIs(compressor.encode(data, '1'), data)
+        self.assertEqual(compressor.stats()['skipped'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,605 @@
+# -*- coding: utf-8 -*-
+
+'''
+:date: 2026-10-18
+'''
+from __future__ import absolute_import
+
+import unittest
+from unittest import mock
+
+import time
+import asyncio
+import importlib
+import threading
+
+import executor
+import jsoncodec
+import compression
+import fixtures
+
+
+def _run_batch(calls):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(executor._poolfunc_batch(calls))
+    finally:
+        loop.close()
+
+
+class TestBatchExecution(unittest.TestCase):
+
+    def setUp(self):
+        fixtures.setup_globals()
+        fixtures.install_methods()
+        self._batch_max_threads = executor.batch_max_threads
+        self.addCleanup(setattr, executor, 'batch_max_threads', self._batch_max_threads)
+
+    def test_single_call_not_on_loop_thread(self):
+        outcomes = _run_batch([('testing.thread_name', [], {})])
+        self.assertTrue(outcomes[0][0])
+        self.assertNotEqual(outcomes[0][1], threading.current_thread().name)
+
+    def test_serial_batch_not_on_loop_thread(self):
+        executor.batch_max_threads = 1
+        outcomes = _run_batch([('testing.thread_name', [], {})] * 3)
+        for ok, name in outcomes:
+            self.assertTrue(ok)
+            self.assertNotEqual(name, threading.current_thread().name)
+
+    def test_outcomes_in_order(self):
+        outcomes = _run_batch([
+            ('testing.echo', [1], {}),
+            ('testing.fail', ['boom'], {}),
+            ('testing.async_sleep', [0], {}),
+            ('testing.echo', [], {'value': 'x'}),
+        ])
+        self.assertEqual(outcomes[0], (True, 1))
+        self.assertFalse(outcomes[1][0])
+        self.assertEqual(outcomes[1][1]['code'], -32500)
+        self.assertTrue(outcomes[2][0])
+        self.assertEqual(outcomes[3], (True, 'x'))
+
+
+class TestMethodCache(unittest.TestCase):
+
+    def setUp(self):
+        fixtures.install_methods()
+        saved = (executor.mod_map_maxsize, executor.mod_map_hits, executor.mod_map_misses, dict(executor.mod_map))
+        self.addCleanup(self._restore, *saved)
+        executor.mod_map.clear()
+        executor.mod_map_hits = executor.mod_map_misses = 0
+
+    @staticmethod
+    def _restore(maxsize, hits, misses, items):
+        executor.mod_map_maxsize, executor.mod_map_hits, executor.mod_map_misses = maxsize, hits, misses
+        executor.mod_map.clear()
+        executor.mod_map.update(items)
+
+    def test_hits_and_misses(self):
+        executor.mod_map_maxsize = 2
+        for method in ('testing.echo', 'testing.echo', 'testing.pid', 'testing.fail', 'testing.echo'):
+            executor._resolve_method(method)
+        self.assertEqual(executor.method_cache_info(), (1, 4, 2, 2))
+        self.assertEqual(list(executor.mod_map), ['testing.fail', 'testing.echo'])
+
+    def test_disabled(self):
+        executor.mod_map_maxsize = 0
+        executor._resolve_method('testing.echo')
+        executor._resolve_method('testing.echo')
+        self.assertEqual(executor.method_cache_info(), (0, 2, 0, 0))
+
+    def test_concurrent_counts(self):
+        executor.mod_map_maxsize = 1024
+        methods = ['testing.echo', 'testing.pid', 'testing.sleep']
+
+        def resolve():
+            for _ in range(2000):
+                for method in methods:
+                    executor._resolve_method(method)
+
+        threads = [threading.Thread(target=resolve) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        info = executor.method_cache_info()
+        self.assertEqual(info.hits + info.misses, 8 * 2000 * len(methods))
+        # 同一方法同时未命中的线程各自解析
+        self.assertTrue(len(methods) <= info.misses <= 8 * len(methods), info)
+        self.assertEqual(info.currsize, len(methods))
+
+    def test_hit_not_blocked_by_miss(self):
+        echo = executor._resolve_method('testing.echo')
+        import_module = importlib.import_module
+        importing = threading.Event()
+        release = threading.Event()
+
+        def slow_import(name, *args):
+            if threading.current_thread() is slow:
+                importing.set()
+                release.wait(10)
+            return import_module(name, *args)
+
+        slow = threading.Thread(target=executor._resolve_method, args=('testing.pid',))
+        with mock.patch.object(executor.importlib, 'import_module', side_effect=slow_import):
+            slow.start()
+            self.assertTrue(importing.wait(10))
+            self.assertIs(executor._resolve_method('testing.echo'), echo)
+            self.assertFalse(release.is_set())
+            release.set()
+            slow.join()
+        self.assertEqual(executor.method_cache_info()[:2], (1, 2))
+
+
+class TestAdmission(unittest.TestCase):
+
+    def setUp(self):
+        fixtures.setup_globals()
+        # 不启动执行器：分片队列中的请求不被取出，队列深度只由测试控制
+        self.executor = executor.Executor(admission_high_watermark=3, admission_low_watermark=1)
+        self.client = fixtures.Client()
+        self.pack_info = fixtures.PackInfo()
+
+    def put(self, id_):
+        return self.executor.put(self.client, self.pack_info, fixtures.request('testing.echo', [1], id_))
+
+    def take(self, count):
+        for _ in range(count):
+            self.executor._shards[0].queue.get_nowait()
+
+    def test_hysteresis(self):
+        self.assertEqual([self.put(i) for i in range(4)], [True, True, True, False])
+        self.assertTrue(self.executor.stats()['admission']['shedding'])
+        self.take(1)  # 深度 2 ，仍高于低水位
+        self.assertFalse(self.put(4))
+        self.take(1)  # 深度 1 ，降至低水位
+        self.assertTrue(self.put(5))
+        self.assertTrue(self.put(6))
+        self.assertFalse(self.put(7))
+        stats = self.executor.stats()['admission']
+        self.assertEqual((stats['shedding'], stats['shed']), (True, 3))
+        replies = self.client.wait(3)
+        self.assertEqual([(r['id'], r['error']['code']) for r in replies], [(3, -32000), (4, -32000), (7, -32000)])
+
+    def test_disabled_by_default(self):
+        instance = executor.Executor(queue_maxsize=2)
+        results = [instance.put(self.client, self.pack_info, fixtures.request('testing.echo', [1], i)) for i in range(3)]
+        self.assertEqual(results, [True, True, False])
+        self.assertIsNone(instance.stats()['admission']['high_watermark'])
+
+    def test_invalid_watermarks(self):
+        self.assertRaises(ValueError, executor.Executor, admission_high_watermark=1, admission_low_watermark=2)
+
+
+class TestShards(unittest.TestCase):
+
+    def setUp(self):
+        fixtures.setup_globals()
+        # 不启动执行器：检查请求在分片队列中的位置
+        self.executor = executor.Executor(dispatcher_shards=4)
+        self.client = fixtures.Client()
+
+    def queued(self):
+        result = []
+        for shard in self.executor._shards:
+            records = []
+            while not shard.queue.empty():
+                records.append(shard.queue.get_nowait())
+            result.append([(r[1].srcUnitClientId, jsoncodec.loads(r[2])['id']) for r in records])
+        return result
+
+    def test_source_order(self):
+        sources = [fixtures.PackInfo(1, client_id) for client_id in range(16)]
+        for i in range(5):
+            for pack_info in sources:
+                self.executor.put(self.client, pack_info, fixtures.request('testing.echo', [i], i))
+        shards = self.queued()
+        self.assertGreater(len([queued for queued in shards if queued]), 1)
+        for pack_info in sources:
+            found = [[id_ for source, id_ in queued if source == pack_info.srcUnitClientId] for queued in shards]
+            self.assertEqual([ids for ids in found if ids], [list(range(5))])
+
+    def test_queue_maxsize_split(self):
+        instance = executor.Executor(queue_maxsize=10, dispatcher_shards=4)
+        self.assertEqual([shard.queue.maxsize for shard in instance._shards], [3] * 4)
+        self.assertRaises(ValueError, executor.Executor, dispatcher_shards=0)
+
+
+class TestWarmupHooks(unittest.TestCase):
+
+    def test_import_errors_counted(self):
+        fixtures.install_methods()
+        info = executor._warmup(['methods.testing', 'methods.no_such_module'])
+        self.assertEqual((info['modules'], info['errors']), (1, 1))
+        self.assertGreaterEqual(info['hooks'], 1)
+        self.assertGreaterEqual(info['hook_time'], fixtures.WARMUP_SECONDS)
+
+
+class TestAffinityKey(unittest.TestCase):
+
+    def test_sources(self):
+        instance = executor.Executor(affinity={
+            'crm.get': 0,
+            'crm.*': 'caller',
+            '*': '$source',
+        })
+        pack_info = fixtures.PackInfo(3, 4)
+        key = instance._affinity_key
+        self.assertEqual(key(pack_info, 'crm.get', ['a', 'b']), ('crm.get', 'a'))
+        self.assertIsNone(key(pack_info, 'crm.get', []))
+        self.assertEqual(key(pack_info, 'crm.list', (), {'caller': 'x'}), ('crm.list', 'x'))
+        self.assertIsNone(key(pack_info, 'crm.list', ['x']))
+        self.assertEqual(key(pack_info, 'other.call'), (3, 4))
+
+    def test_no_affinity(self):
+        self.assertIsNone(executor.Executor()._affinity_key(fixtures.PackInfo(), 'testing.echo', [1]))
+
+
+class ExecutorTestCase(unittest.TestCase):
+    '''启动执行器的测试，请求来自 :class:`fixtures.Client`'''
+
+    executor_config = {}
+
+    def setUp(self):
+        self.executor = fixtures.start_executor(**self.executor_config)
+        self.addCleanup(self.executor.stop)
+        self.client = fixtures.Client()
+        self.pack_info = fixtures.PackInfo()
+
+    def call(self, method, params=None, id_=None, **extra):
+        return self.executor.put(self.client, self.pack_info, fixtures.request(method, params, id_, **extra))
+
+
+class TestTimeouts(ExecutorTestCase):
+
+    executor_config = {'method_timeout': 0.5, 'pool_max_inflight': 4}
+
+    def test_timeout_replies(self):
+        self.call('testing.sleep', [5], 'sync')
+        self.call('testing.async_sleep', [5], 'async')
+        replies = dict((reply['id'], reply) for reply in self.client.wait(2))
+        self.assertEqual(replies['sync']['error']['code'], -32001)
+        self.assertEqual(replies['async']['error']['code'], -32001)
+        self.assertEqual(self.executor.stats()['timeouts'], {'testing.sleep': 1, 'testing.async_sleep': 1})
+
+
+class TestBatchInWorker(ExecutorTestCase):
+
+    def setUp(self):
+        # 父进程中先创建批量执行的线程池，子进程不能继承它
+        _run_batch([('testing.echo', [1], {})] * 2)
+        _run_batch([('testing.echo', [1], {})])
+        super(TestBatchInWorker, self).setUp()
+
+    def test_batch_replies(self):
+        txt = '[{}, {}]'.format(fixtures.request('testing.echo', [1], 'a'), fixtures.request('testing.echo', [2], 'b'))
+        self.executor.put(self.client, self.pack_info, txt)
+        replies = self.client.wait(1)[0]
+        self.assertEqual([(r['id'], r['result']) for r in replies], [('a', 1), ('b', 2)])
+
+
+class TestDeadlines(ExecutorTestCase):
+
+    executor_config = {'request_ttl': 300}
+
+    def test_expired_requests_dropped(self):
+        self.call('testing.sleep', [1], 'a')
+        self.call('testing.echo', ['b'], 'b')  # 排在 a 之后，开始执行之前已经过期
+        self.call('testing.echo', ['c'], 'c', ttl=5000)  # 请求中的 ttl 优先于默认值
+        self.call('testing.echo', ['d'], 'd', ttl=100)
+        self.client.wait(2)
+        time.sleep(0.2)  # 过期的请求也不会在之后回复
+        self.assertEqual(sorted(r['id'] for r in self.client.wait(0)), ['a', 'c'])
+        self.assertEqual(self.executor.stats()['pools']['default']['expired'], 2)
+
+
+class TestThreads(ExecutorTestCase):
+
+    executor_config = {'pool_threads': 2, 'pool_max_inflight': 2}
+
+    def test_threaded_methods(self):
+        self.call('testing.thread_name', [], 'threaded')
+        self.call('testing.unthreaded_thread_name', [], 'unthreaded')
+        replies = dict((r['id'], r['result']) for r in self.client.wait(2))
+        self.assertNotEqual(replies['threaded'], replies['unthreaded'])
+
+    def test_blocking_calls_share_worker(self):
+        begin_time = time.time()
+        self.call('testing.sleep', [0.5], 'a')
+        self.call('testing.sleep', [0.5], 'b')
+        replies = self.client.wait(2)
+        self.assertLess(time.time() - begin_time, 0.9)
+        self.assertEqual(len(set(r['result'] for r in replies)), 1)
+
+
+class TestShardedDispatch(ExecutorTestCase):
+
+    executor_config = {'dispatcher_shards': 4}
+
+    def test_replies_in_order(self):
+        for i in range(1, 21):
+            self.call('testing.echo', [i], i)
+        self.assertEqual([r['id'] for r in self.client.wait(20)], list(range(1, 21)))
+        self.assertEqual(sum(shard['handled'] for shard in self.executor.stats()['shards']), 20)
+
+
+class TestNamedPools(ExecutorTestCase):
+
+    executor_config = {'pools': {
+        'slow': {'methods': ['testing.sleep'], 'processes': 1},
+        'testing': {'methods': ['testing.*'], 'processes': 1},
+    }}
+
+    def pool_pids(self):
+        return dict((name, [w['pid'] for w in pool['workers']]) for name, pool in self.executor.stats()['pools'].items())
+
+    def test_routing(self):
+        self.call('testing.sleep', [1], 'slow')
+        self.call('testing.pid', [], 'fast')
+        replies = self.client.wait(2)
+        self.assertEqual([r['id'] for r in replies], ['fast', 'slow'])  # 慢速的方法不阻塞其它进程池
+        pids = self.pool_pids()
+        self.assertEqual(sorted(pids), ['default', 'slow', 'testing'])
+        self.assertEqual(replies[0]['result'], pids['testing'][0])
+        self.assertEqual(replies[1]['result'], pids['slow'][0])
+
+    def test_route_precedence(self):
+        instance = executor.Executor(pools={
+            'a': {'methods': ['crm.*', 'crm.report.daily']},
+            'b': {'methods': ['crm.report.*']},
+        })
+        self.assertEqual(instance._route('crm.report.daily'), 'a')  # 完整的方法名优先
+        self.assertEqual(instance._route('crm.report.monthly'), 'b')  # 其次是最长的前缀
+        self.assertEqual(instance._route('crm.user.get'), 'a')
+        self.assertEqual(instance._route('crm'), executor.DEFAULT_POOL)
+        self.assertEqual(instance._route('testing.echo'), executor.DEFAULT_POOL)
+
+
+class TestWarmup(ExecutorTestCase):
+
+    def setUp(self):
+        fixtures.setup_globals()
+        fixtures.install_methods()
+        self.client = fixtures.Client()
+        self.pack_info = fixtures.PackInfo()
+
+    def start(self, **kwargs):
+        self.executor = executor.Executor(pool_processes=1, **kwargs)
+        self.addCleanup(self.executor.stop)
+        self.executor.start()
+
+    def test_requests_wait_for_warmup(self):
+        begin_time = time.time()
+        self.start(warmup_modules=['methods.testing'])
+        self.call('testing.warmed', [], 1)
+        self.assertEqual(self.client.wait(1)[0]['result'], True)
+        self.assertGreaterEqual(time.time() - begin_time, fixtures.WARMUP_SECONDS)
+        worker = self.executor.stats()['pools']['default']['workers'][0]
+        self.assertGreaterEqual(worker['warmup'], fixtures.WARMUP_SECONDS)
+
+    def test_no_warmup_modules(self):
+        self.start()
+        self.call('testing.warmed', [], 1)
+        self.assertEqual(self.client.wait(1)[0]['result'], False)
+
+
+class TestResultCache(ExecutorTestCase):
+
+    def cached_calls(self, key, id_):
+        self.call('testing.cached_calls', [key], id_)
+        return self.client.wait(len(self.client.sent) + 1)[-1]['result']
+
+    def test_cached_until_invalidated(self):
+        self.assertEqual(self.cached_calls('k', 1), 1)
+        self.assertEqual(self.cached_calls('k', 2), 1)
+        self.assertEqual(self.cached_calls('other', 3), 1)
+        stats = self.executor.stats()['result_cache']
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (1, 2, 2))
+        self.assertEqual(self.executor.invalidate_cache(['testing.*']), 2)
+        self.assertEqual(self.cached_calls('k', 4), 2)
+
+    def test_reset_invalidates(self):
+        self.cached_calls('k', 1)
+        self.executor.reset()
+        self.assertEqual(self.executor.stats()['result_cache']['size'], 0)
+        self.assertEqual(self.cached_calls('k', 2), 1)  # 新的子进程中的第一次调用
+
+
+class TestCoalesce(ExecutorTestCase):
+
+    executor_config = {'coalesce': ['testing.slow_calls', 'testing.fail']}
+
+    def test_identical_calls_run_once(self):
+        for id_ in ('a', 'b', 'c'):
+            self.call('testing.slow_calls', ['k', 0.3], id_)
+        self.call('testing.slow_calls', ['other', 0.3], 'd')
+        replies = dict((r['id'], r['result']) for r in self.client.wait(4))
+        self.assertEqual(replies, {'a': 1, 'b': 1, 'c': 1, 'd': 1})
+        self.assertEqual(self.executor.stats()['coalesce'],
+                         {'inflight': 0, 'coalesced': 2, 'methods': {'testing.slow_calls': 2}})
+        # 调用完成后不保存结果，相同的调用被再次执行
+        self.call('testing.slow_calls', ['k', 0], 'e')
+        self.assertEqual(self.client.wait(5)[-1], {'jsonrpc': '2.0', 'id': 'e', 'result': 2})
+
+    def test_shared_error(self):
+        self.call('testing.sleep', [0.3], 'busy')  # 占用子进程，使两个调用都在等待
+        self.call('testing.fail', ['boom'], 'x')
+        self.call('testing.fail', ['boom'], 'y')
+        replies = dict((r['id'], r) for r in self.client.wait(3))
+        self.assertEqual(replies['x']['error'], replies['y']['error'])
+        self.assertEqual(self.executor.stats()['coalesce']['coalesced'], 1)
+
+    def test_dispatch_error(self):
+        dispatching = threading.Event()
+        release = threading.Event()
+
+        def apply_async(*args, **kwargs):
+            dispatching.set()
+            release.wait(10)
+            raise RuntimeError('dispatch failed')
+
+        def record(id_):
+            return (self.client, self.pack_info, fixtures.request('testing.fail', ['boom'], id_), time.time())
+
+        pool = self.executor._pools[executor.DEFAULT_POOL]
+        with mock.patch.object(pool, 'apply_async', side_effect=apply_async):
+            leader = threading.Thread(target=self.executor.handle, args=(record('x'),))
+            leader.start()
+            self.assertTrue(dispatching.wait(10))
+            self.executor.handle(record('y'))  # 附加在正在分发的调用上
+            release.set()
+            leader.join()
+        replies = dict((r['id'], r) for r in self.client.wait(2))
+        self.assertEqual(sorted(replies), ['x', 'y'])
+        for reply in replies.values():
+            self.assertEqual(reply['error']['code'], -32500)
+            self.assertIn('dispatch failed', reply['error']['message'])
+        self.assertEqual(self.executor.stats()['coalesce']['inflight'], 0)
+        # 合并的调用已经结束，相同的调用被正常执行
+        self.call('testing.fail', ['boom'], 'z')
+        self.assertIn('boom', self.client.wait(3)[-1]['error']['message'])
+
+    def test_not_configured(self):
+        self.call('testing.calls', ['n'], 1)
+        self.call('testing.calls', ['n'], 2)
+        self.assertEqual(sorted(r['result'] for r in self.client.wait(2)), [1, 2])
+        self.assertEqual(self.executor.stats()['coalesce']['coalesced'], 0)
+
+
+class TestStreaming(ExecutorTestCase):
+
+    executor_config = {'stream_chunk_size': 100}
+
+    def stream(self, method, params, count):
+        self.call(method, params, 's')
+        replies = self.client.wait(count)
+        self.assertEqual(self.client.titles(), ['s'] * len(replies))
+        return replies
+
+    def test_partials(self):
+        replies = self.stream('testing.items', [250], 4)
+        self.assertEqual([(r['seq'], r['more'], len(r['result'])) for r in replies],
+                         [(0, True, 100), (1, True, 100), (2, True, 50), (3, False, 0)])
+        self.assertEqual(sum((r['result'] for r in replies), []), list(range(250)))
+
+    def test_async_generator(self):
+        replies = self.stream('testing.async_items', [150], 3)
+        self.assertEqual([(r['seq'], r['more']) for r in replies], [(0, True), (1, True), (2, False)])
+        self.assertEqual(replies[0]['result'] + replies[1]['result'], list(range(150)))
+
+    def test_method_chunk_size(self):
+        replies = self.stream('testing.pairs', [3], 3)
+        self.assertEqual([r['result'] for r in replies], [[0, 1], [2], []])
+
+    def test_error_ends_stream(self):
+        replies = self.stream('testing.broken_items', [150], 2)
+        self.assertEqual((replies[0]['seq'], replies[0]['more'], len(replies[0]['result'])), (0, True, 100))
+        self.assertNotIn('more', replies[1])
+        self.assertIn('broken after 150', replies[1]['error']['message'])
+
+    def test_batch_collects_items(self):
+        txt = '[{}, {}]'.format(fixtures.request('testing.items', [3], 'a'), fixtures.request('testing.echo', [1], 'b'))
+        self.executor.put(self.client, self.pack_info, txt)
+        replies = self.client.wait(1)[0]
+        self.assertEqual([r['result'] for r in replies], [[0, 1, 2], 1])
+
+
+class TestReplyCompression(ExecutorTestCase):
+
+    executor_config = {'reply_compression': {'threshold': 1000, 'methods': {'testing.echo': 0}}}
+
+    def test_large_reply_compressed(self):
+        self.call('testing.text', [5000], 'big')
+        envelope = self.client.wait(1)[0]
+        self.assertEqual((envelope['id'], envelope['compression']), ('big', 'zlib'))
+        self.assertEqual(jsoncodec.loads(compression.decompress(envelope)),
+                         {'jsonrpc': '2.0', 'id': 'big', 'result': 'x' * 5000})
+        self.assertEqual(self.client.titles(), ['big'])
+        self.assertEqual(self.executor.stats()['compression']['compressed'], 1)
+
+    def test_small_and_excluded_replies(self):
+        self.call('testing.text', [10], 'small')
+        self.call('testing.echo', ['y' * 5000], 'excluded')
+        replies = dict((r['id'], r) for r in self.client.wait(2))
+        self.assertEqual(replies['small']['result'], 'x' * 10)
+        self.assertEqual(replies['excluded']['result'], 'y' * 5000)
+        self.assertEqual(self.executor.stats()['compression']['compressed'], 0)
+
+
+class TestParseInWorker(ExecutorTestCase):
+
+    executor_config = {'parse_in_worker': True, 'method_timeout': 0.5}
+
+    def test_reply(self):
+        self.call('testing.echo', ['hi'], 1)
+        self.assertEqual(self.client.wait(1)[0], {'jsonrpc': '2.0', 'id': 1, 'result': 'hi'})
+
+    def test_worker_lost_replies_error(self):
+        self.call('testing.exit', [1], 'lost')
+        reply = self.client.wait(1)[0]
+        self.assertEqual(reply['id'], 'lost')
+        self.assertEqual(reply['error']['code'], -32500)
+        self.assertIn('WorkerLostError', reply['error']['message'])
+
+    def test_worker_lost_replies_batch(self):
+        txt = '[{}, {}]'.format(fixtures.request('testing.exit', [1], 'a'), fixtures.request('testing.echo', [1]))
+        self.executor.put(self.client, self.pack_info, txt)
+        replies = self.client.wait(1)[0]
+        self.assertEqual([(r['id'], r['error']['code']) for r in replies], [('a', -32500)])
+        self.assertEqual(self.client.titles(), ['a'])
+
+    def test_timeout_replies_error(self):
+        self.call('testing.sleep', [5], 'slow')
+        reply = self.client.wait(1)[0]
+        self.assertEqual(reply['error']['code'], -32001)
+        self.assertEqual(self.executor.stats()['timeouts'], {'testing.sleep': 1})
+
+
+class TestReset(ExecutorTestCase):
+
+    def method_cache(self, id_):
+        self.call('testing.method_cache', [], id_)
+        return self.client.wait(len(self.client.sent) + 1)[-1]['result']
+
+    def test_method_cache_starts_empty(self):
+        executor._resolve_method('testing.echo')  # 父进程中的缓存不被新的子进程沿用
+        self.method_cache(1)
+        self.assertEqual(self.method_cache(2), {'hits': 1, 'misses': 1, 'maxsize': 1024, 'currsize': 1})
+        self.executor.reset()
+        self.assertEqual(self.method_cache(3), {'hits': 0, 'misses': 1, 'maxsize': 1024, 'currsize': 1})
+
+    def test_inflight_requests_complete(self):
+        self.call('testing.sleep', [1], 'old')
+        time.sleep(0.2)
+        old_pids = [w['pid'] for w in self.executor.stats()['pools']['default']['workers']]
+        result = self.executor.reset()
+        self.assertTrue(result['drained'])
+        self.assertLess(result['swap'], 1)
+        self.call('testing.pid', [], 'new')
+        replies = dict((r['id'], r['result']) for r in self.client.wait(2))
+        self.assertEqual(replies['old'], old_pids[0])
+        self.assertNotIn(replies['new'], old_pids)
+        self.assertEqual(self.executor.stats()['last_reset']['drained'], True)
+
+    def test_requests_during_reset(self):
+        resetting = threading.Thread(target=self.executor.reset)
+        self.call('testing.sleep', [0.5], 0.5)
+        resetting.start()
+        for i in range(1, 11):
+            self.call('testing.echo', [i], i)
+            time.sleep(0.05)
+        resetting.join()
+        self.assertEqual(sorted(r['id'] for r in self.client.wait(11)), [0.5] + list(range(1, 11)))
+
+    def test_new_pool_not_ready(self):
+        old_pools = dict(self.executor._pools)
+        with mock.patch.object(executor.WorkerPool, 'wait_ready', return_value=False):
+            self.assertRaises(RuntimeError, self.executor.reset)
+        self.assertEqual(self.executor._pools, old_pools)
+        self.call('testing.echo', ['still'], 1)
+        self.assertEqual(self.client.wait(1)[0]['result'], 'still')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+'''
+:date: 2026-10-18
+'''
+from __future__ import absolute_import
+
+import unittest
+
+import json
+import time
+import socket
+import asyncio
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+
+import httpclient
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits += 1
+            server.peers.add(self.client_address)
+        if self.path.startswith('/slow'):
+            time.sleep(0.5)
+        if self.path.startswith('/close'):
+            self.close_connection = True
+        self._reply(200, {'path': self.path})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8'))
+        self._reply(200, {'echo': body})
+
+    def _reply(self, status, obj):
+        data = json.dumps(obj).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class TestHttpClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = _Server(('127.0.0.1', 0), _Handler)
+        self.server.lock = threading.Lock()
+        self.server.hits = 0
+        self.server.peers = set()
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.base = 'http://127.0.0.1:{}'.format(self.server.server_address[1])
+        self.client = httpclient.HttpClient('test', timeout=2)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_keep_alive(self):
+        for i in range(5):
+            response = self.client.get(self.base + '/a', params={'i': i})
+            self.assertEqual(response.json(), {'path': '/a?i={}'.format(i)})
+        self.assertEqual(len(self.server.peers), 1)
+        stats = self.client.stats()['hosts'][self.base]
+        self.assertEqual(stats['requests'], 5)
+        self.assertEqual(stats['connections']['created'], 1)
+
+    def test_reconnect_after_close(self):
+        self.client.get(self.base + '/close')
+        self.client.get(self.base + '/a')
+        self.assertEqual(len(self.server.peers), 2)
+
+    def test_idle_timeout(self):
+        client = httpclient.HttpClient('test-idle', timeout=2, idle_timeout=0.2)
+        self.addCleanup(client.close)
+        client.get(self.base + '/a')
+        self.assertEqual(client.stats()['hosts'][self.base]['connections']['idle'], 1)
+        time.sleep(0.3)
+        connections = client.stats()['hosts'][self.base]['connections']
+        self.assertEqual((connections['size'], connections['evicted']), (0, 1))
+        client.get(self.base + '/a')
+        self.assertEqual(len(self.server.peers), 2)
+
+    def test_idle_timeout_on_request(self):
+        client = httpclient.HttpClient('test-idle', timeout=2, idle_timeout=0.2)
+        self.addCleanup(client.close)
+        client.get(self.base + '/a')
+        time.sleep(0.3)
+        client.get(self.base + '/b')
+        self.assertEqual(client._pools[('http', '127.0.0.1', self.server.server_address[1])].stats()['evicted'], 1)
+        self.assertEqual(len(self.server.peers), 2)
+
+    def test_post_json(self):
+        response = self.client.post(self.base + '/p', json_body={'x': [1, 2]})
+        self.assertEqual(response.json(), {'echo': {'x': [1, 2]}})
+
+    def test_cache(self):
+        for _ in range(3):
+            self.client.get(self.base + '/c', cache_ttl=10)
+        self.assertEqual(self.server.hits, 1)
+        self.assertEqual(self.client.stats()['hosts'][self.base]['cache_hits'], 2)
+        self.client.clear_cache()
+        self.client.get(self.base + '/c', cache_ttl=10)
+        self.assertEqual(self.server.hits, 2)
+
+    def test_timeout(self):
+        with self.assertRaises(socket.timeout):
+            self.client.get(self.base + '/slow', timeout=0.1)
+        self.assertEqual(self.client.stats()['hosts'][self.base]['errors'], 1)
+        self.assertEqual(self.client.get(self.base + '/a').status, 200)
+
+    def test_async(self):
+        async def main():
+            return await asyncio.gather(*[
+                self.client.request_async('GET', self.base + '/slow', params={'i': i}) for i in range(4)
+            ])
+        begin_time = time.time()
+        loop = asyncio.new_event_loop()
+        try:
+            responses = loop.run_until_complete(main())
+        finally:
+            loop.close()
+        self.assertLess(time.time() - begin_time, 1.5)
+        self.assertEqual(sorted(r.json()['path'] for r in responses), ['/slow?i={}'.format(i) for i in range(4)])
+        self.assertEqual(self.client.stats()['hosts'][self.base]['connections']['created'], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+'''
+:date: 2026-10-18
+'''
+from __future__ import absolute_import
+
+import unittest
+
+import enum
+import uuid
+import decimal
+import datetime
+import collections
+
+import jsoncodec
+
+
+class _Color(enum.Enum):
+    RED = 1
+
+
+class _Date(datetime.date):
+    pass
+
+
+_Row = collections.namedtuple('_Row', 'id amount')
+
+_TZ = datetime.timezone(datetime.timedelta(hours=8))
+
+
+class BackendTestCase(unittest.TestCase):
+    '''对每个已安装的后端执行 :meth:`check`'''
+
+    def setUp(self):
+        self.addCleanup(jsoncodec.use, jsoncodec.backend)
+        self._converters = dict(jsoncodec._converters)
+        self.addCleanup(self._restore_converters)
+
+    def _restore_converters(self):
+        jsoncodec._converters.clear()
+        for cls, func in self._converters.items():
+            jsoncodec.register(cls, func)
+
+    def for_each_backend(self, check):
+        for backend in jsoncodec.available():
+            with self.subTest(backend=backend):
+                jsoncodec.use(backend)
+                check()
+
+    def assertEncodes(self, value, expected):
+        self.assertEqual(jsoncodec.loads(jsoncodec.dumps([value])), [expected])
+        self.assertEqual(jsoncodec.jsonable(value), expected)
+
+
+class TestConverters(BackendTestCase):
+
+    def test_datetime(self):
+        def check():
+            self.assertEncodes(datetime.datetime(2026, 10, 18, 16, 45, 33), '2026-10-18 16:45:33')
+            self.assertEncodes(datetime.datetime(2026, 10, 18, 16, 45, 33, 123456), '2026-10-18 16:45:33')
+            self.assertEncodes(datetime.datetime(2026, 10, 18, 16, 45, 33, tzinfo=_TZ), '2026-10-18 16:45:33')
+        self.for_each_backend(check)
+
+    def test_date(self):
+        def check():
+            self.assertEncodes(datetime.date(2026, 10, 18), '2026-10-18')
+            self.assertEncodes(_Date(2026, 10, 18), '2026-10-18')
+        self.for_each_backend(check)
+
+    def test_time(self):
+        def check():
+            self.assertEncodes(datetime.time(16, 45, 33), '16:45:33')
+            self.assertEncodes(datetime.time(16, 45, 33, 500000), '16:45:33')
+            self.assertEncodes(datetime.time(16, 45, 33, tzinfo=_TZ), '16:45:33')
+        self.for_each_backend(check)
+
+    def test_timedelta(self):
+        self.for_each_backend(lambda: self.assertEncodes(datetime.timedelta(minutes=1, milliseconds=500), 60.5))
+
+    def test_decimal_as_text(self):
+        def check():
+            self.assertEncodes(decimal.Decimal('12.50'), '12.50')
+            self.assertEncodes(decimal.Decimal('0.1'), '0.1')
+            self.assertEncodes(decimal.Decimal('12345678901234567890.12'), '12345678901234567890.12')
+        self.for_each_backend(check)
+
+    def test_decimal_as_number_opt_in(self):
+        jsoncodec.register(decimal.Decimal, float)
+        self.for_each_backend(lambda: self.assertEncodes(decimal.Decimal('12.50'), 12.5))
+
+    def test_bytes(self):
+        def check():
+            self.assertEncodes('张三'.encode('utf-8'), '张三')
+            self.assertEncodes(bytearray(b'abc'), 'abc')
+            self.assertEncodes(memoryview(b'abc'), 'abc')
+            self.assertEncodes(b'\xff\xfe', '//4=')
+        self.for_each_backend(check)
+
+    def test_containers(self):
+        def check():
+            self.assertEncodes(_Row(1, decimal.Decimal('1.5')), [1, '1.5'])
+            self.assertEncodes(frozenset([1]), [1])
+            self.assertEncodes({'a': (1, {'b': datetime.date(2026, 1, 2)})}, {'a': [1, {'b': '2026-01-02'}]})
+        self.for_each_backend(check)
+
+    def test_uuid_and_enum(self):
+        value = uuid.UUID('12345678-1234-5678-1234-567812345678')
+        self.for_each_backend(lambda: self.assertEncodes([value, _Color.RED], [str(value), 1]))
+
+    def test_fallback(self):
+        value = object()
+        self.assertEqual(jsoncodec.jsonable({'x': value}), {'x': str(value)})
+        self.assertRaises(TypeError, jsoncodec.jsonable, value, fallback=None)
+        self.for_each_backend(lambda: self.assertRaises(TypeError, jsoncodec.dumps, {'x': value}))
+
+    def test_register_subclass(self):
+        jsoncodec.register(_Date, lambda value: value.year)
+        self.for_each_backend(lambda: self.assertEncodes([_Date(2026, 1, 2), datetime.date(2026, 1, 2)],
+                                                         [2026, '2026-01-02']))
+
+
+class TestCodec(BackendTestCase):
+
+    def test_round_trip(self):
+        obj = {'id': 'abc', 'name': '张三', 'n': [1, 2.5, None, True], 'big': 2 ** 70}
+
+        def check():
+            self.assertEqual(jsoncodec.loads(jsoncodec.dumps(obj)), obj)
+            self.assertEqual(jsoncodec.loads(jsoncodec.dumps(obj).encode('utf-8')), obj)
+        self.for_each_backend(check)
+
+    def test_invalid_text(self):
+        def check():
+            self.assertRaises(ValueError, jsoncodec.loads, '{"a": ')
+        self.for_each_backend(check)
+
+    def test_unknown_backend(self):
+        self.assertRaises(ValueError, jsoncodec.use, 'simplejson')
+
+    def test_auto(self):
+        jsoncodec.use('auto')
+        installed = jsoncodec.available()
+        self.assertEqual(jsoncodec.backend, 'orjson' if 'orjson' in installed else 'json')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+'''
+:date: 2026-10-18
+'''
+from __future__ import absolute_import
+
+import unittest
+
+import pickle
+
+import jsonrpc
+from jsonrpc import Request, Response
+
+
+class TestParse(unittest.TestCase):
+
+    def test_request_positional(self):
+        request = jsonrpc.parse('{"jsonrpc": "2.0", "id": 1, "method": " foo.bar ", "params": [1, "a"]}')
+        self.assertIsInstance(request, Request)
+        self.assertEqual((request.id, request.method, request.args, request.kwargs, request.ttl),
+                         (1, 'foo.bar', [1, 'a'], {}, None))
+
+    def test_request_named(self):
+        request = jsonrpc.parse('{"jsonrpc": "2.0", "id": "x", "method": "foo", "params": {"a": 1}, "ttl": 500}')
+        self.assertEqual((request.id, request.args, request.kwargs, request.ttl), ('x', (), {'a': 1}, 500))
+
+    def test_request_without_params(self):
+        request = jsonrpc.parse('{"jsonrpc": "2.0", "id": 1, "method": "foo", "extra": true}')
+        self.assertEqual((request.args, request.kwargs), ((), {}))
+        self.assertFalse(hasattr(request, 'extra'))
+
+    def test_notification(self):
+        request = jsonrpc.parse(b'{"jsonrpc": "2.0", "method": "foo", "params": [1]}')
+        self.assertIsInstance(request, Request)
+        self.assertIsNone(request.id)
+
+    def test_response_result(self):
+        response = jsonrpc.parse('{"jsonrpc": "2.0", "id": 1, "result": null}')
+        self.assertIsInstance(response, Response)
+        self.assertEqual((response.id, response.result, response.error), (1, None, None))
+        self.assertEqual(response.to_dict(), {'jsonrpc': '2.0', 'id': 1, 'result': None})
+
+    def test_response_error(self):
+        response = jsonrpc.parse('{"jsonrpc": "2.0", "id": 1, "error": {"code": -32601, "message": "no"}}')
+        self.assertIsInstance(response, Response)
+        self.assertEqual(response.error, {'code': -32601, 'message': 'no'})
+        self.assertIsNone(response.result)
+
+    def test_batch(self):
+        items = jsonrpc.parse('[{"jsonrpc": "2.0", "id": 1, "method": "a"},'
+                              ' 1,'
+                              ' {"jsonrpc": "2.0", "id": 2, "result": 0},'
+                              ' {"jsonrpc": "2.0", "id": 3, "method": ""},'
+                              ' {"jsonrpc": "2.0", "method": "b", "params": {"x": 1}}]')
+        self.assertEqual(len(items), 5)
+        self.assertEqual((items[0].id, items[0].method), (1, 'a'))
+        self.assertIsInstance(items[1], jsonrpc.InvalidRequestError)
+        self.assertIsInstance(items[2], jsonrpc.InvalidRequestError)
+        self.assertEqual(items[2].id, 2)
+        self.assertIsInstance(items[3], jsonrpc.InvalidRequestError)
+        self.assertEqual(items[3].id, 3)
+        self.assertEqual((items[4].id, items[4].kwargs), (None, {'x': 1}))
+
+    def test_invalid(self):
+        cases = [
+            ('{"jsonrpc": ', jsonrpc.FormatError),
+            ('[]', jsonrpc.InvalidRequestError),
+            ('1', jsonrpc.FormatError),
+            ('{"jsonrpc": "2.0", "id": [1], "method": "a"}', jsonrpc.FormatError),
+            ('{"jsonrpc": "2.0", "id": 1}', jsonrpc.FormatError),
+            ('{"jsonrpc": "2.0", "id": 1, "method": "a", "result": 1}', jsonrpc.FormatError),
+            ('{"jsonrpc": "2.0", "id": 1, "method": 1}', jsonrpc.InvalidRequestError),
+            ('{"jsonrpc": "2.0", "id": 1, "method": "a", "params": 1}', jsonrpc.InvalidParamsError),
+            ('{"jsonrpc": "2.0", "id": 1, "method": "a", "ttl": 0}', jsonrpc.InvalidRequestError),
+            ('{"jsonrpc": "2.0", "id": 1, "method": "a", "ttl": true}', jsonrpc.InvalidRequestError),
+            ('{"jsonrpc": "2.0", "id": 1, "error": "x"}', jsonrpc.InvalidErrorError),
+            ('{"jsonrpc": "2.0", "id": 1, "error": {"code": 1}}', jsonrpc.InvalidErrorError),
+        ]
+        for txt, error_class in cases:
+            with self.subTest(txt=txt):
+                with self.assertRaises(error_class) as ctx:
+                    jsonrpc.parse(txt)
+                self.assertIs(type(ctx.exception), error_class)
+
+    def test_error_id(self):
+        with self.assertRaises(jsonrpc.InvalidParamsError) as ctx:
+            jsonrpc.parse('{"jsonrpc": "2.0", "id": "x", "method": "a", "params": "p"}')
+        self.assertEqual(ctx.exception.id, 'x')
+        self.assertEqual(ctx.exception.code, -32602)
+
+    def test_pickle(self):
+        request = jsonrpc.parse('{"jsonrpc": "2.0", "id": 1, "method": "a", "params": [1], "ttl": 10}')
+        copied = pickle.loads(pickle.dumps(request))
+        self.assertEqual((copied.id, copied.method, copied.args, copied.kwargs, copied.ttl), (1, 'a', [1], {}, 10))
+        response = pickle.loads(pickle.dumps(Response(1, error={'code': 1, 'message': 'x'})))
+        self.assertEqual(response.to_dict(), {'jsonrpc': '2.0', 'id': 1, 'error': {'code': 1, 'message': 'x'}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+'''
+:date: 2026-10-18
+'''
+from __future__ import absolute_import
+
+import unittest
+
+import time
+import asyncio
+import itertools
+import threading
+
+import resourcepool
+from resourcepool import ResourcePool, ResourceTimeoutError
+
+_names = itertools.count()
+
+
+class _Resource(object):
+
+    def __init__(self, id_):
+        self.id = id_
+        self.healthy = True
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class _Factory(object):
+
+    def __init__(self):
+        self.created = []
+
+    def __call__(self):
+        resource = _Resource(len(self.created))
+        self.created.append(resource)
+        return resource
+
+
+class TestResourcePool(unittest.TestCase):
+
+    def make_pool(self, **kwargs):
+        factory = _Factory()
+        pool = ResourcePool('test', factory, **kwargs)
+        self.addCleanup(pool.close)
+        return pool, factory
+
+    def test_max_size(self):
+        pool, factory = self.make_pool(max_size=2)
+        first = pool.acquire()
+        second = pool.acquire()
+        self.assertIsNot(first, second)
+        self.assertRaises(ResourceTimeoutError, pool.acquire, 0.05)
+        pool.release(first)
+        self.assertIs(pool.acquire(0.05), first)
+        stats = pool.stats()
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(stats['in_use'], 2)
+        self.assertEqual(stats['timeouts'], 1)
+
+    def test_waiter_gets_released_resource(self):
+        pool, _ = self.make_pool(max_size=1)
+        resource = pool.acquire()
+        timer = threading.Timer(0.1, pool.release, (resource,))
+        timer.start()
+        self.assertIs(pool.acquire(2), resource)
+        stats = pool.stats()
+        self.assertEqual(stats['waits'], 1)
+        self.assertGreater(stats['wait_time'], 0)
+
+    def test_health_check_before_reuse(self):
+        pool, factory = self.make_pool(max_size=1, check_interval=0, health_check=lambda r: r.healthy)
+        resource = pool.acquire()
+        resource.healthy = False
+        pool.release(resource)
+        replacement = pool.acquire()
+        self.assertIsNot(replacement, resource)
+        self.assertTrue(resource.closed)
+        self.assertEqual(pool.stats()['unhealthy'], 1)
+
+    def test_health_check_after_error(self):
+        pool, factory = self.make_pool(max_size=1, health_check=lambda r: r.healthy)
+        name = 'test-error-{}'.format(next(_names))
+        resourcepool._pools[name] = pool
+        self.addCleanup(resourcepool._pools.pop, name)
+        with self.assertRaises(ValueError):
+            with resourcepool.acquire(name) as resource:
+                resource.healthy = False
+                raise ValueError()
+        self.assertTrue(resource.closed)
+        stats = pool.stats()
+        self.assertEqual((stats['size'], stats['destroyed']), (0, 1))
+
+    def test_evict_idle(self):
+        pool, factory = self.make_pool(max_size=2, idle_timeout=0.05)
+        first = pool.acquire()
+        second = pool.acquire()
+        pool.release(first)
+        time.sleep(0.1)
+        pool.release(second)
+        pool.evict_idle()
+        self.assertTrue(first.closed)
+        self.assertFalse(second.closed)
+        stats = pool.stats()
+        self.assertEqual((stats['evicted'], stats['idle']), (1, 1))
+
+
+class TestAsyncLease(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def make_pool(self, **kwargs):
+        name = 'test-async-{}'.format(next(_names))
+        pool = ResourcePool(name, _Factory(), **kwargs)
+        resourcepool._pools[name] = pool
+        self.addCleanup(resourcepool._pools.pop, name)
+        self.addCleanup(pool.close)
+        return name, pool
+
+    def test_cancelled_acquire_does_not_leak(self):
+        name, pool = self.make_pool(max_size=1)
+        held = pool.acquire()
+
+        async def borrow():
+            async with resourcepool.acquire(name, timeout=2):
+                pass
+
+        async def main():
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(borrow(), 0.05)
+            pool.release(held)  # 被取消的借用此时借到资源，应当立即归还
+            await asyncio.sleep(0.2)
+            await asyncio.wait_for(borrow(), 1)
+
+        self.loop.run_until_complete(main())
+        stats = pool.stats()
+        self.assertEqual(stats['in_use'], 0)
+        self.assertEqual(stats['timeouts'], 0)
+
+    def test_health_check_off_loop(self):
+        threads = []
+
+        def health_check(resource):
+            threads.append(threading.current_thread())
+            return False
+
+        name, pool = self.make_pool(max_size=1, health_check=health_check)
+
+        async def main():
+            async with resourcepool.acquire(name) as resource:
+                raise ValueError()
+
+        self.assertRaises(ValueError, self.loop.run_until_complete, main())
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.current_thread())
+        self.assertEqual(pool.stats()['size'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+'''
+:date: 2026-10-18
+'''
+from __future__ import absolute_import
+
+import unittest
+from unittest import mock
+
+import time
+
+from resultcache import ResultCache, Cacheable, make_key
+
+
+class TestResultCache(unittest.TestCase):
+
+    def test_hit_and_miss(self):
+        cache = ResultCache()
+        self.assertEqual(cache.get('a.b', [1], {}), (False, None))
+        self.assertEqual(cache.stats()['misses'], 0)  # 写入缓存之前还不知道该方法是否可缓存
+        cache.put('a.b', [1], {}, Cacheable('one', ttl=60, maxsize=10))
+        self.assertEqual(cache.get('a.b', [1], {}), (True, 'one'))
+        self.assertEqual(cache.get('a.b', [2], {}), (False, None))
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (1, 2, 1))
+        self.assertEqual(stats['methods']['a.b']['misses'], 2)
+
+    def test_first_lookup_is_miss(self):
+        cache = ResultCache()
+        cache.get('a.b', [1], {})
+        cache.get('c.d', [], {})  # 不可缓存的方法
+        cache.put('a.b', [1], {}, Cacheable('one', ttl=60, maxsize=10))
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (0, 1))
+        self.assertEqual(list(stats['methods']), ['a.b'])
+
+    def test_pending_misses_bounded(self):
+        cache = ResultCache()
+        with mock.patch('resultcache.PENDING_MAXSIZE', 2):
+            for method in ('a', 'b', 'c'):
+                cache.get(method, [], {})
+        self.assertEqual(list(cache._pending_misses), ['b', 'c'])
+
+    def test_ttl(self):
+        cache = ResultCache()
+        cache.put('a.b', [], {}, Cacheable('v', ttl=10, maxsize=10))
+        with mock.patch('time.time', return_value=time.time() + 11):
+            self.assertEqual(cache.get('a.b', [], {}), (False, None))
+        self.assertEqual(cache.stats()['methods']['a.b']['expirations'], 1)
+
+    def test_lru(self):
+        cache = ResultCache()
+        for i in range(3):
+            cache.put('a.b', [i], {}, Cacheable(i, ttl=60, maxsize=2))
+        self.assertEqual(cache.get('a.b', [0], {}), (False, None))
+        self.assertEqual(cache.get('a.b', [1], {}), (True, 1))
+        cache.put('a.b', [3], {}, Cacheable(3, ttl=60, maxsize=2))
+        self.assertEqual(cache.get('a.b', [1], {}), (True, 1))
+        self.assertEqual(cache.get('a.b', [2], {}), (False, None))
+        self.assertEqual(cache.stats()['methods']['a.b']['evictions'], 2)
+
+    def test_invalidate(self):
+        cache = ResultCache()
+        for method in ('crm.get', 'crm.list', 'crmx.get', 'ivr.get'):
+            cache.put(method, [], {}, Cacheable(method, ttl=60, maxsize=10))
+        self.assertEqual(cache.invalidate(['crm.*']), 2)
+        self.assertEqual(cache.get('crmx.get', [], {}), (True, 'crmx.get'))
+        self.assertEqual(cache.invalidate(['ivr.get']), 1)
+        self.assertEqual(cache.invalidate(), 1)
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_key_spec(self):
+        spec = [[0, 'customer'], [None, 'lang']]
+        self.assertEqual(make_key(spec, ['c1', 'ignored'], {'lang': 'zh'}),
+                         make_key(spec, [], {'customer': 'c1', 'lang': 'zh', 'other': 1}))
+        self.assertNotEqual(make_key(None, [1], {}), make_key(None, [], {'a': 1}))
+
+    def test_settings_change_resets_method(self):
+        cache = ResultCache()
+        cache.put('a.b', [], {}, Cacheable('old', ttl=60, maxsize=10))
+        cache.put('a.b', [1], {}, Cacheable('new', ttl=30, maxsize=10))
+        self.assertEqual(cache.get('a.b', [], {}), (False, None))
+        self.assertEqual(cache.stats()['methods']['a.b']['ttl'], 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
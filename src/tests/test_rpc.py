@@ -289,6 +289,63 @@ class TestRpc(unittest.TestCase):
             print(res)
             self.assertIn('error', res)
 
+    def test_coroutine(self):
+        with patch('smartbus.ipcclient.Client') as mock_smbipc_cls:
+            smbclt = mock_smbipc_cls.return_value
+            smbclt.sendNotify = MagicMock()
+            #
+            id_ = uuid.uuid1().hex
+            req = {
+                "jsonrpc": jsonrpc.jsonrpc_version,
+                "id": id_,
+                "method": "async_sleep",
+                "params": [0.01],
+            }
+            #
+            packinfo_args = 1, 2, 3, 4, 5, 6  # srcUnitId, srcUnitClientId, srcUnitClientType, dstUnitId, dstUnitClientId, dstUnitClientType
+            pack = PackInfo(*packinfo_args)
+            server._smartbus_receive_text(smbclt, pack, json.dumps(req))
+            # sleep to wait the result
+            time.sleep(0.1)
+            # check the result
+            call_args = smbclt.sendNotify.call_args[0]
+            self.assertEqual(call_args[0], pack.srcUnitId)
+            self.assertEqual(call_args[1], pack.srcUnitClientId)
+            self.assertEqual(call_args[3], id_)
+            res = json.loads(call_args[6])
+            self.assertEqual(res["id"], req["id"])
+            self.assertEqual(res["result"], req["params"][0])
+
+    def test_batch(self):
+        with patch('smartbus.ipcclient.Client') as mock_smbipc_cls:
+            smbclt = mock_smbipc_cls.return_value
+            smbclt.sendNotify = MagicMock()
+            #
+            ids = [uuid.uuid1().hex for _ in range(3)]
+            req = [
+                {"jsonrpc": jsonrpc.jsonrpc_version, "id": ids[0], "method": "echo", "params": ["batch"]},
+                {"jsonrpc": jsonrpc.jsonrpc_version, "id": ids[1], "method": "BuildIn.sum", "params": [1, 2, 3]},
+                {"jsonrpc": jsonrpc.jsonrpc_version, "method": "echo", "params": ["notify"]},
+                {"jsonrpc": jsonrpc.jsonrpc_version, "id": ids[2], "method": "xxx", "params": []},
+            ]
+            #
+            packinfo_args = 1, 2, 3, 4, 5, 6  # srcUnitId, srcUnitClientId, srcUnitClientType, dstUnitId, dstUnitClientId, dstUnitClientType
+            pack = PackInfo(*packinfo_args)
+            server._smartbus_receive_text(smbclt, pack, json.dumps(req))
+            # sleep to wait the result
+            time.sleep(0.1)
+            # check the result
+            self.assertEqual(smbclt.sendNotify.call_count, 1)
+            call_args = smbclt.sendNotify.call_args[0]
+            self.assertEqual(call_args[0], pack.srcUnitId)
+            self.assertEqual(call_args[1], pack.srcUnitClientId)
+            self.assertEqual(call_args[3], ids[0])
+            res = dict((r["id"], r) for r in json.loads(call_args[6]))
+            self.assertEqual(sorted(res), sorted(ids))
+            self.assertEqual(res[ids[0]]["result"], "batch")
+            self.assertEqual(res[ids[1]]["result"], 6)
+            self.assertIn('error', res[ids[2]])
+
 
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testName']
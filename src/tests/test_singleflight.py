@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+
+'''
+:date: 2026-10-18
+'''
+from __future__ import absolute_import
+
+import unittest
+
+from singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_matches(self):
+        flights = SingleFlight(['crm.*', 'ivr.get'])
+        self.assertTrue(flights.matches('crm.get'))
+        self.assertTrue(flights.matches('crm.report.daily'))
+        self.assertTrue(flights.matches('ivr.get'))
+        self.assertFalse(flights.matches('ivr.set'))
+        self.assertFalse(flights.matches('crmx.get'))
+        self.assertTrue(SingleFlight(['*']).matches('any.thing'))
+        self.assertFalse(SingleFlight().matches('crm.get'))
+
+    def test_key(self):
+        flights = SingleFlight(['crm.*'])
+        self.assertEqual(flights.key('crm.get', [1], {}), flights.key('crm.get', (1,), {}))
+        self.assertNotEqual(flights.key('crm.get', [1], {}), flights.key('crm.get', [2], {}))
+        self.assertIsNone(flights.key('ivr.get', [1], {}))
+
+    def test_join_and_leave(self):
+        flights = SingleFlight(['*'])
+        key = flights.key('a.b', [], {})
+        self.assertTrue(flights.join(key, 'first'))
+        self.assertFalse(flights.join(key, 'second'))
+        self.assertFalse(flights.join(key, 'third'))
+        self.assertEqual(flights.stats(), {'inflight': 1, 'coalesced': 2, 'methods': {'a.b': 2}})
+        self.assertEqual(flights.leave(key), ['second', 'third'])
+        self.assertEqual(flights.leave(key), [])
+        self.assertTrue(flights.join(key, 'again'))
+
+
+if __name__ == '__main__':
+    unittest.main()
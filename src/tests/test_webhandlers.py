@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+'''
+:date: 2026-10-18
+'''
+from __future__ import absolute_import
+
+import unittest
+
+from tornado import web
+from tornado.testing import AsyncHTTPTestCase
+
+import globalvars
+import webhandlers
+
+
+class _Executor(object):
+
+    def __init__(self, count):
+        self.count = count
+        self.calls = []
+
+    def invalidate_cache(self, methods=None):
+        self.calls.append(methods)
+        return self.count
+
+
+class TestCacheInvalidateHandler(AsyncHTTPTestCase):
+
+    def setUp(self):
+        self.executor = _Executor(3)
+        self.addCleanup(setattr, globalvars, 'executor', globalvars.executor)
+        globalvars.executor = self.executor
+        super(TestCacheInvalidateHandler, self).setUp()
+
+    def get_app(self):
+        return web.Application([(r"/sys/cache/invalidate", webhandlers.CacheInvalidateHandler)])
+
+    def test_all(self):
+        response = self.fetch('/sys/cache/invalidate')
+        self.assertEqual(response.code, 200)
+        self.assertEqual(response.body, b'invalidated 3')
+        self.assertEqual(self.executor.calls, [None])
+
+    def test_methods(self):
+        response = self.fetch('/sys/cache/invalidate?method=crm.lookup_customer&method=ivr.*')
+        self.assertEqual(response.code, 200)
+        self.assertEqual(self.executor.calls, [['crm.lookup_customer', 'ivr.*']])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+
+'''
+:date: 2026-10-18
+'''
+from __future__ import absolute_import
+
+import unittest
+
+import os
+import time
+import asyncio
+import threading
+
+import workerpool
+from workerpool import WorkerPool, TaskTimeoutError, WorkerLostError
+
+
+def _echo(value):
+    return value
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return os.getpid()
+
+
+async def _async_sleep(seconds):
+    await asyncio.sleep(seconds)
+    return os.getpid()
+
+
+def _text(size):
+    return 'x' * size
+
+
+def _orphan_shm(exit_code=None, seconds=0):
+    '''在子进程中创建一个主进程不会读取的共享内存段，模拟写入结果之后子进程退出或者进程池终止'''
+    shm = workerpool.shared_memory.SharedMemory(
+        workerpool._current_worker._shm_prefix + 'orphan', create=True, size=16)
+    shm.close()
+    workerpool._unregister_shm(shm)
+    if exit_code is not None:
+        os._exit(exit_code)
+    time.sleep(seconds)
+
+
+class _Results(object):
+    '''收集 :meth:`WorkerPool.apply_async` 的结果'''
+
+    def __init__(self):
+        self._values = {}
+        self._cond = threading.Condition()
+        self._begin_time = time.time()
+
+    def callbacks(self, key):
+        return {
+            'callback': lambda value: self._set(key, True, value),
+            'error_callback': lambda error: self._set(key, False, error),
+        }
+
+    def _set(self, key, ok, value):
+        with self._cond:
+            self._values[key] = (ok, value, time.time() - self._begin_time)
+            self._cond.notify_all()
+
+    def wait(self, *keys, **kwargs):
+        '''等待各个任务结束，返回 ``{key: (ok, value, elapsed)}``'''
+        end = time.time() + kwargs.get('timeout', 10)
+        with self._cond:
+            while not all(key in self._values for key in keys):
+                remaining = end - time.time()
+                if remaining <= 0:
+                    raise AssertionError('tasks {} not done'.format([k for k in keys if k not in self._values]))
+                self._cond.wait(remaining)
+            return dict((key, self._values[key]) for key in keys)
+
+
+class PoolTestCase(unittest.TestCase):
+
+    def make_pool(self, **kwargs):
+        pool = WorkerPool(**kwargs)
+        self.addCleanup(self._stop_pool, pool)
+        self.assertTrue(pool.wait_ready(10))
+        return pool
+
+    @staticmethod
+    def _stop_pool(pool):
+        pool.terminate()
+        pool.join()
+
+
+class TestScheduling(PoolTestCase):
+
+    def test_sync_task_keeps_others_pending(self):
+        pool = self.make_pool(processes=1, concurrency=8)
+        results = _Results()
+        pool.apply_async(_sleep, (0.5,), **results.callbacks('sleep'))
+        pool.apply_async(_echo, ('hi',), **results.callbacks('echo'))
+        stats = pool.stats()
+        self.assertEqual(stats['pending'], 1)
+        self.assertEqual(stats['workers'][0]['inflight'], 1)
+        done = results.wait('sleep', 'echo')
+        self.assertEqual(done['echo'][:2], (True, 'hi'))
+        self.assertGreaterEqual(done['echo'][2], done['sleep'][2])
+
+    def test_sync_task_does_not_delay_idle_worker(self):
+        pool = self.make_pool(processes=2, concurrency=8)
+        results = _Results()
+        pool.apply_async(_sleep, (1.0,), **results.callbacks('sleep'))
+        keys = ['echo{}'.format(i) for i in range(3)]
+        for key in keys:
+            pool.apply_async(_sleep, (0,), **results.callbacks(key))
+        done = results.wait(*keys)
+        sleeping_pid = results.wait('sleep')['sleep'][1]
+        for key in keys:
+            ok, value, elapsed = done[key]
+            self.assertTrue(ok)
+            self.assertNotEqual(value, sleeping_pid)
+            self.assertLess(elapsed, 0.8)
+
+    def test_coroutines_share_worker(self):
+        pool = self.make_pool(processes=1, concurrency=4)
+        results = _Results()
+        keys = list(range(4))
+        for key in keys:
+            pool.apply_async(_async_sleep, (0.5,), **results.callbacks(key))
+        done = results.wait(*keys)
+        self.assertEqual(len(set(value for _, value, _ in done.values())), 1)
+        self.assertLess(max(elapsed for _, _, elapsed in done.values()), 1.5)
+
+
+class TestTimeouts(PoolTestCase):
+
+    def test_sync_timeout_replaces_worker(self):
+        pool = self.make_pool(processes=1)
+        old_pid = pool.stats()['workers'][0]['pid']
+        results = _Results()
+        pool.apply_async(_sleep, (5,), timeout=0.5, **results.callbacks('slow'))
+        ok, error, elapsed = results.wait('slow')['slow']
+        self.assertFalse(ok)
+        self.assertIsInstance(error, TaskTimeoutError)
+        self.assertLess(elapsed, 2)
+        pool.apply_async(_sleep, (0,), **results.callbacks('next'))
+        ok, new_pid, _ = results.wait('next')['next']
+        self.assertTrue(ok)
+        self.assertNotEqual(new_pid, old_pid)
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_coroutine_timeout_spares_siblings(self):
+        pool = self.make_pool(processes=1, concurrency=4)
+        old_pid = pool.stats()['workers'][0]['pid']
+        results = _Results()
+        pool.apply_async(_async_sleep, (5,), timeout=0.5, **results.callbacks('slow'))
+        for key in ('a', 'b'):
+            pool.apply_async(_async_sleep, (1,), **results.callbacks(key))
+        done = results.wait('slow', 'a', 'b')
+        self.assertFalse(done['slow'][0])
+        self.assertIsInstance(done['slow'][1], TaskTimeoutError)
+        self.assertLess(done['slow'][2], 1)
+        self.assertEqual(done['a'][:2], (True, old_pid))
+        self.assertEqual(done['b'][:2], (True, old_pid))
+        stats = pool.stats()
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertEqual([w['pid'] for w in stats['workers']], [old_pid])
+
+    def test_timeout_counts_from_start(self):
+        pool = self.make_pool(processes=2, concurrency=8)
+        results = _Results()
+        keys = list(range(3))
+        for key in keys:
+            pool.apply_async(_sleep, (1.0,), timeout=1.5, **results.callbacks(key))
+        done = results.wait(*keys)
+        for key in keys:
+            self.assertTrue(done[key][0], done[key])
+        self.assertGreaterEqual(max(elapsed for _, _, elapsed in done.values()), 1.9)
+        self.assertEqual(pool.stats()['timeouts'], 0)
+
+
+class TestAffinity(PoolTestCase):
+
+    def run_task(self, pool, affinity, seconds=0):
+        results = _Results()
+        pool.apply_async(_sleep, (seconds,), affinity=affinity, **results.callbacks('task'))
+        ok, pid, _ = results.wait('task')['task']
+        self.assertTrue(ok)
+        return pid
+
+    def test_same_key_same_worker(self):
+        pool = self.make_pool(processes=4)
+        pids = dict((key, self.run_task(pool, key)) for key in range(20))
+        self.assertGreater(len(set(pids.values())), 1)
+        for key in range(20):
+            self.assertEqual(self.run_task(pool, key), pids[key])
+        self.assertEqual(pool.stats()['affinity'], {'hits': 40, 'misses': 0})
+
+    def test_busy_worker_falls_through(self):
+        pool = self.make_pool(processes=2)
+        pid = self.run_task(pool, 'key')
+        results = _Results()
+        pool.apply_async(_sleep, (1,), affinity='key', **results.callbacks('busy'))
+        time.sleep(0.2)
+        self.assertNotEqual(self.run_task(pool, 'key'), pid)
+        self.assertEqual(results.wait('busy')['busy'][:2], (True, pid))
+        self.assertEqual(pool.stats()['affinity'], {'hits': 2, 'misses': 1})
+
+
+class TestRecycling(PoolTestCase):
+
+    def run_tasks(self, pool, count):
+        results = _Results()
+        pids = []
+        for key in range(count):
+            pool.apply_async(_sleep, (0,), **results.callbacks(key))
+            ok, pid, _ = results.wait(key)[key]
+            self.assertTrue(ok)
+            pids.append(pid)
+        return pids
+
+    def wait_stats(self, pool, predicate, timeout=10):
+        '''等待进程池的统计满足 ``predicate`` ，返回该统计'''
+        end = time.time() + timeout
+        while time.time() < end:
+            stats = pool.stats()
+            if predicate(stats):
+                return stats
+            time.sleep(0.05)
+        raise AssertionError('pool stats not reached: {}'.format(pool.stats()))
+
+    def test_maxtasks_jitter(self):
+        pool = self.make_pool(processes=4, maxtasksperchild=100, maxtasks_jitter=0.2)
+        limits = [w['max_tasks'] for w in pool.stats()['workers']]
+        for limit in limits:
+            self.assertTrue(80 <= limit <= 120, limits)
+        pool = self.make_pool(processes=2, maxtasksperchild=100)
+        self.assertEqual([w['max_tasks'] for w in pool.stats()['workers']], [100, 100])
+
+    def test_maxtasks_recycle(self):
+        pool = self.make_pool(processes=1, maxtasksperchild=3)
+        pids = self.run_tasks(pool, 3)
+        self.assertEqual(len(set(pids)), 1)
+        stats = self.wait_stats(pool, lambda stats: stats['workers'][0]['pid'] not in pids)
+        self.assertEqual(stats['recycled'], {'maxtasks': 1})
+        new_pids = self.run_tasks(pool, 2)
+        self.assertNotIn(new_pids[0], pids)
+
+    def test_rss_recycle(self):
+        pool = self.make_pool(processes=1, max_rss=1, rss_interval=0.1)
+        old_pid = self.run_tasks(pool, 1)[0]
+        stats = self.wait_stats(pool, lambda stats: old_pid not in [w['pid'] for w in stats['workers']])
+        self.assertGreaterEqual(stats['recycled']['rss'], 1)
+        self.assertNotIn('maxtasks', stats['recycled'])
+
+
+class TestSharedMemory(PoolTestCase):
+
+    def segments(self, pool):
+        return [name for name in os.listdir(workerpool.SHM_DIR) if name.startswith(pool._shm_prefix + '_')]
+
+    def test_large_results(self):
+        pool = self.make_pool(processes=1, shm_threshold=1024)
+        results = _Results()
+        pool.apply_async(_text, (10,), **results.callbacks('small'))
+        pool.apply_async(_text, (4096,), **results.callbacks('large'))
+        done = results.wait('small', 'large')
+        self.assertEqual(done['small'][:2], (True, 'x' * 10))
+        self.assertEqual(done['large'][:2], (True, 'x' * 4096))
+        stats = pool.stats()['shm']
+        self.assertEqual((stats['received'], stats['errors'], stats['cleaned']), (1, 0, 0))
+        self.assertEqual(self.segments(pool), [])
+
+    def test_worker_exit_cleans_segments(self):
+        pool = self.make_pool(processes=1, shm_threshold=1024)
+        results = _Results()
+        pool.apply_async(_orphan_shm, (1,), **results.callbacks('exit'))
+        ok, error, _ = results.wait('exit')['exit']
+        self.assertFalse(ok)
+        self.assertIsInstance(error, WorkerLostError)
+        self.assertEqual(self.segments(pool), [])
+        self.assertEqual(pool.stats()['shm']['cleaned'], 1)
+
+    def test_terminate_cleans_segments(self):
+        pool = WorkerPool(processes=1, shm_threshold=1024)
+        self.assertTrue(pool.wait_ready(10))
+        results = _Results()
+        pool.apply_async(_orphan_shm, (None, 5), **results.callbacks('slow'))
+        time.sleep(0.5)
+        self.assertEqual(len(self.segments(pool)), 1)
+        pool.terminate()
+        pool.join()
+        self.assertEqual(self.segments(pool), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
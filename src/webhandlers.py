@@ -8,7 +8,6 @@
 
 __updated__ = '2015-01-15'
 
-import json
 import time
 import random
 import logging
@@ -19,7 +18,7 @@ from tornado.web import RequestHandler
 from tornado.gen import coroutine, with_timeout, Task
 from tornado.concurrent import Future
 
-from jsonrpc import to_str
+import jsoncodec
 import globalvars
 import settings
 
@@ -43,7 +42,7 @@ class FlowHandler(RequestHandler):
     def post(self, *args, **kwargs):
         try:
             # 获取JSONRPC数据
-            data = json.loads(to_str(self.request.body, 'utf-8'))
+            data = jsoncodec.loads(self.request.body)
             server = data.get('server')
             process = data.get('process')
             project = str(data['project'])
@@ -128,14 +127,21 @@ class FlowHandler(RequestHandler):
 
 
 class ResetHandler(RequestHandler):
+    '''GET 不中断服务地重新加载 :mod:`methods` 包，见 :meth:`executor.Executor.reset`
+
+    回复的第一行是 ``reset succeed`` ，第二行是重置的统计（JSON），如::
+
+        reset succeed
+        {"swap": 0.532, "drain": 1.203, "drained": true}
+    '''
 
     @coroutine
     def get(self):
         logging.getLogger(self.__class__.__name__).warn('ResetHandler!')
         try:
-            yield Task(self.reset_executor)
+            result = yield Task(self.reset_executor)
             self.set_header('Content-Type', 'text/plain')
-            self.finish('reset succeed')
+            self.finish('reset succeed\n{}'.format(jsoncodec.dumps(result)))
         except:
             logging.getLogger(self.__class__.__name__).exception('get')
             raise
@@ -145,13 +151,10 @@ class ResetHandler(RequestHandler):
 
         def thread_func():
             try:
-                logging.getLogger(self.__class__.__name__).warn('globalvars.executor.stop() >>>')
-                globalvars.executor.stop()
-                logging.getLogger(self.__class__.__name__).warn('globalvars.executor.stop() <<<')
-                logging.getLogger(self.__class__.__name__).warn('globalvars.executor.start() >>>')
-                globalvars.executor.start()
-                logging.getLogger(self.__class__.__name__).warn('globalvars.executor.start() <<<')
-                ioloop.IOLoop.instance().add_callback(lambda: f.set_result(True))
+                logging.getLogger(self.__class__.__name__).warn('globalvars.executor.reset() >>>')
+                result = globalvars.executor.reset()
+                logging.getLogger(self.__class__.__name__).warn('globalvars.executor.reset() <<< %s', result)
+                ioloop.IOLoop.instance().add_callback(lambda: f.set_result(result))
             except Exception as exc:
                 logging.getLogger(self.__class__.__name__).exception('reset_executor thread_func')
                 ioloop.IOLoop.instance().add_callback(lambda: f.set_exception(exc))
@@ -162,7 +165,42 @@ class ResetHandler(RequestHandler):
             t = threading.Thread(target=thread_func)
             t.setDaemon(True)
             t.start()
-            yield f
+            result = yield f
+            return result
         except:
             logging.getLogger(self.__class__.__name__).exception('reset_executor')
             raise
+
+
+class CacheInvalidateHandler(RequestHandler):
+    '''GET 清除 RPC 方法的返回值缓存，见 :meth:`executor.Executor.invalidate_cache`
+
+    可以用参数 ``method`` （可以有多个）指定方法，如::
+
+        curl "http://localhost:8080/sys/cache/invalidate?method=crm.lookup_customer&method=ivr.*"
+
+    没有参数时清除全部缓存。回复是被清除的条目数。
+    '''
+
+    def get(self):
+        try:
+            methods = self.get_arguments('method') or None
+            count = globalvars.executor.invalidate_cache(methods)
+            self.set_header('Content-Type', 'text/plain')
+            self.finish('invalidated {}'.format(count))
+        except:
+            logging.getLogger(self.__class__.__name__).exception('get')
+            raise
+
+
+class StatsHandler(RequestHandler):
+    '''GET 执行器的统计信息（JSON）
+    '''
+
+    def get(self):
+        try:
+            self.set_header('Content-Type', 'application/json')
+            self.finish(jsoncodec.dumps(globalvars.executor.stats()))
+        except:
+            logging.getLogger(self.__class__.__name__).exception('get')
+            raise
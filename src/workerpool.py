@@ -0,0 +1,1266 @@
+# -*- coding: utf-8 -*-
+
+''' 支持子进程内并发的进程池
+
+:class:`WorkerPool` 的接口与 :class:`multiprocessing.pool.Pool` 的 ``apply_async`` 类似，区别在于：
+
+* 每个子进程可以同时执行多个任务，上限由 ``concurrency`` 参数指定。
+  未能分配的任务保存在主进程的等待队列中，而不是堆积在子进程的管道里。
+  子进程正在同步执行任务函数时（普通函数，或者协程函数返回协程之前），不会被分配新的任务，
+  只有已经交给事件循环或线程池的任务才与新任务同时执行，所以同步的任务不会排在另一个同步的任务之后。
+* 任务函数如果返回协程（``async def`` 函数的调用结果），子进程在其常驻的事件循环中执行该协程，
+  任务函数如果返回 :class:`concurrent.futures.Future` ，子进程在它完成时返回其结果。
+  所以，一个子进程可以同时有多个 I/O 密集型的调用在执行中。
+* 每个子进程使用独立的任务管道与结果管道，某个子进程退出或被杀死不会影响其它子进程。
+  该子进程正在执行的任务以 :class:`WorkerLostError` 结束，进程池随即启动一个新的子进程代替它。
+* 任务可以有执行时间限制，从子进程开始执行任务时计算。超时的任务立即以 :class:`TaskTimeoutError` 结束。
+  协程由子进程在事件循环中取消，同一子进程中的其它任务不受影响；
+  同步执行的任务（包括线程池中的任务）无法中断，执行它的子进程被杀死，进程池随即启动一个新的子进程代替它，
+  其它子进程不受影响。
+* 子进程完成初始化（ ``initializer`` ，可以包含预热）之后才会被分配任务。
+  因 ``maxtasksperchild`` 或 ``max_rss`` 而退出的子进程在替换它的子进程完成初始化之前继续工作，
+  并且同一时间只替换一个子进程，避免所有子进程同时重启造成的延迟尖峰。
+* 任务可以有亲和键（ ``affinity`` ）。亲和键相同的任务通过一致性哈希分配给同一个子进程，
+  以便各个子进程中的缓存分别保存一部分数据。每个子进程占有一个槽位，替换它的子进程继承其槽位，
+  所以替换子进程不会改变任务的分配；增减子进程时，只有少部分亲和键被重新分配。
+  目标子进程没有空闲时，任务分配给哈希环上下一个有空闲的子进程。
+* 可以用 :meth:`WorkerPool.close` 将等待中的任务转交给另一个进程池，并等待执行中的任务完成，
+  用于不中断服务地替换进程池。
+* 任务可以有截止时间。已经过期的任务，在分配给子进程之前与子进程开始执行之前都会被丢弃，
+  以 :class:`DeadlineExpiredError` 结束。
+* 较大的结果（ ``shm_threshold`` ）经共享内存传递：子进程将序列化后的结果写入一个共享内存段，
+  只通过管道发送其名称；主进程读取后立即释放该段。
+  由于子进程退出、进程池终止而未被读取的共享内存段，由主进程按名称前缀清除。
+* 任务函数可以返回生成器（或异步生成器）。子进程每得到一项就将其发送给主进程，
+  主进程以 ``partial_callback`` 逐项处理，最后以 :class:`StreamEnd` 结束。
+  这样，子进程与主进程都不必在内存中保存全部结果。
+
+:date: 2026-10-18
+'''
+
+from __future__ import print_function, unicode_literals, absolute_import
+
+import os
+import sys
+import time
+import random
+import logging
+import threading
+import asyncio
+import inspect
+import itertools
+import hashlib
+import bisect
+from collections import deque, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+import multiprocessing
+from multiprocessing.connection import wait
+from multiprocessing.reduction import ForkingPickler
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+try:
+    from multiprocessing import shared_memory, resource_tracker
+except ImportError:  # Python < 3.8
+    shared_memory = None
+
+RUN = 0
+CLOSE = 1
+TERMINATE = 2
+
+
+AFFINITY_VNODES = 64
+'''一致性哈希环上每个槽位的虚拟节点数'''
+
+
+ASYNC_TIMEOUT_GRACE = 5
+'''协程任务超时后，如果子进程在该时间（秒）内仍未返回结果（如事件循环被阻塞），主进程杀死该子进程'''
+
+
+SHM_DIR = '/dev/shm'
+'''POSIX 共享内存段所在的目录，用于按名称前缀清除未被读取的共享内存段'''
+
+_pool_counter = itertools.count()
+
+
+def _hash(key):
+    return int(hashlib.md5(str(key).encode('utf-8')).hexdigest()[:16], 16)
+
+
+class WorkerLostError(Exception):
+    '''执行任务的子进程在返回结果之前退出了'''
+    pass
+
+
+class PoolFullError(Exception):
+    '''等待分配的任务数已经达到进程池的 ``max_pending`` '''
+    pass
+
+
+class DeadlineExpiredError(Exception):
+    '''任务在开始执行之前已经超过了截止时间'''
+    pass
+
+
+class TaskTimeoutError(Exception):
+    '''任务的执行超过了时间限制'''
+    pass
+
+
+class RemoteError(Exception):
+    '''子进程中的返回值或异常无法被 pickle 时，以该异常代替'''
+    pass
+
+
+class StreamEnd(object):
+    '''任务函数返回的生成器结束时，以它作为任务的返回值
+
+    :ivar int count: 生成器产生的项数
+    '''
+
+    def __init__(self, count):
+        self.count = count
+
+    def __repr__(self):
+        return 'StreamEnd({})'.format(self.count)
+
+
+class _Task(object):
+    __slots__ = ('id', 'func', 'args', 'kwds', 'callback', 'error_callback', 'deadline', 'timeout',
+                 'affinity', 'submit_time', 'worker', 'begin_time', 'timeout_at', 'partial_callback', 'partials',
+                 'detached')
+
+    def __init__(self, id_, func, args, kwds, callback, error_callback, deadline=None, timeout=None, affinity=None,
+                 partial_callback=None):
+        self.id = id_
+        self.func = func
+        self.args = args
+        self.kwds = kwds
+        self.callback = callback
+        self.error_callback = error_callback
+        self.deadline = deadline
+        self.timeout = timeout
+        self.affinity = affinity
+        self.submit_time = time.time()
+        self.worker = None
+        self.begin_time = None
+        self.timeout_at = None
+        self.partial_callback = partial_callback
+        self.partials = None
+        self.detached = False
+
+    def set_timeout(self, timeout):
+        self.timeout = timeout
+        if timeout and self.begin_time is not None:
+            self.timeout_at = self.begin_time + timeout
+        else:
+            self.timeout_at = None
+
+
+class _WorkerHandle(object):
+    '''主进程中对一个子进程的记录'''
+
+    def __init__(self, process, task_conn, result_conn, slot):
+        self.process = process
+        self.slot = slot
+        self.task_conn = task_conn
+        self.result_conn = result_conn
+        self.inflight = {}
+        self.blocking = 0
+        self.dispatched = 0
+        self.completed = 0
+        self.expired = 0
+        self.timeouts = 0
+        self.retiring = False
+        self.ready = False
+        self.warmup = None
+        self.replacement = None
+        self.replaces = None
+        self.max_tasks = None
+        self.rss = None
+        self.recycle_reason = None
+        self.reported = {}
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+    def available(self, concurrency):
+        '''是否可以分配新的任务：执行中的任务数小于 ``concurrency`` ，并且没有正在同步执行（或等待开始执行）的任务'''
+        return len(self.inflight) < concurrency and not self.blocking
+
+    def to_dict(self):
+        return {
+            'pid': self.pid,
+            'slot': self.slot,
+            'inflight': len(self.inflight),
+            'blocking': self.blocking,
+            'dispatched': self.dispatched,
+            'completed': self.completed,
+            'expired': self.expired,
+            'timeouts': self.timeouts,
+            'retiring': self.retiring,
+            'ready': self.ready,
+            'warmup': self.warmup,
+            'max_tasks': self.max_tasks,
+            'rss': self.rss,
+            'recycle': self.recycle_reason,
+            'reported': self.reported,
+        }
+
+
+class WorkerPool(object):
+    '''进程池
+
+    :param processes: 子进程数量。默认为 ``None`` ，表示使用 CPU 核心数量。
+    :param initializer: 子进程启动后执行的初始化函数。
+        其中可以使用 :func:`get_event_loop` 等子进程中的函数。子进程在它返回之后才会被分配任务。
+    :param initargs: 初始化函数的参数
+    :param maxtasksperchild: 每个子进程的最大任务数。默认为 ``None`` ，表示无限制。
+        子进程被分配的任务数到达该值后，进程池先启动替换它的子进程，待替换者完成初始化后，
+        原子进程不再接收新任务，并在其任务全部完成后退出。
+    :param maxtasks_jitter: 每个子进程的最大任务数在 ``maxtasksperchild`` 的 ±``maxtasks_jitter`` 比例内随机分布，
+        避免负载均匀时所有子进程同时被替换。默认为 0 。
+    :param max_rss: 子进程常驻内存（RSS，字节）的上限。默认为 ``None`` ，表示无限制。
+        超过该值的子进程按照与 ``maxtasksperchild`` 相同的方式被替换。
+    :param rss_interval: 设置了 ``max_rss`` 时，子进程报告其 RSS 的最小间隔（秒）
+    :param concurrency: 每个子进程同时执行的最大任务数。默认为 1 。
+        大于 1 时，只有任务函数返回了协程或 :class:`concurrent.futures.Future` 的子进程才会被分配更多的任务。
+    :param threads: 每个子进程中线程池的线程数。默认为 0 ，表示不创建线程池。
+        任务函数可以通过 :func:`get_thread_executor` 将调用提交到该线程池，并返回 :class:`concurrent.futures.Future` 。
+    :param max_pending: 主进程中等待分配的任务的最大数量。默认为 0 ，表示无限制。
+        超过该值时， :meth:`apply_async` 抛出 :class:`PoolFullError` 。
+    :param name: 进程池名称，用于日志与统计
+    :param stats_interval: 子进程向主进程报告统计信息的最小间隔（秒）
+    :param shm_threshold: 序列化后不小于该值（字节）的结果经共享内存传递。默认为 ``None`` ，表示都经管道传递。
+        Python 3.8 以下的版本不支持共享内存，忽略该参数。
+
+    创建即启动，与 :class:`multiprocessing.pool.Pool` 一致。
+    '''
+
+    def __init__(self, processes=None, initializer=None, initargs=(), maxtasksperchild=None,
+                 concurrency=1, threads=0, max_pending=0, name='pool', stats_interval=10,
+                 maxtasks_jitter=0, max_rss=None, rss_interval=1, shm_threshold=None):
+        if processes is None:
+            processes = os.cpu_count() or 1
+        if processes < 1:
+            raise ValueError('Number of processes must be at least 1')
+        if concurrency < 1:
+            raise ValueError('concurrency must be at least 1')
+        if maxtasksperchild is not None and maxtasksperchild < 1:
+            raise ValueError('maxtasksperchild must be a positive int or None')
+        self._processes = processes
+        self._initializer = initializer
+        self._initargs = initargs
+        self._maxtasksperchild = maxtasksperchild
+        self._maxtasks_jitter = maxtasks_jitter
+        self._max_rss = max_rss
+        self._rss_interval = rss_interval if max_rss else 0
+        self._recycling = None
+        self._recycled = {}
+        self._concurrency = concurrency
+        self._threads = threads
+        self._max_pending = max_pending
+        self._name = name
+        self._stats_interval = stats_interval
+        self._logger = logging.getLogger('{}.{}'.format(self.__class__.__name__, name))
+        if shm_threshold is not None and shared_memory is None:
+            self._logger.warning('shared memory is not supported, shm_threshold ignored')
+            shm_threshold = None
+        self._shm_threshold = shm_threshold
+        self._shm_prefix = 'wp{}_{}'.format(os.getpid(), next(_pool_counter))
+        self._shm_received = 0
+        self._shm_bytes = 0
+        self._shm_errors = 0
+        self._shm_cleaned = 0
+        self._lock = threading.RLock()
+        self._pending = deque()
+        self._workers = []
+        self._task_counter = itertools.count()
+        self._expired = 0
+        self._timeouts = 0
+        self._next_timeout = None
+        self._wait_total = 0.0
+        self._wait_count = 0
+        self._ring_slots = None
+        self._ring = []
+        self._ring_hashes = []
+        self._affinity_hits = 0
+        self._affinity_misses = 0
+        self._state = RUN
+        self._handoff = None
+        self._ready_cond = threading.Condition(self._lock)
+        self._wakeup_r, self._wakeup_w = multiprocessing.Pipe(duplex=False)
+        with self._lock:
+            for _ in range(processes):
+                self._spawn_worker_locked()
+        self._handler = threading.Thread(target=self._handle_results, name='{}-results'.format(name))
+        self._handler.daemon = True
+        self._handler.start()
+
+    @property
+    def name(self):
+        return self._name
+
+    def apply_async(self, func, args=(), kwds={}, callback=None, error_callback=None, deadline=None, timeout=None,
+                    affinity=None, partial_callback=None):
+        '''异步执行任务
+
+        :param func: 在子进程中执行的可调用对象，必须可以被 pickle
+        :param args: 位置参数
+        :param kwds: 关键字参数
+        :param callback: 成功时，在主进程的结果处理线程中以返回值为参数调用
+        :param error_callback: 失败时，在主进程的结果处理线程中以异常为参数调用
+        :param deadline: 截止时间（ :func:`time.time` 的返回值）。默认为 ``None`` ，表示没有截止时间。
+            到达截止时间时仍未开始执行的任务不会被执行，以 :class:`DeadlineExpiredError` 调用 ``error_callback``
+        :param timeout: 执行时间限制（秒），从子进程开始执行任务时计算。默认为 ``None`` ，表示无限制。
+            子进程中的任务函数可以通过 :func:`set_task_timeout` 修改它。
+            超时后以 :class:`TaskTimeoutError` 调用 ``error_callback`` 。
+            任务函数返回的协程（或异步生成器）超时后在子进程中被取消；
+            同步执行的任务超时后，执行该任务的子进程被杀死、替换，该子进程中其它执行中的任务以 :class:`WorkerLostError` 结束。
+        :param affinity: 亲和键，默认为 ``None`` 。亲和键相同的任务尽可能分配给同一个子进程。
+        :param partial_callback: 任务函数返回生成器时，在主进程的结果处理线程中，以 ``(序号, 项)`` 为参数逐项调用，
+            生成器结束后，以 :class:`StreamEnd` 调用 ``callback`` 。
+            默认为 ``None`` ，表示将各项收集为列表，以该列表调用 ``callback`` 。
+        :return: 任务 ID
+        :raises PoolFullError: 等待分配的任务数已经达到 ``max_pending``
+
+        进程池已经用 :meth:`close` 关闭，并指定了 ``handoff`` 时，任务转交给 ``handoff`` 执行。
+        '''
+        task = _Task(next(self._task_counter), func, args, kwds, callback, error_callback, deadline, timeout, affinity,
+                     partial_callback)
+        with self._lock:
+            if self._state != RUN:
+                if self._state == CLOSE and self._handoff is not None:
+                    return self._handoff._adopt([task])
+                raise ValueError('Pool not running')
+            if self._max_pending and len(self._pending) >= self._max_pending:
+                raise PoolFullError('pool<{}> has {} pending tasks'.format(self._name, len(self._pending)))
+            self._pending.append(task)
+            failed = self._dispatch_locked()
+        self._fail_tasks(failed)
+        return task.id
+
+    @property
+    def processes(self):
+        '''子进程数量（不含正在退出的子进程）'''
+        return self._processes
+
+    def resize(self, processes):
+        '''调整子进程数量
+
+        增加时立即启动新的子进程；减少时，选择执行中任务最少的子进程，令其完成执行中的任务后退出。
+
+        :param int processes: 新的子进程数量
+        '''
+        if processes < 1:
+            raise ValueError('Number of processes must be at least 1')
+        with self._lock:
+            if self._state != RUN:
+                return
+            active = [w for w in self._workers if not w.retiring]
+            self._logger.info('resize: %s -> %s', len(active), processes)
+            self._processes = processes
+            for _ in range(processes - len(active)):
+                self._spawn_worker_locked()
+            for worker in sorted(active, key=lambda w: len(w.inflight))[:max(0, len(active) - processes)]:
+                worker.retiring = True
+                self._close_if_idle_locked(worker)
+            failed = self._dispatch_locked()
+        self._fail_tasks(failed)
+
+    def load(self):
+        '''负载采样，用于自动调整子进程数量
+
+        :return: 属性有：
+            ``processes`` 子进程数量；
+            ``capacity`` 可以同时执行的任务数；
+            ``inflight`` 执行中的任务数；
+            ``busy`` 忙碌的子进程数：正在同步执行（或等待开始执行）任务的子进程计为 1 ，
+            其它子进程按其执行中的任务数与 ``concurrency`` 之比计算；
+            ``pending`` 等待分配的任务数；
+            ``oldest_pending`` 等待最久的任务已经等待的时间（秒）；
+            ``wait_total`` , ``wait_count`` 已开始执行的任务从提交到开始执行的等待时间的累计值与任务数
+        :rtype: dict
+        '''
+        now = time.time()
+        with self._lock:
+            active = sum(1 for w in self._workers if not w.retiring)
+            return {
+                'processes': active,
+                'capacity': active * self._concurrency,
+                'inflight': sum(len(w.inflight) for w in self._workers if not w.retiring),
+                'busy': sum(1.0 if w.blocking else len(w.inflight) / float(self._concurrency)
+                            for w in self._workers if not w.retiring),
+                'pending': len(self._pending),
+                'oldest_pending': now - self._pending[0].submit_time if self._pending else 0.0,
+                'wait_total': self._wait_total,
+                'wait_count': self._wait_count,
+            }
+
+    def wait_ready(self, timeout=None):
+        '''等待所有子进程完成初始化
+
+        :param timeout: 最长等待时间（秒）， ``None`` 表示一直等待
+        :return: 是否所有子进程都已经完成初始化
+        '''
+        with self._ready_cond:
+            return self._ready_cond.wait_for(lambda: all(w.ready for w in self._workers), timeout)
+
+    def close(self, handoff=None):
+        '''关闭进程池：不再接收新任务，各个子进程完成其执行中的任务后退出
+
+        :param WorkerPool handoff: 接收任务的进程池。
+            如果指定，等待中（还未分配给子进程）的任务，以及此后提交给本进程池的任务，都转交给它执行。
+            否则，等待中的任务仍然在本进程池中执行。
+        '''
+        self._logger.debug('close(handoff=%s)', handoff.name if handoff else None)
+        with self._lock:
+            if self._state != RUN:
+                return
+            self._state = CLOSE
+            self._handoff = handoff
+            if handoff is not None:
+                tasks = list(self._pending)
+                self._pending.clear()
+                handoff._adopt(tasks)
+            self._close_workers_locked()
+        self._wakeup()
+
+    def _close_workers_locked(self):
+        '''进程池关闭后，没有等待中的任务时，令各个子进程在完成执行中的任务后退出'''
+        if self._state == CLOSE and not self._pending:
+            for worker in self._workers:
+                worker.retiring = True
+                self._close_if_idle_locked(worker)
+
+    def terminate(self, fail_inflight=False):
+        '''立即停止所有子进程
+
+        :param fail_inflight: 为 ``False`` 时，等待中与执行中的任务被丢弃，不会调用它们的回调函数；
+            为 ``True`` 时，以 :class:`WorkerLostError` 调用它们的 ``error_callback`` 。
+        '''
+        self._logger.debug('terminate()')
+        with self._lock:
+            self._state = TERMINATE
+            lost = list(self._pending)
+            self._pending.clear()
+            workers = list(self._workers)
+            for worker in workers:
+                lost.extend(worker.inflight.values())
+                worker.inflight.clear()
+        self._wakeup()
+        for worker in workers:
+            if worker.process.is_alive():
+                worker.process.terminate()
+        if fail_inflight and lost:
+            error = WorkerLostError('pool<{}> terminated'.format(self._name))
+            self._fail_tasks([(task, error) for task in lost])
+
+    def join(self, timeout=None):
+        '''等待结果处理线程与所有子进程结束
+
+        :param timeout: 最长等待时间（秒）， ``None`` 表示一直等待
+        :return: 是否已经结束
+        '''
+        if self._state == RUN:
+            raise ValueError('Pool is still running')
+        if self._handler is not threading.current_thread():
+            self._handler.join(timeout)
+            if self._handler.is_alive():
+                return False
+        for worker in list(self._workers):
+            worker.process.join()
+        self._wakeup_r.close()
+        self._wakeup_w.close()
+        return True
+
+    def _adopt(self, tasks):
+        '''接收另一个进程池转交的任务，它们排在等待队列的最前面
+
+        不检查 ``max_pending`` ：这些任务已经被接受了。
+        '''
+        with self._lock:
+            if self._state != RUN:
+                if self._state == CLOSE and self._handoff is not None:
+                    return self._handoff._adopt(tasks)
+                raise ValueError('Pool not running')
+            self._pending.extendleft(reversed(tasks))
+            failed = self._dispatch_locked()
+        self._fail_tasks(failed)
+        return tasks[-1].id if tasks else None
+
+    def stats(self):
+        '''统计信息
+
+        :rtype: dict
+        '''
+        with self._lock:
+            return {
+                'name': self._name,
+                'state': ('run', 'close', 'terminate')[self._state],
+                'processes': self._processes,
+                'concurrency': self._concurrency,
+                'threads': self._threads,
+                'pending': len(self._pending),
+                'max_pending': self._max_pending,
+                'expired': self._expired,
+                'timeouts': self._timeouts,
+                'max_rss': self._max_rss,
+                'recycling': self._recycling.pid if self._recycling else None,
+                'recycled': dict(self._recycled),
+                'affinity': {'hits': self._affinity_hits, 'misses': self._affinity_misses},
+                'shm': {
+                    'threshold': self._shm_threshold,
+                    'received': self._shm_received,
+                    'bytes': self._shm_bytes,
+                    'errors': self._shm_errors,
+                    'cleaned': self._shm_cleaned,
+                },
+                'inflight': sum(len(w.inflight) for w in self._workers),
+                'workers': [w.to_dict() for w in self._workers],
+            }
+
+    def _spawn_worker_locked(self, slot=None):
+        '''启动子进程
+
+        :param slot: 一致性哈希的槽位。替换子进程时继承原子进程的槽位，否则使用最小的空闲槽位
+        '''
+        if slot is None:
+            used = set(w.slot for w in self._workers if not w.retiring)
+            slot = next(i for i in itertools.count() if i not in used)
+        task_r, task_w = multiprocessing.Pipe(duplex=False)
+        result_r, result_w = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(
+            target=_worker_main,
+            args=(task_r, result_w, self._initializer, self._initargs, self._threads, self._stats_interval,
+                  self._rss_interval, self._shm_threshold, self._shm_prefix),
+            name='{}-worker'.format(self._name)
+        )
+        process.daemon = True
+        process.start()
+        task_r.close()
+        result_w.close()
+        worker = _WorkerHandle(process, task_w, result_r, slot)
+        if self._maxtasksperchild:
+            jitter = random.uniform(-self._maxtasks_jitter, self._maxtasks_jitter)
+            worker.max_tasks = max(1, int(round(self._maxtasksperchild * (1 + jitter))))
+        self._workers.append(worker)
+        self._logger.debug('worker<%s> started', worker.pid)
+        self._wakeup()
+        return worker
+
+    def _select_worker_locked(self):
+        selected = None
+        for worker in self._workers:
+            if worker.retiring or not worker.ready:
+                continue
+            if not worker.available(self._concurrency):
+                continue
+            n = len(worker.inflight)
+            if selected is None or n < len(selected.inflight):
+                selected = worker
+                if n == 0:
+                    break
+        return selected
+
+    def _ring_locked(self):
+        '''返回一致性哈希环，槽位变化时重建'''
+        slots = frozenset(w.slot for w in self._workers if not w.retiring)
+        if slots != self._ring_slots:
+            self._ring = sorted(
+                (_hash('{}-{}'.format(slot, i)), slot)
+                for slot in slots for i in range(AFFINITY_VNODES)
+            )
+            self._ring_hashes = [h for h, _ in self._ring]
+            self._ring_slots = slots
+        return self._ring
+
+    def _select_affinity_worker_locked(self, key):
+        '''按照一致性哈希选择子进程；目标子进程没有空闲时，沿哈希环选择下一个有空闲的子进程'''
+        ring = self._ring_locked()
+        if not ring:
+            return None
+        by_slot = dict((w.slot, w) for w in self._workers if w.ready and not w.retiring)
+        start = bisect.bisect(self._ring_hashes, _hash(key))
+        seen = set()
+        for i in range(len(ring)):
+            slot = ring[(start + i) % len(ring)][1]
+            if slot in seen:
+                continue
+            seen.add(slot)
+            worker = by_slot.get(slot)
+            if worker is not None and worker.available(self._concurrency):
+                if len(seen) == 1:
+                    self._affinity_hits += 1
+                else:
+                    self._affinity_misses += 1
+                return worker
+            if len(seen) == len(self._ring_slots):
+                break
+        return None
+
+    def _dispatch_locked(self):
+        '''将等待队列中的任务分配给有空闲的子进程
+
+        :return: 无法发送（参数无法 pickle）或已经过期的任务及其异常的列表
+        '''
+        failed = []
+        while self._pending and self._state != TERMINATE:
+            affinity = self._pending[0].affinity
+            if affinity is None:
+                worker = self._select_worker_locked()
+            else:
+                worker = self._select_affinity_worker_locked(affinity)
+            if worker is None:
+                break
+            task = self._pending.popleft()
+            if task.deadline is not None and time.time() >= task.deadline:
+                self._expired += 1
+                failed.append((task, DeadlineExpiredError('task expired before dispatch')))
+                continue
+            try:
+                worker.task_conn.send((task.id, task.func, task.args, task.kwds, task.deadline, task.timeout))
+            except (OSError, EOFError) as e:
+                # 子进程已经退出，由结果处理线程回收；任务放回队列
+                self._logger.warning('worker<%s> send error: %s', worker.pid, e)
+                self._pending.appendleft(task)
+                worker.retiring = True
+                continue
+            except Exception as e:
+                failed.append((task, e))
+                continue
+            task.worker = worker
+            worker.inflight[task.id] = task
+            worker.blocking += 1
+            worker.dispatched += 1
+            if worker.max_tasks and worker.dispatched >= worker.max_tasks:
+                self._request_recycle_locked(worker, 'maxtasks')
+        return failed
+
+    def _schedule_timeout_locked(self, timeout_at):
+        '''如果结果处理线程需要更早地检查超时，唤醒它'''
+        if self._next_timeout is None or timeout_at < self._next_timeout:
+            self._next_timeout = timeout_at
+            self._wakeup()
+
+    def _check_timeouts(self):
+        '''杀死有超时任务的子进程，并以 :class:`TaskTimeoutError` 结束超时的任务
+
+        这里只处理同步执行的任务，以及取消之后仍未结束的协程任务（见 :data:`ASYNC_TIMEOUT_GRACE` ）。
+
+        :return: 下一次需要检查的时间，没有则返回 ``None``
+        '''
+        now = time.time()
+        timed_out = []
+        next_timeout = None
+        with self._lock:
+            for worker in self._workers:
+                expired = [task for task in worker.inflight.values() if task.timeout_at is not None and task.timeout_at <= now]
+                if not expired:
+                    for task in worker.inflight.values():
+                        if task.timeout_at is not None and (next_timeout is None or task.timeout_at < next_timeout):
+                            next_timeout = task.timeout_at
+                    continue
+                for task in expired:
+                    del worker.inflight[task.id]
+                    timed_out.append(task)
+                worker.timeouts += len(expired)
+                self._timeouts += len(expired)
+                self._logger.warning('worker<%s> killed: %s task(s) timed out, %s other task(s) lost',
+                                     worker.pid, len(expired), len(worker.inflight))
+                if not worker.retiring:
+                    worker.retiring = True
+                    if self._state == RUN and worker.replacement is None:
+                        self._spawn_worker_locked(worker.slot)
+                worker.process.terminate()
+            self._next_timeout = next_timeout
+        self._fail_tasks([
+            (task, TaskTimeoutError('task timed out after {}s'.format(task.timeout)))
+            for task in timed_out
+        ])
+        return next_timeout
+
+    def _request_recycle_locked(self, worker, reason):
+        '''请求替换子进程。同一时间只替换一个子进程，其它的排队等待'''
+        if worker.retiring or worker.recycle_reason:
+            return
+        worker.recycle_reason = reason
+        self._logger.info('worker<%s> recycle requested: %s', worker.pid, reason)
+        self._start_recycle_locked()
+
+    def _start_recycle_locked(self):
+        if self._state != RUN or self._recycling is not None:
+            return
+        for worker in self._workers:
+            if worker.recycle_reason and not worker.retiring:
+                self._recycling = worker
+                self._recycled[worker.recycle_reason] = self._recycled.get(worker.recycle_reason, 0) + 1
+                self._retire_worker_locked(worker)
+                return
+
+    def _retire_worker_locked(self, worker):
+        '''先启动替换子进程的新子进程，待其完成初始化后，原子进程不再接收新任务，并在其任务完成后退出'''
+        if worker.retiring or worker.replacement is not None:
+            return
+        self._logger.debug('worker<%s> retiring', worker.pid)
+        if self._state == RUN:
+            worker.replacement = self._spawn_worker_locked(worker.slot)
+            worker.replacement.replaces = worker
+        else:
+            worker.retiring = True
+            self._close_if_idle_locked(worker)
+
+    def _close_if_idle_locked(self, worker):
+        if worker.retiring and not worker.inflight:
+            try:
+                worker.task_conn.send(None)
+            except (OSError, EOFError):
+                pass
+
+    def _wakeup(self):
+        try:
+            self._wakeup_w.send(None)
+        except (OSError, EOFError):
+            pass
+
+    def _fail_tasks(self, failed):
+        for task, error in failed:
+            self._invoke(task.error_callback, error)
+
+    def _invoke(self, func, arg):
+        if func is None:
+            return
+        try:
+            func(arg)
+        except Exception:
+            self._logger.exception('error occurred in callback')
+
+    def _handle_results(self):
+        '''结果处理线程'''
+        while True:
+            with self._lock:
+                if self._state == TERMINATE or (self._state == CLOSE and not self._workers):
+                    break
+                by_conn = dict((w.result_conn, w) for w in self._workers)
+                by_sentinel = dict((w.process.sentinel, w) for w in self._workers)
+                next_timeout = self._next_timeout
+            timeout = None
+            if next_timeout is not None:
+                timeout = next_timeout - time.time()
+                if timeout <= 0:
+                    self._check_timeouts()
+                    continue
+            ready = wait(list(by_conn) + list(by_sentinel) + [self._wakeup_r], timeout)
+            for obj in ready:
+                if obj is self._wakeup_r:
+                    try:
+                        self._wakeup_r.recv()
+                    except (OSError, EOFError):
+                        pass
+                elif obj in by_conn:
+                    self._receive(by_conn[obj])
+                elif obj in by_sentinel:
+                    self._reap(by_sentinel[obj])
+        if self._shm_threshold is not None:
+            self._clean_shm(self._shm_prefix + '_')
+        self._logger.debug('result handler exiting')
+
+    def _receive(self, worker):
+        '''接收并处理子进程的一条消息
+
+        :return: 管道已关闭时返回 ``False``
+        '''
+        try:
+            msg = worker.result_conn.recv()
+        except (OSError, EOFError):
+            return False
+        except Exception:
+            self._logger.exception('worker<%s> result unpickling error', worker.pid)
+            return True
+        kind = msg[0]
+        if kind == 'shm':
+            msg = self._load_shm(worker, *msg[1:])
+            kind = msg[0]
+        if kind == 'result':
+            _, task_id, ok, value = msg
+            with self._lock:
+                task = worker.inflight.pop(task_id, None)
+                if task is not None and not task.detached:
+                    worker.blocking -= 1
+                worker.completed += 1
+                self._close_if_idle_locked(worker)
+                failed = self._dispatch_locked()
+                self._close_workers_locked()
+            self._fail_tasks(failed)
+            if not ok and isinstance(value, DeadlineExpiredError):
+                worker.expired += 1
+            elif not ok and isinstance(value, TaskTimeoutError):  # 子进程取消了超时的协程
+                with self._lock:
+                    worker.timeouts += 1
+                    self._timeouts += 1
+            if task is not None:
+                if ok:
+                    if isinstance(value, StreamEnd) and task.partial_callback is None:
+                        value = task.partials or []
+                    self._invoke(task.callback, value)
+                else:
+                    self._invoke(task.error_callback, value)
+        elif kind == 'started':
+            with self._lock:
+                task = worker.inflight.get(msg[1])
+                if task is not None:
+                    task.begin_time = time.time()
+                    self._wait_total += task.begin_time - task.submit_time
+                    self._wait_count += 1
+                    if task.timeout:
+                        task.set_timeout(task.timeout)
+                        self._schedule_timeout_locked(task.timeout_at)
+        elif kind == 'detached':
+            _, task_id, cancellable = msg
+            with self._lock:
+                task = worker.inflight.get(task_id)
+                if task is not None and not task.detached:
+                    task.detached = True
+                    if cancellable and task.timeout_at is not None:
+                        # 由子进程取消超时的协程，主进程只在子进程没有响应时杀死它
+                        task.timeout_at += ASYNC_TIMEOUT_GRACE
+                    worker.blocking -= 1
+                    failed = self._dispatch_locked()
+                else:
+                    failed = []
+            self._fail_tasks(failed)
+        elif kind == 'partial':
+            _, task_id, seq, value = msg
+            task = worker.inflight.get(task_id)
+            if task is not None:
+                if task.partial_callback is None:
+                    if task.partials is None:
+                        task.partials = []
+                    task.partials.append(value)
+                else:
+                    try:
+                        task.partial_callback(seq, value)
+                    except Exception:
+                        self._logger.exception('error occurred in partial callback')
+        elif kind == 'timeout':
+            _, task_id, timeout = msg
+            with self._lock:
+                task = worker.inflight.get(task_id)
+                if task is not None:
+                    task.set_timeout(timeout)
+                    if task.timeout_at is not None:
+                        self._schedule_timeout_locked(task.timeout_at)
+        elif kind == 'ready':
+            with self._ready_cond:
+                worker.ready = True
+                worker.warmup = msg[1]
+                self._logger.debug('worker<%s> ready in %.3fs', worker.pid, worker.warmup)
+                old = worker.replaces
+                if old is not None:
+                    worker.replaces = None
+                    old.retiring = True
+                    self._close_if_idle_locked(old)
+                self._ready_cond.notify_all()
+                failed = self._dispatch_locked()
+            self._fail_tasks(failed)
+        elif kind == 'rss':
+            worker.rss = msg[1]
+            if self._max_rss and worker.rss is not None and worker.rss > self._max_rss:
+                with self._lock:
+                    self._request_recycle_locked(worker, 'rss')
+        elif kind == 'stats':
+            worker.reported = msg[1]
+        return True
+
+    def _load_shm(self, worker, task_id, name, size):
+        '''读取子进程经共享内存传递的结果消息，然后释放该共享内存段'''
+        try:
+            shm = shared_memory.SharedMemory(name)
+        except Exception as e:
+            self._shm_errors += 1
+            self._logger.error('worker<%s> can not attach shared memory %s: %s %s', worker.pid, name, type(e), e)
+            return ('result', task_id, False, RemoteError('shared memory {} lost'.format(name)))
+        try:
+            buf = shm.buf[:size]
+            try:
+                msg = ForkingPickler.loads(buf)
+            finally:
+                buf.release()
+            self._shm_received += 1
+            self._shm_bytes += size
+            return msg
+        except Exception as e:
+            self._shm_errors += 1
+            self._logger.exception('worker<%s> result unpickling error', worker.pid)
+            return ('result', task_id, False, RemoteError('{} {}'.format(type(e), e)))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def _clean_shm(self, prefix):
+        '''清除名称以 ``prefix`` 开头的共享内存段（子进程写入之后、主进程读取之前，子进程退出或者进程池终止的）'''
+        try:
+            names = [name for name in os.listdir(SHM_DIR) if name.startswith(prefix)]
+        except OSError:
+            return
+        for name in names:
+            try:
+                shm = shared_memory.SharedMemory(name)
+            except Exception:
+                continue
+            shm.close()
+            shm.unlink()
+            self._shm_cleaned += 1
+            self._logger.warning('unread shared memory %s cleaned', name)
+
+    def _reap(self, worker):
+        '''回收已经退出的子进程'''
+        # 先取走管道中剩余的结果
+        while True:
+            try:
+                if not worker.result_conn.poll():
+                    break
+            except (OSError, EOFError):
+                break
+            if not self._receive(worker):
+                break
+        worker.process.join()
+        with self._lock:
+            self._workers.remove(worker)
+            lost = list(worker.inflight.values())
+            worker.inflight.clear()
+            if lost or not worker.retiring:
+                self._logger.warning('worker<%s> exited unexpectedly (exitcode=%s, lost=%s)',
+                                     worker.pid, worker.process.exitcode, len(lost))
+            else:
+                self._logger.debug('worker<%s> exited', worker.pid)
+            if worker.replaces is not None:  # 未完成初始化的替换者，为原子进程重新启动替换者
+                old = worker.replaces
+                old.replacement = None
+                self._retire_worker_locked(old)
+            if worker.replacement is not None:  # 已经有替换者，不需要再启动新的子进程
+                worker.replacement.replaces = None
+            elif not worker.retiring and (self._state == RUN or (self._state == CLOSE and self._pending)):
+                self._spawn_worker_locked(worker.slot)
+            if worker is self._recycling:
+                self._recycling = None
+                self._start_recycle_locked()
+            failed = self._dispatch_locked()
+        worker.task_conn.close()
+        worker.result_conn.close()
+        if self._shm_threshold is not None:
+            self._clean_shm('{}_{}_'.format(self._shm_prefix, worker.pid))
+        error = WorkerLostError('worker<{}> exited with exitcode {}'.format(worker.pid, worker.process.exitcode))
+        self._fail_tasks([(task, error) for task in lost])
+        self._fail_tasks(failed)
+
+
+#############################################################################
+# 以下代码在子进程中执行
+#############################################################################
+
+_stats_providers = OrderedDict()
+_current_worker = None
+
+
+def get_event_loop():
+    '''返回当前子进程常驻的事件循环
+
+    .. attention:: 仅在子进程中有效
+    '''
+    return _current_worker.loop
+
+
+def get_thread_executor():
+    '''返回当前子进程的线程池（ :class:`concurrent.futures.ThreadPoolExecutor` ）
+
+    如果进程池的 ``threads`` 参数为 0 ，或者不在子进程中，返回 ``None``
+    '''
+    if _current_worker is None:
+        return None
+    return _current_worker.thread_executor
+
+
+def set_task_timeout(seconds):
+    '''在任务函数中修改当前任务的执行时间限制（秒）， ``None`` 表示无限制
+
+    只能在任务函数同步执行的部分调用（即返回协程或 :class:`concurrent.futures.Future` 之前）。
+    不在子进程中执行任务函数时，不做任何事。
+    '''
+    if _current_worker is None:
+        return
+    task_id = getattr(_current_worker.local, 'task_id', None)
+    if task_id is not None:
+        _current_worker.local.timeout = seconds
+        _current_worker.send(('timeout', task_id, seconds))
+
+
+def register_stats_provider(name, func):
+    '''在子进程中注册统计信息提供函数
+
+    子进程定期调用所有已注册的函数，将其返回值（必须可以被 pickle）报告给主进程，
+    主进程在 :meth:`WorkerPool.stats` 的 ``workers[i]['reported'][name]`` 中提供。
+
+    :param str name: 名称
+    :param func: 无参数的可调用对象
+    '''
+    _stats_providers[name] = func
+
+
+class _Worker(object):
+
+    def __init__(self, result_conn, threads, stats_interval, rss_interval=0, shm_threshold=None, shm_prefix=None):
+        self._result_conn = result_conn
+        self._shm_threshold = shm_threshold
+        self._shm_prefix = '{}_{}_'.format(shm_prefix, os.getpid())
+        self._shm_counter = itertools.count()
+        self._rss_interval = rss_interval
+        self._rss_time = 0
+        self._threads = threads
+        self._thread_executor = None
+        self._thread_executor_lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self.local = threading.local()
+        self._stats_interval = stats_interval
+        self._stats_time = 0
+        self._loop = None
+        self._loop_thread = None
+        self._inflight = 0
+        self._idle_cond = threading.Condition()
+        self._logger = logging.getLogger('workerpool.worker')
+
+    @property
+    def loop(self):
+        '''子进程常驻的事件循环，在第一次使用时创建，并运行于单独的线程中'''
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            self._loop_thread = threading.Thread(target=self._run_loop, name='worker-loop')
+            self._loop_thread.daemon = True
+            self._loop_thread.start()
+        return self._loop
+
+    @property
+    def thread_executor(self):
+        '''子进程的线程池，在第一次使用时创建'''
+        if self._thread_executor is None and self._threads > 0:
+            with self._thread_executor_lock:
+                if self._thread_executor is None:
+                    self._thread_executor = ThreadPoolExecutor(max_workers=self._threads)
+        return self._thread_executor
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def run(self, task_id, func, args, kwds, deadline=None, timeout=None):
+        with self._idle_cond:
+            self._inflight += 1
+        if deadline is not None and time.time() >= deadline:
+            self._send_result(task_id, False, DeadlineExpiredError('task expired before execution'))
+            return
+        self.send(('started', task_id))
+        begin_time = time.time()
+        self.local.task_id = task_id
+        self.local.timeout = timeout
+        try:
+            result = func(*args, **kwds)
+        except Exception as e:
+            self._send_result(task_id, False, e)
+            return
+        finally:
+            self.local.task_id = None
+        cancellable = inspect.iscoroutine(result) or inspect.isasyncgen(result)
+        if cancellable or isinstance(result, Future):
+            # 任务交给事件循环或线程池之后，主进程才可以向本子进程分配更多的任务
+            self.send(('detached', task_id, cancellable))
+        self._complete(task_id, result, self.local.timeout, begin_time)
+
+    def _complete(self, task_id, result, timeout=None, begin_time=None):
+        if inspect.iscoroutine(result):
+            if timeout:
+                result = self._with_timeout(result, timeout, begin_time)
+            future = asyncio.run_coroutine_threadsafe(result, self.loop)
+            future.add_done_callback(partial(self._on_done, task_id))
+        elif isinstance(result, Future):
+            result.add_done_callback(partial(self._on_done, task_id))
+        elif inspect.isgenerator(result):
+            self._stream(task_id, result)
+        elif inspect.isasyncgen(result):
+            coro = self._stream_async(task_id, result)
+            if timeout:
+                coro = self._with_timeout(coro, timeout, begin_time)
+            future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+            future.add_done_callback(partial(self._on_done, task_id))
+        else:
+            self._send_result(task_id, True, result)
+
+    async def _with_timeout(self, coro, timeout, begin_time):
+        '''任务开始执行 ``timeout`` 秒后取消协程，以 :class:`TaskTimeoutError` 结束'''
+        timeout_at = begin_time + timeout
+        try:
+            return await asyncio.wait_for(coro, max(0, timeout_at - time.time()))
+        except asyncio.TimeoutError:
+            if time.time() < timeout_at:  # 协程自己抛出的超时异常
+                raise
+            raise TaskTimeoutError('task timed out after {}s'.format(timeout))
+
+    def _stream(self, task_id, generator):
+        count = 0
+        try:
+            for item in generator:
+                self._send_result_msg(('partial', task_id, count, item))
+                count += 1
+        except (OSError, EOFError):
+            raise
+        except Exception as e:
+            self._send_result(task_id, False, e)
+            return
+        self._send_result(task_id, True, StreamEnd(count))
+
+    async def _stream_async(self, task_id, generator):
+        count = 0
+        async for item in generator:
+            self._send_result_msg(('partial', task_id, count, item))
+            count += 1
+        return StreamEnd(count)
+
+    def _on_done(self, task_id, future):
+        try:
+            result = future.result()
+        except Exception as e:
+            self._send_result(task_id, False, e)
+        else:
+            self._complete(task_id, result)
+
+    def _send_result(self, task_id, ok, value):
+        try:
+            self._send_result_msg(('result', task_id, ok, value))
+        except (OSError, EOFError):
+            raise
+        except Exception as e:
+            self._logger.error('can not send the result of task %s: %s %s', task_id, type(e), e)
+            self.send(('result', task_id, False, RemoteError('{} {}'.format(type(value), value))))
+        finally:
+            with self._idle_cond:
+                self._inflight -= 1
+                self._idle_cond.notify_all()
+        self._report_stats()
+        self._report_rss()
+
+    def _report_rss(self):
+        if not self._rss_interval:
+            return
+        now = time.time()
+        if now - self._rss_time < self._rss_interval:
+            return
+        self._rss_time = now
+        try:
+            self.send(('rss', current_rss()))
+        except Exception as e:
+            self._logger.error('can not report rss: %s %s', type(e), e)
+
+    def send(self, msg):
+        with self._send_lock:
+            self._result_conn.send(msg)
+
+    def _send_result_msg(self, msg):
+        '''发送结果消息，较大的经共享内存传递'''
+        if self._shm_threshold is None:
+            self.send(msg)
+            return
+        data = ForkingPickler.dumps(msg)
+        if len(data) >= self._shm_threshold:
+            name = '{}{}'.format(self._shm_prefix, next(self._shm_counter))
+            try:
+                shm = shared_memory.SharedMemory(name, create=True, size=len(data))
+            except Exception as e:
+                self._logger.warning('can not create shared memory: %s %s', type(e), e)
+            else:
+                try:
+                    shm.buf[:len(data)] = data
+                except Exception:
+                    shm.close()
+                    shm.unlink()
+                    raise
+                shm.close()
+                # 该段的所有权交给主进程，由它释放；子进程退出时不应被 resource_tracker 删除
+                _unregister_shm(shm)
+                self.send(('shm', msg[1], name, len(data)))
+                return
+        with self._send_lock:
+            self._result_conn.send_bytes(data)
+
+    def _report_stats(self, force=False):
+        now = time.time()
+        if not _stats_providers or (not force and now - self._stats_time < self._stats_interval):
+            return
+        self._stats_time = now
+        reported = {}
+        for name, func in list(_stats_providers.items()):
+            try:
+                reported[name] = func()
+            except Exception as e:
+                reported[name] = '{} {}'.format(type(e), e)
+        try:
+            self.send(('stats', reported))
+        except Exception as e:
+            self._logger.error('can not report stats: %s %s', type(e), e)
+
+    def close(self):
+        '''等待执行中的任务完成'''
+        with self._idle_cond:
+            while self._inflight > 0:
+                self._idle_cond.wait()
+        self._report_stats(force=True)
+        if self._thread_executor is not None:
+            self._thread_executor.shutdown()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join()
+
+
+def current_rss():
+    '''返回当前进程的常驻内存（RSS，字节）
+
+    Linux 上读取 ``/proc/self/statm`` ；其它平台上以 :func:`resource.getrusage` 的峰值代替；都不可用时返回 ``None``
+    '''
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, IOError, ValueError, IndexError, AttributeError):
+        pass
+    if resource is not None:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == 'darwin' else rss * 1024  # Linux 上的单位是 KB
+    return None
+
+
+def _unregister_shm(shm):
+    try:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+
+
+def _worker_main(task_conn, result_conn, initializer, initargs, threads, stats_interval, rss_interval=0,
+                 shm_threshold=None, shm_prefix=None):
+    global _current_worker
+    begin_time = time.time()
+    _current_worker = worker = _Worker(result_conn, threads, stats_interval, rss_interval, shm_threshold, shm_prefix)
+    if initializer is not None:
+        initializer(*initargs)
+    worker.send(('ready', time.time() - begin_time))
+    worker._report_stats(force=True)
+    worker._report_rss()
+    while True:
+        try:
+            msg = task_conn.recv()
+        except (OSError, EOFError):
+            break
+        if msg is None:
+            break
+        worker.run(*msg)
+    worker.close()